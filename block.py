@@ -17,11 +17,210 @@ from datetime import datetime
 from transaction import reward_transaction_from_json, transaction_from_json
 
 
+# The Merkle root of a block without transactions.
+EMPTY_MERKLE_ROOT = '0' * 64
+
+# The prefixes that the nodes of a Merkle tree are hashed with.
+MERKLE_LEAF_PREFIX = b'\x00'
+MERKLE_PARENT_PREFIX = b'\x01'
+
+
+def merkle_leaf(leaf):
+    """
+    merkle_leaf
+
+    Hashes a leaf of a Merkle tree into its node. Leaves and parents are
+    hashed with different prefixes so that a parent can never be passed
+    off as a leaf.
+
+    :param leaf: <str> The hash of the leaf.
+
+    :return: <str> The hash of the leaf node.
+    """
+
+    return hashlib.sha256(MERKLE_LEAF_PREFIX + leaf.encode()).hexdigest()
+
+
+def merkle_parent(left, right):
+    """
+    merkle_parent
+
+    Hashes two nodes of a Merkle tree into their parent.
+
+    :param left: <str> The hash of the left node.
+    :param right: <str> The hash of the right node.
+
+    :return: <str> The hash of the parent node.
+    """
+
+    return hashlib.sha256(MERKLE_PARENT_PREFIX + (left + right).encode()).hexdigest()
+
+
+def merkle_root(hashes):
+    """
+    merkle_root
+
+    Computes the root of a Merkle tree. When a level has an odd number of
+    nodes the last node is paired with itself, so a list of leaves with
+    its last leaf repeated has the same root. Blocks holding the same
+    transaction twice are rejected for this reason.
+
+    :param hashes: <list<str>> The hashes of the leaves.
+
+    :return: <str> The root of the tree.
+    """
+
+    if len(hashes) == 0:
+        return EMPTY_MERKLE_ROOT
+
+    level = [merkle_leaf(leaf) for leaf in hashes]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+
+        level = [merkle_parent(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+    return level[0]
+
+
+def merkle_path(hashes, index):
+    """
+    merkle_path
+
+    Computes the path from a leaf to the root of a Merkle tree. Each step
+    holds the sibling hash and the side it is on.
+
+    :param hashes: <list<str>> The hashes of the leaves.
+    :param index: <int> The index of the leaf.
+
+    :return: <list<list<str>>> The path, e.g. [[<hash>, 'left'], ...].
+    """
+
+    path = []
+
+    level = [merkle_leaf(leaf) for leaf in hashes]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+
+        if index % 2 == 0:
+            path.append([level[index + 1], 'right'])
+        else:
+            path.append([level[index - 1], 'left'])
+
+        level = [merkle_parent(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        index //= 2
+
+    return path
+
+
+def verify_merkle_path(leaf, path, root):
+    """
+    verify_merkle_path
+
+    Checks that a leaf is in a Merkle tree.
+
+    :param leaf: <str> The hash of the leaf.
+    :param path: <list<list<str>>> The path from the leaf to the root.
+    :param root: <str> The root of the tree.
+
+    :return: <boolean> Whether the path leads from the leaf to the root.
+    """
+
+    current = merkle_leaf(leaf)
+    for sibling, side in path:
+        if side == 'left':
+            current = merkle_parent(sibling, current)
+        else:
+            current = merkle_parent(current, sibling)
+
+    return current == root
+
+
+class BlockHeader:
+    """
+    BlockHeader
+    """
+
+    def __init__(self, index, previous_hash, proof, timestamp, merkle_root):
+        """
+        __init__
+
+        The constructor for a BlockHeader object. A header holds everything
+        needed to hash and compare a block without its transactions.
+
+        :param index: <int> The index of the block.
+        :param previous_hash: <str> The hash of the previous block.
+        :param proof: <str> The proof of the block.
+        :param timestamp: <datetime> The datetime of block creation.
+        :param merkle_root: <str> The root of the Merkle tree over the
+            transactions in the block.
+        """
+
+        self.index = index
+        self.previous_hash = previous_hash
+        self.proof = proof
+        self.timestamp = timestamp
+        self.merkle_root = merkle_root
+
+        self.hash = hashlib.sha256(self.to_string().encode()).hexdigest()
+
+    def to_json(self):
+        """
+        to_json
+
+        Converts a BlockHeader object into JSON-object form.
+
+        :return: <dict> JSON-object form of BlockHeader.
+        """
+
+        return {
+            'index': self.index,
+            'previous_hash': self.previous_hash,
+            'proof': self.proof,
+            'timestamp': self.timestamp,
+            'merkle_root': self.merkle_root
+        }
+
+    def to_string(self):
+        """
+        to_string
+
+        Converts a BlockHeader object into JSON-string form.
+
+        :return: <str> JSON-string form of BlockHeader.
+        """
+
+        return json.dumps(
+            self.to_json(),
+            default=str
+        )
+
+    def __eq__(self, other):
+        """
+        __eq__
+
+        Checks to see if two BlockHeaders are equal.
+
+        :param other: <BlockHeader Object> The BlockHeader to compare to.
+
+        :return: <boolean> Whether the headers are equal or not.
+        """
+
+        if not isinstance(other, BlockHeader):
+            return False
+
+        return self.hash == other.hash
+
+
 class Block:
     """
     Block
     """
 
+    # Assigning to any of these fields clears the cached header.
+    HEADER_FIELDS = frozenset(['index', 'transactions', 'proof', 'previous_hash', 'timestamp'])
+
     def __init__(self, index, transactions, proof, previous_hash, timestamp=-1):
         """
         __init__
@@ -36,12 +235,33 @@ class Block:
             is set to datetime.min for the genesis block.
         """
 
+        self._header = None
+
         self.index = index
         self.transactions = transactions
         self.proof = proof
         self.previous_hash = previous_hash
         self.timestamp = datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ') if timestamp == -1 else timestamp
 
+    def __setattr__(self, name, value):
+        """
+        __setattr__
+
+        Sets an attribute of the Block. The transactions are stored as a
+        tuple so that they cannot be changed in place and any change to the
+        header fields clears the cached header.
+
+        :param name: <str> The name of the attribute.
+        :param value: The new value of the attribute.
+        """
+
+        if name in Block.HEADER_FIELDS:
+            if name == 'transactions':
+                value = tuple(value)
+            object.__setattr__(self, '_header', None)
+
+        object.__setattr__(self, name, value)
+
     def to_json(self):
         """
         to_json
@@ -75,17 +295,56 @@ class Block:
             default=str
         )
 
+    @property
+    def header(self):
+        """
+        header
+
+        Retrieves the header of the Block. It is created the first time it
+        is needed and cached until the Block changes.
+
+        :return: <BlockHeader Object> The header of the block.
+        """
+
+        if self._header is None:
+            root = merkle_root([transaction.hash for transaction in self.transactions])
+
+            self._header = BlockHeader(self.index, self.previous_hash, self.proof, self.timestamp, root)
+
+        return self._header
+
     @property
     def hash(self):
         """
         hash
 
-        Creates a SHA-256 hash of a Block from its string form.
+        Retrieves the SHA-256 hash of a Block, which is the hash of its
+        header.
 
         :return: <str> The hash of the block.
         """
 
-        return hashlib.sha256(self.to_string().encode()).hexdigest()
+        return self.header.hash
+
+    def get_transaction_proof(self, uuid):
+        """
+        get_transaction_proof
+
+        Creates the Merkle path that proves a transaction is in the Block.
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :return: <tuple<Transaction Object, list<list<str>>>> The transaction
+            and its Merkle path or None if the transaction is not in the block.
+        """
+
+        hashes = [transaction.hash for transaction in self.transactions]
+
+        for index, transaction in enumerate(self.transactions):
+            if transaction.get_uuid() == uuid:
+                return transaction, merkle_path(hashes, index)
+
+        return None
 
     def __eq__(self, other):
         """
@@ -101,11 +360,7 @@ class Block:
         if not isinstance(other, Block):
             return False
 
-        return (self.index == other.index
-                and self.timestamp == other.timestamp
-                and self.transactions == other.transactions
-                and self.proof == other.proof
-                and self.previous_hash == other.previous_hash)
+        return self.header == other.header
 
 
 def block_from_json(data):
@@ -10,14 +10,13 @@ Santa Clara University
 
 # Standard library imports
 import hashlib
-import json
 import logging
 from datetime import datetime
 
 # Local imports
-from block import Block
+from block import Block, merkle_root
 from blockchainConfig import BlockchainConfig
-from encoder import ComplexEncoder
+from mempool import Mempool, OrphanPool
 
 config = BlockchainConfig()
 
@@ -34,9 +33,22 @@ class Blockchain:
         The constructor for a Blockchain object.
         """
 
-        self.current_transactions = []
+        self.current_transactions = Mempool()
         self.chain = []
 
+        # Transactions that are waiting for the transactions they spend.
+        self.orphans = OrphanPool()
+
+        # The IDs of pending transactions restored from a snapshot, whose
+        # fees no reward of this node has claimed yet.
+        self.unclaimed = set()
+
+        # The store that blocks after the genesis block are written to and
+        # the number of blocks of the chain after the genesis block that are
+        # already in it.
+        self.store = None
+        self.stored = 0
+
         # The version number is incremented in resolve conflicts and is returned
         # in paginated get chain.
         self.version_number = 0
@@ -44,6 +56,29 @@ class Blockchain:
         # Create the genesis block
         self.new_block(previous_hash='1', proof=100, date=datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ'))
 
+    def get_copy(self):
+        """
+        get_copy()
+
+        Creates a shallow copy of the blockchain. The chain and the mempool
+        of current transactions are copied so they can be changed without
+        changing this blockchain, but the blocks and transactions in them
+        and the orphan transactions are shared and should not be changed.
+
+        :return: <Blockchain Object> The copy of the blockchain.
+        """
+
+        blockchain = Blockchain.__new__(Blockchain)
+        blockchain.chain = list(self.chain)
+        blockchain.current_transactions = self.current_transactions.get_copy()
+        blockchain.orphans = self.orphans
+        blockchain.unclaimed = self.unclaimed
+        blockchain.version_number = self.version_number
+        blockchain.store = None
+        blockchain.stored = 0
+
+        return blockchain
+
     def get_chain(self):
         """
         get_chain()
@@ -72,10 +107,11 @@ class Blockchain:
         :return: <Block Object> New Block
         """
 
-        block = Block(len(self.chain)+1, self.current_transactions, proof, previous_hash or self.chain[-1].hash, date)
+        block = Block(len(self.chain)+1, self.current_transactions.snapshot(), proof, previous_hash or self.chain[-1].hash,
+                      date)
 
         # Reset the current list of transactions
-        self.current_transactions = []
+        self.current_transactions = Mempool()
 
         self.chain.append(block)
         logging.info(block.to_json())
@@ -95,11 +131,63 @@ class Blockchain:
         self.chain.append(block)
         logging.info(block.to_json())
 
+    def replace_chain(self, chain):
+        """
+        replace_chain()
+
+        Replaces the chain with a new one. Only the blocks after the part
+        that both chains share are rewritten in the store.
+
+        :param chain: <list<Block Object>> The new chain.
+        """
+
+        shared = 0
+        for ours, theirs in zip(self.chain, chain):
+            if ours is not theirs and ours != theirs:
+                break
+            shared += 1
+
+        self.chain = chain
+
+        # The genesis block is not in the store.
+        self.stored = min(self.stored, max(shared - 1, 0))
+
+    def attach_store(self, store):
+        """
+        attach_store()
+
+        Writes the blocks of the chain to a store from now on. The store
+        must already hold every block after the genesis block.
+
+        :param store: <BlockStore Object> The store.
+        """
+
+        self.store = store
+        self.stored = len(store)
+
+    def write_store(self):
+        """
+        write_store()
+
+        Writes the blocks that were added to the chain since the last call
+        to the store. Blocks are only written here so that the disk is not
+        waited on while the history is locked. It must only be called by
+        the miner thread, which is the only one that changes the chain.
+        """
+
+        if self.store is None:
+            return
+
+        self.store.truncate(self.stored)
+        self.store.extend(self.chain[self.stored + 1:])
+        self.stored = len(self.chain) - 1
+
     def new_transaction(self, transaction):
         """
         new_transaction()
 
-        Adds an already created transaction to the current transactions list.
+        Adds an already created transaction to the mempool of current
+        transactions.
 
         :param transaction: <Transaction Object> The transaction to add.
 
@@ -107,7 +195,7 @@ class Blockchain:
         """
 
         self.current_transactions.append(transaction)
-        logging.info(self.current_transactions[-1].to_string())
+        logging.info(transaction.to_string())
 
         return self.last_block.index + 1
 
@@ -115,17 +203,14 @@ class Blockchain:
         """
         update_reward()
 
-        Adds the reward transaction to the current transactions list when
-        starting to mine.
+        Sets the reward transaction of the current transactions when
+        starting to mine. The reward transaction is always the first one.
 
         :param reward_transaction: <RewardTransaction Object> The transaction
             to add
         """
 
-        if len(self.current_transactions) == 0:
-            self.current_transactions.append(reward_transaction)
-        else:
-            self.current_transactions[0] = reward_transaction
+        self.current_transactions.set_reward(reward_transaction)
 
     @property
     def last_block(self):
@@ -182,14 +267,7 @@ class Blockchain:
         :return: <bool> True if correct, False if not.
         """
 
-        transactions = json.dumps(current_transactions, cls=ComplexEncoder)
-
-        guess = f'{last_proof}{proof}{last_hash}{transactions}'.encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-
-        # This is where difficulty is set.
-        difficulty = config.get_block_difficulty()
-        return guess_hash[:difficulty] == '0' * difficulty
+        return BlockTemplate(last_proof, last_hash, current_transactions).valid_proof(proof)
 
     def get_version_number(self):
         """
@@ -212,3 +290,103 @@ class Blockchain:
         """
 
         self.version_number += 1
+
+
+class BlockTemplate:
+    """
+    BlockTemplate
+    """
+
+    def __init__(self, last_proof, last_hash, transactions):
+        """
+        __init__()
+
+        The constructor for a BlockTemplate object. A template holds
+        everything that is hashed for a proof except the proof itself, so
+        that the transactions only need to be hashed when they change.
+
+        :param last_proof: <int> The previous block's proof.
+        :param last_hash: <str> The hash of the previous block.
+        :param transactions: <list<Transaction>> The transactions of the
+            block being mined.
+        """
+
+        self.last_proof = last_proof
+        self.last_hash = last_hash
+
+        difficulty = config.get_block_difficulty()
+        self.difficulty = difficulty
+        self.target = '0' * difficulty
+
+        self.update(transactions)
+
+    def update(self, transactions):
+        """
+        update()
+
+        Computes the Merkle root of the transactions and rebuilds the
+        precomputed hash state. This must be called whenever the
+        transactions change.
+
+        :param transactions: <list<Transaction>> The transactions of the
+            block being mined.
+        """
+
+        root = merkle_root([transaction.hash for transaction in transactions])
+
+        self.prefix = f'{self.last_proof}{self.last_hash}{root}'.encode()
+        self.prefix_hash = hashlib.sha256(self.prefix)
+
+    def hash_proof(self, proof):
+        """
+        hash_proof()
+
+        Hashes a proof on top of the precomputed template state.
+
+        :param proof: <int> The proof to hash.
+
+        :return: <str> The hex digest of the guess.
+        """
+
+        guess_hash = self.prefix_hash.copy()
+        guess_hash.update(str(proof).encode())
+
+        return guess_hash.hexdigest()
+
+    def valid_proof(self, proof):
+        """
+        valid_proof()
+
+        Validates a proof against the template.
+
+        :param proof: <int> The proof to check.
+
+        :return: <bool> True if correct, False if not.
+        """
+
+        return self.hash_proof(proof)[:self.difficulty] == self.target
+
+    def search(self, start, stop):
+        """
+        search()
+
+        Hashes every proof in a range until a valid one is found.
+
+        :param start: <int> The first proof to check.
+        :param stop: <int> The proof to stop before.
+
+        :return: <int> The first valid proof or None if there is none.
+        """
+
+        prefix_hash = self.prefix_hash
+        difficulty = self.difficulty
+        target = self.target
+
+        for proof in range(start, stop):
+            guess_hash = prefix_hash.copy()
+            guess_hash.update(str(proof).encode())
+
+            if guess_hash.hexdigest()[:difficulty] == target:
+                return proof
+
+        return None
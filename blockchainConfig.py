@@ -9,6 +9,7 @@ Santa Clara University
 
 # Standard library imports
 import configparser
+from os import cpu_count
 
 
 class BlockchainConfig:
@@ -41,3 +42,249 @@ class BlockchainConfig:
         if difficulty > 256:
             return 256
         return difficulty
+
+    def get_mining_workers(self):
+        """
+        get_mining_workers()
+
+        Returns the number of processes used to search for proofs
+
+        :returns: <int> number of mining processes
+        """
+
+        workers = self.parser.getint('Mining', 'workers', fallback=1)
+        if workers < 1:
+            return cpu_count() or 1
+        return workers
+
+    def get_validation_processes(self):
+        """
+        get_validation_processes()
+
+        Returns the number of processes used to check blocks received from
+        peers
+
+        :returns: <int> number of validation processes, 0 to check blocks on
+            the miner thread
+        """
+
+        return max(self.parser.getint('Validation', 'processes', fallback=0), 0)
+
+    def get_network_asyncio(self):
+        """
+        get_network_asyncio()
+
+        Returns whether the network front end should use asyncio
+
+        :returns: <bool> whether asyncio is used
+        """
+
+        return self.parser.getboolean('Network', 'asyncio', fallback=False)
+
+    def get_network_backlog(self):
+        """
+        get_network_backlog()
+
+        Returns the backlog of the listening socket
+
+        :returns: <int> number of pending connections
+        """
+
+        return max(self.parser.getint('Network', 'backlog', fallback=5), 1)
+
+    def get_network_codec(self):
+        """
+        get_network_codec()
+
+        Returns the name of the codec to use with peers that support it
+
+        :returns: <str> name of the codec
+        """
+
+        return self.parser.get('Network', 'codec', fallback='json')
+
+    def get_scheduler_consensus_workers(self):
+        """
+        get_scheduler_consensus_workers()
+
+        Returns the number of worker threads that only handle blocks and
+        chain synchronization
+
+        :returns: <int> number of consensus workers
+        """
+
+        return max(self.parser.getint('Scheduler', 'consensus_workers', fallback=2), 0)
+
+    def get_scheduler_gossip_workers(self):
+        """
+        get_scheduler_gossip_workers()
+
+        Returns the number of worker threads that only handle blocks, chain
+        synchronization and transactions from peers
+
+        :returns: <int> number of gossip workers
+        """
+
+        return max(self.parser.getint('Scheduler', 'gossip_workers', fallback=2), 0)
+
+    def get_scheduler_consensus_depth(self):
+        """
+        get_scheduler_consensus_depth()
+
+        Returns the maximum number of block and chain synchronization tasks
+        waiting for a worker
+
+        :returns: <int> maximum number of consensus tasks, 0 for no limit
+        """
+
+        return max(self.parser.getint('Scheduler', 'consensus_depth', fallback=0), 0)
+
+    def get_scheduler_gossip_depth(self):
+        """
+        get_scheduler_gossip_depth()
+
+        Returns the maximum number of transaction tasks from peers waiting
+        for a worker
+
+        :returns: <int> maximum number of gossip tasks, 0 for no limit
+        """
+
+        return max(self.parser.getint('Scheduler', 'gossip_depth', fallback=10000), 0)
+
+    def get_scheduler_client_depth(self):
+        """
+        get_scheduler_client_depth()
+
+        Returns the maximum number of client requests waiting for a
+        worker
+
+        :returns: <int> maximum number of client tasks, 0 for no limit
+        """
+
+        return max(self.parser.getint('Scheduler', 'client_depth', fallback=1000), 0)
+
+    def get_storage_enabled(self):
+        """
+        get_storage_enabled()
+
+        Returns whether blocks are written to the block store
+
+        :returns: <bool> whether the block store is used
+        """
+
+        return self.parser.getboolean('Storage', 'enabled', fallback=False)
+
+    def get_storage_directory(self):
+        """
+        get_storage_directory()
+
+        Returns the directory the block store is kept in
+
+        :returns: <str> directory of the block store
+        """
+
+        return self.parser.get('Storage', 'directory', fallback='data')
+
+    def get_storage_coins(self):
+        """
+        get_storage_coins()
+
+        Returns whether the coins and transactions of the history are kept
+        in the coin database
+
+        :returns: <bool> whether the coin database is used
+        """
+
+        return self.parser.getboolean('Storage', 'coins', fallback=False)
+
+    def get_storage_coin_cache(self):
+        """
+        get_storage_coin_cache()
+
+        Returns the number of coins and transactions of the coin database
+        that are kept in memory
+
+        :returns: <int> size of the coin cache
+        """
+
+        return max(self.parser.getint('Storage', 'coin_cache', fallback=10000), 1)
+
+    def get_storage_snapshot_interval(self):
+        """
+        get_storage_snapshot_interval()
+
+        Returns the number of blocks between snapshots of the coin database
+
+        :returns: <int> blocks between snapshots
+        """
+
+        return max(self.parser.getint('Storage', 'snapshot_interval', fallback=10), 1)
+
+    def get_mempool_max_transactions(self):
+        """
+        get_mempool_max_transactions()
+
+        Returns the maximum number of transactions waiting to be mined
+
+        :returns: <int> maximum number of transactions in the mempool
+        """
+
+        return max(self.parser.getint('Mempool', 'max_transactions', fallback=10000), 1)
+
+    def get_mempool_max_bytes(self):
+        """
+        get_mempool_max_bytes()
+
+        Returns the maximum total size of the transactions waiting to be mined
+
+        :returns: <int> maximum size of the mempool in bytes
+        """
+
+        return max(self.parser.getint('Mempool', 'max_bytes', fallback=16777216), 1)
+
+    def get_mempool_min_fee(self):
+        """
+        get_mempool_min_fee()
+
+        Returns the lowest fee accepted once the mempool is full
+
+        :returns: <int> minimum fee
+        """
+
+        return max(self.parser.getint('Mempool', 'min_fee', fallback=0), 0)
+
+    def get_mempool_orphan_ttl(self):
+        """
+        get_mempool_orphan_ttl()
+
+        Returns the number of seconds a transaction waits for the coins it
+        is missing
+
+        :returns: <float> time to live of an orphan transaction
+        """
+
+        return max(self.parser.getfloat('Mempool', 'orphan_ttl', fallback=60), 0)
+
+    def get_mempool_max_orphans(self):
+        """
+        get_mempool_max_orphans()
+
+        Returns the maximum number of transactions waiting for the coins
+        they are missing
+
+        :returns: <int> maximum number of orphan transactions
+        """
+
+        return max(self.parser.getint('Mempool', 'max_orphans', fallback=1000), 0)
+
+    def get_wallet_selection(self):
+        """
+        get_wallet_selection()
+
+        Returns the strategy the wallet uses to select coins for a new
+        transaction
+
+        :returns: <str> largest_first, exact_match or fewest_inputs
+        """
+
+        return self.parser.get('Wallet', 'selection', fallback='largest_first')
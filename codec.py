@@ -0,0 +1,97 @@
+"""
+codec.py
+
+This file is responsible for storing the codecs that convert messages to
+and from the bytes that are sent over the network.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+import json
+
+# Local imports
+from encoder import ComplexEncoder
+
+
+class JsonCodec():
+    """
+    JsonCodec
+    """
+
+    id = 0
+    name = 'json'
+
+    def encode(self, data):
+        """
+        encode()
+
+        Converts data into its UTF-8 encoded JSON string.
+
+        :param data: <dict> The data to encode.
+
+        :return: <bytes> The encoded data.
+        """
+
+        return json.dumps(data, cls=ComplexEncoder).encode()
+
+    def decode(self, payload):
+        """
+        decode()
+
+        Converts a UTF-8 encoded JSON string back into data.
+
+        :param payload: <bytes> The encoded data.
+
+        :return: <dict> The decoded data.
+        """
+
+        return json.loads(str(payload, 'utf-8'))
+
+
+JSON_CODEC = JsonCodec()
+
+CODECS = {codec.id: codec for codec in (JSON_CODEC,)}
+
+# The names of the codecs that this node supports, which are advertised to
+# peers when registering with them.
+CODEC_NAMES = [codec.name for codec in CODECS.values()]
+
+
+def get_codec(codec_id):
+    """
+    get_codec()
+
+    Retrieves a codec by its ID.
+
+    :param codec_id: <int> The ID of the codec.
+
+    :return: <Codec Object> The codec.
+
+    :raises ValueError: if there is no codec with the ID.
+    """
+
+    try:
+        return CODECS[codec_id]
+    except KeyError:
+        raise ValueError('Unknown codec ' + str(codec_id))
+
+
+def get_codec_by_name(name):
+    """
+    get_codec_by_name()
+
+    Retrieves a codec by its name.
+
+    :param name: <str> The name of the codec.
+
+    :return: <Codec Object> The codec or None if there is no codec with
+        the name.
+    """
+
+    for codec in CODECS.values():
+        if codec.name == name:
+            return codec
+
+    return None
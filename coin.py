@@ -9,14 +9,57 @@ Santa Clara University
 
 # Standard library imports
 import json
+import re
 from uuid import uuid4
 
+# IDs that are 32 lowercase hex characters are kept as their 16 bytes.
+# Only lowercase IDs are packed so that they expand to the exact same string.
+COMPACT_ID_PATTERN = re.compile('[0-9a-f]{32}')
+
+
+def compact_id(uuid):
+    """
+    compact_id()
+
+    Converts an ID into the form that is kept in memory. IDs that are 32
+    lowercase hex characters become 16 bytes and all other IDs are kept
+    as they are.
+
+    :param uuid: <str> The ID.
+
+    :return: <bytes or str> The compact ID.
+    """
+
+    if isinstance(uuid, str) and len(uuid) == 32 and COMPACT_ID_PATTERN.fullmatch(uuid):
+        return bytes.fromhex(uuid)
+
+    return uuid
+
+
+def expand_id(uuid):
+    """
+    expand_id()
+
+    Converts a compact ID back into its string form.
+
+    :param uuid: <bytes or str> The compact ID.
+
+    :return: <str> The ID.
+    """
+
+    if isinstance(uuid, bytes):
+        return uuid.hex()
+
+    return uuid
+
 
 class Coin:
     """
     Coin
     """
 
+    __slots__ = ('_transaction_id', '_value', '_uuid')
+
     def __init__(self, transaction_id, value, uuid=None):
         """
         __init__()
@@ -28,9 +71,9 @@ class Coin:
         :param uuid: <str> The unique identifier for this coin.
         """
 
-        self._transaction_id = transaction_id
+        self._transaction_id = compact_id(transaction_id)
         self._value = value
-        self._uuid = str(uuid4()).replace('-', '') if uuid is None else uuid
+        self._uuid = uuid4().bytes if uuid is None else compact_id(uuid)
 
     def get_transaction_id(self):
         """
@@ -41,7 +84,7 @@ class Coin:
         :return: <str> The transaction ID.
         """
 
-        return self._transaction_id
+        return expand_id(self._transaction_id)
 
     def get_value(self):
         """
@@ -63,7 +106,7 @@ class Coin:
         :return: The UUID.
         """
 
-        return self._uuid
+        return expand_id(self._uuid)
 
     def to_json(self):
         """
@@ -75,8 +118,8 @@ class Coin:
         """
 
         return {
-            'uuid': self._uuid,
-            'transaction_id': self._transaction_id,
+            'uuid': expand_id(self._uuid),
+            'transaction_id': expand_id(self._transaction_id),
             'value': self._value,
         }
 
@@ -109,9 +152,9 @@ class Coin:
         if not isinstance(other, Coin):
             return False
 
-        return (self._transaction_id == other.get_transaction_id()
-                and self._value == other.get_value()
-                and self._uuid == other.get_uuid())
+        return (self._transaction_id == other._transaction_id
+                and self._value == other._value
+                and self._uuid == other._uuid)
 
     def __lt__(self, other):
         """
@@ -138,6 +181,8 @@ class RewardCoin(Coin):
     RewardCoin
     """
 
+    __slots__ = ()
+
     def __init__(self, transaction_id, value, uuid=None):
         """
         __init__()
@@ -9,13 +9,31 @@ Santa Clara University
 """
 
 # Standard library imports
-from socket import socket, AF_INET, SOCK_STREAM
-import json
+from errno import EINPROGRESS
+from itertools import count
+from os import strerror
+from queue import Queue, Empty
+from selectors import DefaultSelector, EVENT_READ, EVENT_WRITE
+from socket import socket, create_connection, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_ERROR
+from struct import Struct
+from threading import Lock, Thread
+from time import time
+from weakref import WeakKeyDictionary
 import logging
 
 # Local Imports
-from encoder import ComplexEncoder
-from macros import BUFFER_SIZE
+from codec import JSON_CODEC, get_codec
+from macros import (MAX_FRAME_SIZE, RECV_BUFFER_SIZE, CONNECT_TIMEOUT, RESPONSE_TIMEOUT, RECONNECT_BACKOFF_MIN,
+                    RECONNECT_BACKOFF_MAX, OPEN_CHANNEL)
+
+
+# The header of a frame, which holds the size of the payload and the ID of
+# the codec it is encoded with.
+FRAME_HEADER = Struct('!IB')
+
+# The codec of the last request received on each connection so that the
+# response can be sent back with the same codec.
+CONNECTION_CODECS = WeakKeyDictionary()
 
 
 class ConnectionHandler():
@@ -23,6 +41,9 @@ class ConnectionHandler():
     ConnectionHandler
     """
 
+    # The codec that requests are sent with.
+    codec = JSON_CODEC
+
     def _send(self, conn, data):
         """
         _send()
@@ -33,16 +54,38 @@ class ConnectionHandler():
         :param data: <str> Data to send JSON Object
         """
 
-        try:
-            json_data = json.dumps(data, cls=ComplexEncoder)
-            data_size = str(len(json_data))
-
-            message = data_size + '~' + json_data
+        if isinstance(conn, ChannelConnection):
+            conn.send_message(data)
+            return
 
-            conn.send(message.encode())
+        try:
+            conn.sendall(self._frame(data, CONNECTION_CODECS.get(conn, self.codec)))
         except Exception as e:
             logging.warning('Error sending data to network: ' + str(e))
 
+    def _frame(self, data, codec=None):
+        """
+        _frame()
+
+        Converts data into the frame that is sent over the network. A frame
+        is the length of the payload as a 4 byte unsigned big-endian
+        integer and the ID of the codec as a single byte followed by the
+        payload, which is the data encoded with the codec.
+
+        :param data: <str> Data to send JSON Object
+        :param codec: <Codec Object> The codec to encode the data with. The
+            codec of the handler is used when this is None.
+
+        :return: <bytes> The frame.
+        """
+
+        if codec is None:
+            codec = self.codec
+
+        payload = codec.encode(data)
+
+        return FRAME_HEADER.pack(len(payload), codec.id) + payload
+
     def _recv(self, conn):
         """
         recv()
@@ -54,18 +97,14 @@ class ConnectionHandler():
         :return: <dict> JSON Object representation of the data.
         """
 
-        try:
-            initial_message = conn.recv(BUFFER_SIZE).decode()
-            size, data = initial_message.split('~')
-
-            size = int(size)
-            amount_received = len(data)
-            while amount_received < size:
-                data += conn.recv(BUFFER_SIZE).decode()
-                amount_received = len(data)
+        if isinstance(conn, ChannelConnection):
+            return conn.recv_message()
 
-            json_data = json.loads(data[:size])
-            return json_data
+        try:
+            size, codec = read_header(recv_exactly(conn, FRAME_HEADER.size))
+            data = codec.decode(recv_exactly(conn, size))
+            CONNECTION_CODECS[conn] = codec
+            return data
         except OSError as e:
             # A timeout has occured.
             logging.warning('Error receiving data from network: ' + str(e))
@@ -76,13 +115,115 @@ class ConnectionHandler():
             logging.warning('Error receiving data from network: ' + str(e))
             return None
 
+    async def _recv_async(self, loop, conn):
+        """
+        _recv_async()
+
+        This function will read the data from a non-blocking connection
+        without blocking the event loop.
+
+        :param loop: <AbstractEventLoop> The event loop to read with.
+        :param conn: <Connection Object> The connection to use.
+
+        :return: <dict> JSON Object representation of the data.
+        """
+
+        async def recv_exactly_async(size):
+            buffer = bytearray()
+            received = 0
+            while received < size:
+                amount = await loop.sock_recv_into(conn, grow_buffer(buffer, received, size))
+                if amount == 0:
+                    raise ConnectionError('Connection closed by peer')
+                received += amount
+
+            return buffer
+
+        try:
+            size, codec = read_header(await recv_exactly_async(FRAME_HEADER.size))
+            data = codec.decode(await recv_exactly_async(size))
+            CONNECTION_CODECS[conn] = codec
+            return data
+        except Exception as e:
+            logging.warning('Error receiving data from network: ' + str(e))
+            return None
+
+
+def recv_exactly(conn, size):
+    """
+    recv_exactly()
+
+    Receives an exact number of bytes from a connection straight into a
+    buffer that grows as the bytes arrive.
+
+    :param conn: <Connection Object> The connection to use.
+    :param size: <int> The number of bytes to receive.
+
+    :return: <bytearray> The received bytes.
+
+    :raises ConnectionError: if the connection is closed first.
+    """
+
+    buffer = bytearray()
+    received = 0
+    while received < size:
+        amount = conn.recv_into(grow_buffer(buffer, received, size))
+        if amount == 0:
+            raise ConnectionError('Connection closed by peer')
+        received += amount
+
+    return buffer
+
+
+def grow_buffer(buffer, received, size):
+    """
+    grow_buffer()
+
+    Makes room in a receive buffer for more of a payload. The buffer starts
+    at RECV_BUFFER_SIZE and doubles each time it is full, so a peer can not
+    make the node allocate much more than it has really sent.
+
+    :param buffer: <bytearray> The buffer.
+    :param received: <int> The number of bytes received into it so far.
+    :param size: <int> The size of the payload.
+
+    :return: <memoryview> The free part of the buffer.
+    """
+
+    if received == len(buffer):
+        buffer.extend(bytes(min(max(len(buffer), RECV_BUFFER_SIZE), size - len(buffer))))
+
+    return memoryview(buffer)[received:]
+
+
+def read_header(header):
+    """
+    read_header()
+
+    Reads the size of the payload and its codec out of a frame header.
+
+    :param header: <bytes> The frame header.
+
+    :return: <tuple<int, Codec Object>> The size of the payload and the
+        codec it is encoded with.
+
+    :raises ValueError: if the size is over MAX_FRAME_SIZE or the codec is
+        unknown.
+    """
+
+    size, codec_id = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError('Frame of ' + str(size) + ' bytes is too large')
+
+    return size, get_codec(codec_id)
+
 
 class SingleConnectionHandler(ConnectionHandler):
     """
     SingleConnectionHandler
     """
 
-    def __init__(self, host, port, close=True):
+    def __init__(self, host, port, close=True, codec=JSON_CODEC):
         """
         __init__()
 
@@ -90,6 +231,7 @@ class SingleConnectionHandler(ConnectionHandler):
         :param port: <int> The port to connect to.
         :param close: <boolean> Whether or not the connection should stay open
             after making a request.
+        :param codec: <Codec Object> The codec to send requests with.
 
         :raises ConnectionRefusedError: if the connection cannot be established.
         """
@@ -98,6 +240,7 @@ class SingleConnectionHandler(ConnectionHandler):
 
         self.host = host
         self.port = port
+        self.codec = codec
 
         self.close = close
 
@@ -143,27 +286,132 @@ class MultipleConnectionHandler(ConnectionHandler):
     MultipleConnectionHandler
     """
 
-    def __init__(self, peers):
+    def __init__(self, peers, pool=None):
         """
         __init__()
 
-        The constructor for the MultipleConnectionHandler object.
+        The constructor for the MultipleConnectionHandler object. The
+        connections to the peers are made at the same time and any peer
+        that can not be reached before the timeout is left out.
 
         :param peers: <list<tuple<str, int>>> A list of the peers that
             should be connected to.
+        :param pool: <ConnectionPool Object> The pool to take connections
+            from. A new connection is made to each peer when this is None.
         """
 
         ConnectionHandler.__init__(self)
 
         self.peers = peers
+        self.pool = pool
         self.peer_connections = []
+
+        if pool is not None:
+            self.peer_connections = [pool.get(peer) for peer in self.peers]
+            return
+
+        selector = DefaultSelector()
         for peer in self.peers:
             conn = socket(AF_INET, SOCK_STREAM)
-            try:
-                conn.connect((peer[0], peer[1]))
-                self.peer_connections.append(conn)
-            except ConnectionRefusedError as e:
-                logging.warning('Error creating a connection in multiple connection handler: ' + str(e))
+            conn.setblocking(False)
+            error = conn.connect_ex((peer[0], peer[1]))
+            if error not in (0, EINPROGRESS):
+                logging.warning('Error creating a connection in multiple connection handler: ' + strerror(error))
+                conn.close()
+                continue
+            selector.register(conn, EVENT_WRITE)
+
+        deadline = time() + CONNECT_TIMEOUT
+        while selector.get_map() and time() < deadline:
+            for key, _ in selector.select(deadline - time()):
+                conn = key.fileobj
+                selector.unregister(conn)
+
+                error = conn.getsockopt(SOL_SOCKET, SO_ERROR)
+                if error:
+                    logging.warning('Error creating a connection in multiple connection handler: ' +
+                                    strerror(error))
+                    conn.close()
+                else:
+                    self.peer_connections.append(conn)
+
+        for key in list(selector.get_map().values()):
+            logging.warning('Timed out creating a connection in multiple connection handler')
+            key.fileobj.close()
+        selector.close()
+
+    def _exchange(self, data, response):
+        """
+        _exchange()
+
+        Sends data to every peer at the same time and, if asked to,
+        collects their responses as they arrive. A peer that fails or does
+        not answer before the timeout is dropped from the results.
+
+        :param data: <str> data to send.
+        :param response: <boolean> Whether a response is expected.
+
+        :return: <dict<Connection Object, dict>> The JSON Object
+            representation of the data received from each peer that
+            answered.
+        """
+
+        message = self._frame(data)
+
+        selector = DefaultSelector()
+        for conn in self.peer_connections:
+            # The data to write, the header or payload being read, the
+            # number of bytes of it received so far, its size and the codec
+            # of the payload once the header has been read.
+            selector.register(conn, EVENT_WRITE, [memoryview(message), None, 0, FRAME_HEADER.size, None])
+
+        responses = {}
+        deadline = time() + RESPONSE_TIMEOUT
+        while selector.get_map() and time() < deadline:
+            for key, events in selector.select(deadline - time()):
+                conn = key.fileobj
+                state = key.data
+
+                try:
+                    if events & EVENT_WRITE:
+                        sent = conn.send(state[0])
+                        state[0] = state[0][sent:]
+                        if len(state[0]) == 0:
+                            if response:
+                                state[1] = bytearray()
+                                selector.modify(conn, EVENT_READ, state)
+                            else:
+                                selector.unregister(conn)
+                        continue
+
+                    amount = conn.recv_into(grow_buffer(state[1], state[2], state[3]))
+                    if amount == 0:
+                        raise ConnectionError('Connection closed by peer')
+                    state[2] += amount
+
+                    if state[2] < state[3]:
+                        continue
+
+                    if state[4] is None:
+                        # The header is complete so read the payload next.
+                        state[3], state[4] = read_header(state[1])
+                        state[1] = bytearray()
+                        state[2] = 0
+                    if state[2] == state[3]:
+                        responses[conn] = state[4].decode(state[1])
+                        selector.unregister(conn)
+                except Exception as e:
+                    logging.warning('Error exchanging data with peer: ' + str(e))
+                    selector.unregister(conn)
+
+        if selector.get_map():
+            logging.warning('Timed out waiting on %s peers', len(selector.get_map()))
+        selector.close()
+
+        for conn in self.peer_connections:
+            conn.close()
+
+        return responses
 
     def send_with_response(self, data):
         """
@@ -174,16 +422,26 @@ class MultipleConnectionHandler(ConnectionHandler):
         :param data: <str> data to send.
 
         :return: <list<dict>> A list of the JSON Object representation of the data
-            that was received from each node.
+            that was received from each node that answered in time.
         """
 
         peer_responses = []
 
+        if self.pool is not None:
+            requests = [conn.submit(data) for conn in self.peer_connections]
+
+            deadline = time() + RESPONSE_TIMEOUT
+            for conn, request in zip(self.peer_connections, requests):
+                received_data = conn.wait(request, max(deadline - time(), 0))
+                if received_data is not None:
+                    peer_responses.append(received_data)
+
+            return peer_responses
+
+        responses = self._exchange(data, True)
         for conn in self.peer_connections:
-            self._send(conn, data)
-            received_data = self._recv(conn)
-            conn.close()
-            peer_responses.append(received_data)
+            if conn in responses:
+                peer_responses.append(responses[conn])
 
         return peer_responses
 
@@ -196,6 +454,517 @@ class MultipleConnectionHandler(ConnectionHandler):
         :param data: <str> data to send.
         """
 
-        for conn in self.peer_connections:
-            self._send(conn, data)
-            conn.close()
+        if self.pool is not None:
+            for conn in self.peer_connections:
+                conn.send_wout_response(data)
+
+            return
+
+        self._exchange(data, False)
+
+
+class FrameReader():
+    """
+    FrameReader
+    """
+
+    def __init__(self, conn):
+        """
+        __init__()
+
+        The constructor for the FrameReader object. This reads consecutive
+        frames off of a connection that is used for more than one message.
+
+        :param conn: <Connection Object> The connection to read from.
+        """
+
+        self.conn = conn
+        self.codec = None
+
+    def read(self):
+        """
+        read()
+
+        Reads the next frame off of the connection. The codec of the frame
+        is kept in the codec attribute.
+
+        :return: <dict> JSON Object representation of the data.
+
+        :raises ConnectionError: if the connection has been closed.
+        """
+
+        size, self.codec = read_header(recv_exactly(self.conn, FRAME_HEADER.size))
+
+        return self.codec.decode(recv_exactly(self.conn, size))
+
+
+class ChannelConnection():
+    """
+    ChannelConnection
+    """
+
+    def __init__(self, channel, request_id, codec):
+        """
+        __init__()
+
+        The constructor for the ChannelConnection object. This stands in
+        for a socket when a task is handling a request that came in on a
+        channel so that its replies are tagged with the request ID.
+
+        :param channel: <Channel Object> The channel the request came in on.
+        :param request_id: <int> The ID of the request.
+        :param codec: <Codec Object> The codec the request was sent with,
+            which replies are sent with as well.
+        """
+
+        self.channel = channel
+        self.request_id = request_id
+        self.codec = codec
+        self.inbox = Queue()
+
+    def send_message(self, data):
+        """
+        send_message()
+
+        Sends a reply to the request.
+
+        :param data: <str> Data to send JSON Object
+        """
+
+        self.channel.write(self.request_id, data, self.codec)
+
+    def recv_message(self):
+        """
+        recv_message()
+
+        Waits for the next message that is sent with the request ID.
+
+        :return: <dict> JSON Object representation of the data or None if
+            nothing arrives in time.
+        """
+
+        try:
+            return self.inbox.get(timeout=RESPONSE_TIMEOUT)
+        except Empty:
+            return None
+
+    def close(self):
+        """
+        close()
+
+        Marks the request as finished. The channel stays open.
+        """
+
+        self.channel.finish(self.request_id)
+
+
+class Channel(ConnectionHandler, Thread):
+    """
+    Channel
+    """
+
+    def __init__(self, conn, dispatch):
+        """
+        __init__()
+
+        The constructor for the Channel object. A channel is a connection
+        that a peer keeps open to send many requests over. Every frame
+        holds a request ID and the data so that requests can be in flight
+        at the same time.
+
+        :param conn: <Connection Object> The connection of the channel.
+        :param dispatch: <Function Object> The function that new requests
+            are handed to along with their ChannelConnection.
+        """
+
+        ConnectionHandler.__init__(self)
+        Thread.__init__(self)
+
+        self.conn = conn
+        self.dispatch = dispatch
+
+        self.write_lock = Lock()
+        self.requests_lock = Lock()
+        self.requests = {}
+
+        # The peer waits for this before sending requests so that none of
+        # them are read along with the request that opened the channel.
+        self.write(None, 'ACK')
+
+        self.daemon = True
+        self.start()
+
+    def run(self):
+        """
+        run()
+
+        Reads frames off of the channel. Frames for a request that is
+        still being handled are passed to it and all others start a new
+        request.
+        """
+
+        reader = FrameReader(self.conn)
+
+        try:
+            while True:
+                request_id, data = reader.read()
+
+                with self.requests_lock:
+                    request = self.requests.get(request_id)
+                    if request is None:
+                        request = ChannelConnection(self, request_id, reader.codec)
+                        self.requests[request_id] = request
+                        request_id = None
+
+                if request_id is None:
+                    self.dispatch(data, request)
+                else:
+                    request.inbox.put(data)
+        except Exception as e:
+            logging.debug('Channel closed: ' + str(e))
+        finally:
+            self.conn.close()
+
+            with self.requests_lock:
+                for request in self.requests.values():
+                    request.inbox.put(None)
+
+    def write(self, request_id, data, codec=None):
+        """
+        write()
+
+        Sends data for a request over the channel.
+
+        :param request_id: <int> The ID of the request.
+        :param data: <str> Data to send JSON Object
+        :param codec: <Codec Object> The codec to encode the data with.
+        """
+
+        try:
+            with self.write_lock:
+                self.conn.sendall(self._frame([request_id, data], codec))
+        except Exception as e:
+            logging.warning('Error sending data to network: ' + str(e))
+
+    def finish(self, request_id):
+        """
+        finish()
+
+        Forgets a request once it has been handled.
+
+        :param request_id: <int> The ID of the request.
+        """
+
+        with self.requests_lock:
+            self.requests.pop(request_id, None)
+
+
+class PeerConnection(ConnectionHandler):
+    """
+    PeerConnection
+    """
+
+    def __init__(self, host, port, codec=JSON_CODEC):
+        """
+        __init__()
+
+        The constructor for the PeerConnection object. This is the client
+        side of a channel to a single peer. The connection is opened when
+        it is first needed and reopened with an exponential backoff after
+        it fails.
+
+        :param host: <str> The host of the peer.
+        :param port: <int> The port of the peer.
+        :param codec: <Codec Object> The codec to send requests with.
+        """
+
+        ConnectionHandler.__init__(self)
+
+        self.host = host
+        self.port = port
+        self.codec = codec
+
+        self.conn = None
+        self.lock = Lock()
+
+        self.request_ids = count()
+        self.pending = {}
+
+        self.backoff = 0
+        self.retry_at = 0
+
+    def _connect(self):
+        """
+        _connect()
+
+        Opens the channel if it is not already open. The lock must be held.
+
+        :return: <boolean> Whether the channel is open.
+        """
+
+        if self.conn is not None:
+            return True
+
+        if time() < self.retry_at:
+            return False
+
+        conn = None
+        try:
+            conn = create_connection((self.host, self.port), CONNECT_TIMEOUT)
+            # The channel is always opened with JSON, which every node reads.
+            conn.sendall(self._frame(OPEN_CHANNEL(), JSON_CODEC))
+
+            reader = FrameReader(conn)
+            if reader.read() != [None, 'ACK']:
+                raise ConnectionError('Channel was not opened')
+            conn.settimeout(None)
+        except (OSError, ValueError) as e:
+            if conn is not None:
+                conn.close()
+            logging.warning('Error creating a connection to %s:%s: %s', self.host, self.port, str(e))
+            self.backoff = min(max(self.backoff * 2, RECONNECT_BACKOFF_MIN), RECONNECT_BACKOFF_MAX)
+            self.retry_at = time() + self.backoff
+            return False
+
+        self.conn = conn
+        self.backoff = 0
+
+        Thread(target=self._read_responses, args=(conn, reader), daemon=True).start()
+
+        return True
+
+    def _disconnect(self, conn):
+        """
+        _disconnect()
+
+        Closes a connection of the channel and fails every request that is
+        waiting on it.
+
+        :param conn: <Connection Object> The connection to close.
+        """
+
+        with self.lock:
+            if self.conn is conn:
+                self.conn = None
+
+            failed = [request_id for request_id in self.pending if self.pending[request_id][0] is conn]
+            for request_id in failed:
+                self.pending.pop(request_id)[1].put(None)
+
+        conn.close()
+
+    def _read_responses(self, conn, reader):
+        """
+        _read_responses()
+
+        Reads the responses off of a connection and hands them to the
+        requests that are waiting on them.
+
+        :param conn: <Connection Object> The connection to read from.
+        :param reader: <FrameReader Object> The reader of the connection.
+        """
+
+        try:
+            while True:
+                request_id, data = reader.read()
+
+                with self.lock:
+                    request = self.pending.pop(request_id, None)
+
+                if request is not None:
+                    request[1].put(data)
+        except Exception as e:
+            logging.debug('Channel to %s:%s closed: %s', self.host, self.port, str(e))
+
+        self._disconnect(conn)
+
+    def submit(self, data, response=True):
+        """
+        submit()
+
+        Sends a request over the channel without waiting for the response.
+
+        :param data: <str> data to send.
+        :param response: <boolean> Whether a response is expected.
+
+        :return: <tuple<int, Queue>> The request ID and the queue that the
+            response will be put on, or None if the request could not be
+            sent.
+        """
+
+        request_id = next(self.request_ids)
+        slot = Queue(1) if response else None
+
+        with self.lock:
+            if not self._connect():
+                return None
+
+            conn = self.conn
+            if slot is not None:
+                self.pending[request_id] = (conn, slot)
+
+            try:
+                conn.sendall(self._frame([request_id, data]))
+                sent = True
+            except OSError as e:
+                logging.warning('Error sending data to network: ' + str(e))
+                sent = False
+
+        if not sent:
+            self._disconnect(conn)
+            return None
+
+        return request_id, slot
+
+    def wait(self, request, timeout=RESPONSE_TIMEOUT):
+        """
+        wait()
+
+        Waits for the response to a request.
+
+        :param request: <tuple<int, Queue>> The request from submit.
+        :param timeout: <float> The number of seconds to wait.
+
+        :return: <dict> JSON Object representation of the data or None if
+            no response arrives in time.
+        """
+
+        if request is None:
+            return None
+
+        request_id, slot = request
+
+        try:
+            return slot.get(timeout=timeout)
+        except Empty:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            return None
+
+    def send_with_response(self, data):
+        """
+        send_with_response()
+
+        Send data and expect a response from peer
+
+        :param data: <str> data to send.
+
+        :return: <dict> JSON Object representation of the data.
+        """
+
+        return self.wait(self.submit(data))
+
+    def send_wout_response(self, data):
+        """
+        send_wout_response()
+
+        Send data and don't expect a response back
+
+        :param data: <str> data to send.
+        """
+
+        self.submit(data, False)
+
+    def close(self):
+        """
+        close()
+
+        Closes the channel.
+        """
+
+        with self.lock:
+            conn = self.conn
+
+        if conn is not None:
+            self._disconnect(conn)
+
+
+class ConnectionPool():
+    """
+    ConnectionPool
+    """
+
+    def __init__(self, codec=JSON_CODEC):
+        """
+        __init__()
+
+        The constructor for the ConnectionPool object. The pool keeps one
+        long-lived PeerConnection for each peer.
+
+        :param codec: <Codec Object> The codec to use with peers that
+            support it. JSON is used with all other peers.
+        """
+
+        self.codec = codec
+        self.codecs = {}
+        self.peers = {}
+        self.lock = Lock()
+
+    def get(self, peer):
+        """
+        get()
+
+        Retrieves the connection to a peer, creating it if needed.
+
+        :param peer: <tuple<str, int>> The host and port of the peer.
+
+        :return: <PeerConnection Object> The connection.
+        """
+
+        peer = tuple(peer)
+
+        with self.lock:
+            connection = self.peers.get(peer)
+            if connection is None:
+                connection = PeerConnection(peer[0], peer[1], self.codecs.get(peer, JSON_CODEC))
+                self.peers[peer] = connection
+
+        return connection
+
+    def get_codec(self, peer):
+        """
+        get_codec()
+
+        Retrieves the codec that is used with a peer.
+
+        :param peer: <tuple<str, int>> The host and port of the peer.
+
+        :return: <Codec Object> The codec.
+        """
+
+        return self.codecs.get(tuple(peer), JSON_CODEC)
+
+    def advertise(self, peer, names):
+        """
+        advertise()
+
+        Records the codecs that a peer supports and picks the codec to use
+        with it.
+
+        :param peer: <tuple<str, int>> The host and port of the peer.
+        :param names: <list<str>> The names of the codecs the peer supports.
+        """
+
+        peer = tuple(peer)
+        codec = self.codec if self.codec.name in names else JSON_CODEC
+
+        with self.lock:
+            self.codecs[peer] = codec
+            if peer in self.peers:
+                self.peers[peer].codec = codec
+
+    def remove(self, peer):
+        """
+        remove()
+
+        Closes and forgets the connection to a peer.
+
+        :param peer: <tuple<str, int>> The host and port of the peer.
+        """
+
+        with self.lock:
+            connection = self.peers.pop(tuple(peer), None)
+            self.codecs.pop(tuple(peer), None)
+
+        if connection is not None:
+            connection.close()
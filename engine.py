@@ -0,0 +1,200 @@
+"""
+engine.py
+
+This file holds the multi-process proof of work engine. The nonce space
+is split into ranges that are searched by a pool of worker processes so
+that mining is not limited to a single core by the GIL.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+import hashlib
+import logging
+from multiprocessing import get_context
+from queue import Empty
+from random import randrange
+from sys import maxsize
+from time import time
+
+# The number of nonces a worker hashes between checks for an abort.
+SEARCH_BATCH_SIZE = 10000
+
+
+def search(worker_id, jobs, results, generation, hashes):
+    """
+    search()
+
+    The main loop of a worker process. It takes jobs off of its queue and
+    hashes every nonce in the given range until a valid proof is found,
+    the range is exhausted or the job is aborted.
+
+    :param worker_id: <int> The index of this worker.
+    :param jobs: <Queue> The queue that jobs for this worker arrive on.
+    :param results: <Queue> The queue that valid proofs are reported on.
+    :param generation: <Value> The generation of the current job. A job
+        is aborted as soon as this no longer matches.
+    :param hashes: <Array> The number of hashes computed by each worker.
+    """
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+
+        job_generation, prefix, difficulty, start, end = job
+        if job_generation != generation.value:
+            continue
+
+        prefix_hash = hashlib.sha256(prefix)
+        target = '0' * difficulty
+
+        proof = start
+        while proof < end:
+            stop = min(proof + SEARCH_BATCH_SIZE, end)
+
+            for nonce in range(proof, stop):
+                guess_hash = prefix_hash.copy()
+                guess_hash.update(str(nonce).encode())
+
+                if guess_hash.hexdigest()[:difficulty] == target:
+                    results.put((job_generation, worker_id, nonce))
+                    break
+            else:
+                nonce = stop
+
+            hashes[worker_id] += nonce - proof
+            if nonce != stop or job_generation != generation.value:
+                break
+
+            proof = stop
+
+
+class ProofEngine:
+    """
+    ProofEngine
+    """
+
+    def __init__(self, num_workers):
+        """
+        __init__()
+
+        The constructor for a ProofEngine object. This starts the worker
+        processes, which wait until a template is given to them.
+
+        :param num_workers: <int> The number of worker processes to use.
+        """
+
+        context = get_context('spawn')
+
+        self.num_workers = num_workers
+        self.generation = context.Value('q', 0)
+        self.hashes = context.Array('Q', num_workers)
+        self.results = context.Queue()
+        self.jobs = []
+
+        # Hash counts are sampled when a job starts and stops so that the
+        # hashrates of the most recent job can be reported at any time.
+        self.job_started = time()
+        self.job_stopped = None
+        self.job_hashes = [0] * num_workers
+
+        for worker_id in range(num_workers):
+            jobs = context.Queue()
+            worker = context.Process(target=search,
+                                     args=(worker_id, jobs, self.results, self.generation, self.hashes),
+                                     daemon=True)
+            worker.start()
+            self.jobs.append(jobs)
+
+        logging.info('Started proof of work engine with %s workers', num_workers)
+
+    def start(self, template):
+        """
+        start()
+
+        Aborts any search that is in progress and starts searching the
+        given template. The nonce space is partitioned into one range per
+        worker.
+
+        :param template: <BlockTemplate Object> The template to search.
+        """
+
+        with self.generation.get_lock():
+            self.generation.value += 1
+            job_generation = self.generation.value
+
+        self.job_started = time()
+        self.job_stopped = None
+        self.job_hashes = list(self.hashes)
+
+        span = (maxsize + 1) // self.num_workers
+        offset = randrange(span)
+
+        for worker_id, jobs in enumerate(self.jobs):
+            start = worker_id * span + offset
+            end = (worker_id + 1) * span
+            jobs.put((job_generation, template.prefix, template.difficulty, start, end))
+
+    def stop(self):
+        """
+        stop()
+
+        Aborts the search that is in progress.
+        """
+
+        with self.generation.get_lock():
+            self.generation.value += 1
+
+        if self.job_stopped is None:
+            self.job_stopped = time()
+
+    def wait(self, timeout):
+        """
+        wait()
+
+        Waits for a worker to report a valid proof for the current
+        template. Proofs found for an older template are discarded.
+
+        :param timeout: <float> The number of seconds to wait.
+
+        :return: <int> The proof or None if none was found in time.
+        """
+
+        deadline = time() + timeout
+
+        while True:
+            try:
+                job_generation, worker_id, proof = self.results.get(timeout=max(0, deadline - time()))
+            except Empty:
+                return None
+
+            if job_generation == self.generation.value:
+                logging.debug('Worker %s found proof %s', worker_id, proof)
+                return proof
+
+    def get_hashrates(self):
+        """
+        get_hashrates()
+
+        Computes the hashrate of each worker over the most recent job.
+
+        :return: <list<float>> The hashes per second of each worker.
+        """
+
+        end = time() if self.job_stopped is None else self.job_stopped
+        elapsed = max(end - self.job_started, 1e-9)
+
+        return [(current - start) / elapsed for current, start in zip(list(self.hashes), self.job_hashes)]
+
+    def shutdown(self):
+        """
+        shutdown()
+
+        Stops all of the worker processes.
+        """
+
+        self.stop()
+        for jobs in self.jobs:
+            jobs.put(None)
@@ -11,23 +11,88 @@ Santa Clara University
 
 # Standard library imports
 from copy import deepcopy
-from threading import Lock
 
 # Local imports
+from macros import MAX_REORG_DEPTH
+from rwlock import RWLock, ShardedLock
 from wallet import Wallet
 
 
+# Marks a coin or transaction that has been removed in a HistoryOverlay.
+TOMBSTONE = object()
+
+
+class UndoRecord:
+    """
+    UndoRecord
+    """
+
+    __slots__ = ('transaction_id', 'spent', 'created', 'wallet_added', 'wallet_removed')
+
+    def __init__(self, transaction_id, spent, created, wallet_added, wallet_removed):
+        """
+        __init__()
+
+        The constructor for an UndoRecord object. An undo record holds
+        what applying a transaction changed so that it can be undone
+        without working it out again from the transaction.
+
+        :param transaction_id: <str> The UUID of the transaction.
+        :param spent: <tuple<Coin Object>> The coins the transaction spent.
+        :param created: <tuple<str>> The UUIDs of the coins the transaction
+            created.
+        :param wallet_added: <tuple<str>> The UUIDs of the coins that were
+            added to the wallet of this node.
+        :param wallet_removed: <tuple<Coin Object>> The coins that were
+            removed from the wallet of this node.
+        """
+
+        self.transaction_id = transaction_id
+        self.spent = spent
+        self.created = created
+        self.wallet_added = wallet_added
+        self.wallet_removed = wallet_removed
+
+
+def create_undo_record(history, transaction):
+    """
+    create_undo_record()
+
+    Creates the undo record of a transaction that has not been applied to
+    the history yet.
+
+    :param history: <History Object> The history the transaction will be
+        applied to.
+    :param transaction: <Transaction Object> The transaction.
+
+    :return: <UndoRecord Object> The undo record.
+    """
+
+    inputs = transaction.get_inputs()
+    spent = tuple(history.get_coin(coin.get_uuid()) or coin for coin in inputs)
+    created = tuple(coin.get_uuid() for coin in transaction.get_all_output_coins())
+
+    our_new_coins = transaction.get_output_coins(history.uuid)
+    wallet_added = tuple(coin.get_uuid() for coin in our_new_coins) if our_new_coins is not None else ()
+    wallet_removed = tuple(inputs) if transaction.get_sender() == history.uuid else ()
+
+    return UndoRecord(transaction.get_uuid(), spent, created, wallet_added, wallet_removed)
+
+
 class History:
     """
     History
     """
 
     class __History:
-        history_lock = Lock()
+        history_lock = RWLock()
+        coin_locks = ShardedLock()
 
         def __init__(self, uuid):
             self.coins = {}
             self.transactions = {}
+            self.undo_records = {}
+            self.undo_blocks = {}
 
             self.uuid = uuid
             self.wallet = Wallet()
@@ -79,15 +144,94 @@ class History:
             except KeyError:
                 pass
 
+        def get_undo_record(self, uuid):
+            return self.undo_records.get(uuid)
+
+        def apply_transaction(self, transaction):
+            record = create_undo_record(self, transaction)
+
+            for coin in record.spent:
+                self.remove_coin(coin.get_uuid())
+
+            for coin in transaction.get_all_output_coins():
+                self.add_coin(coin)
+
+            self.add_transaction(transaction)
+            self.undo_records[record.transaction_id] = record
+
+            return record
+
+        def undo_transaction(self, transaction):
+            record = self.undo_records.pop(transaction.get_uuid(), None)
+            if record is None:
+                record = create_undo_record(self, transaction)
+                record.spent = tuple(transaction.get_inputs())
+
+            for uuid in record.created:
+                self.remove_coin(uuid)
+
+            for coin in record.spent:
+                self.add_coin(coin)
+
+            self.transactions.pop(record.transaction_id, None)
+
+            for coin in record.wallet_removed:
+                self.wallet.add_coin(coin)
+
+            for uuid in record.wallet_added:
+                self.wallet.remove_coin(uuid)
+
+        def confirm_block(self, block):
+            self.undo_blocks[block.index] = tuple(transaction.get_uuid() for transaction in block.transactions)
+
+            depth = block.index - MAX_REORG_DEPTH
+            for index in [index for index in self.undo_blocks if index <= depth]:
+                for uuid in self.undo_blocks.pop(index):
+                    self.undo_records.pop(uuid, None)
+
         def get_lock(self):
             return self.history_lock
 
+        def get_coin_locks(self):
+            return self.coin_locks
+
         def get_wallet(self):
             return self.wallet
 
+        def apply_changes(self, coins, transactions, undo_records, wallet_changes):
+            for uuid, coin in coins.items():
+                if coin is TOMBSTONE:
+                    self.coins.pop(uuid, None)
+                else:
+                    self.coins[uuid] = coin
+
+            for uuid, transaction in transactions.items():
+                if transaction is TOMBSTONE:
+                    self.transactions.pop(uuid, None)
+                else:
+                    self.transactions[uuid] = transaction
+
+            for uuid, record in undo_records.items():
+                if record is TOMBSTONE:
+                    self.undo_records.pop(uuid, None)
+                else:
+                    self.undo_records[uuid] = record
+
+            for add, coin in wallet_changes:
+                if add:
+                    self.wallet.add_coin(coin)
+                else:
+                    self.wallet.remove_coin(coin if isinstance(coin, str) else coin.get_uuid())
+
+        def attach_store(self, store):
+            self.coins = store.coins
+            self.transactions = store.transactions
+
         def reset(self):
-            self.coins = {}
-            self.transactions = {}
+            self.coins.clear()
+            self.transactions.clear()
+            self.undo_records = {}
+            self.undo_blocks = {}
 
             self.wallet = Wallet()
 
@@ -192,17 +336,73 @@ class History:
 
         History.instance.remove_transaction(uuid)
 
+    def apply_transaction(self, transaction):
+        """
+        apply_transaction()
+
+        Spends the input coins of a transaction, adds its output coins and
+        adds the transaction to the history. An undo record is kept so that
+        the transaction can be undone later.
+
+        :param transaction: <Transaction Object> The transaction to apply.
+
+        :return: <UndoRecord Object> The undo record of the transaction.
+        """
+
+        return History.instance.apply_transaction(transaction)
+
+    def undo_transaction(self, transaction):
+        """
+        undo_transaction()
+
+        Undoes a transaction with its undo record, or with the transaction
+        itself if it was added without one.
+
+        :param transaction: <Transaction Object> The transaction to undo.
+        """
+
+        History.instance.undo_transaction(transaction)
+
+    def confirm_block(self, block):
+        """
+        confirm_block()
+
+        Records that the transactions of a block are in the chain. Undo
+        records are only kept for the most recent blocks, so those of
+        blocks deeper than the maximum reorganization are dropped. Their
+        transactions can still be undone from the transactions alone.
+
+        :param block: <Block Object> The block that was added to the chain.
+        """
+
+        History.instance.confirm_block(block)
+
     def get_lock(self):
         """
         get_lock()
 
         Retrieves the lock that should be used when accessing the history.
+        Holding it in a with statement changes the history alone, while
+        read() lets other readers in at the same time.
 
-        :return: <Lock> The lock object.
+        :return: <RWLock> The lock object.
         """
 
         return History.instance.get_lock()
 
+    def get_coin_locks(self):
+        """
+        get_coin_locks()
+
+        Retrieves the locks of the coins and transactions. A thread that
+        only holds the history lock for reading must hold the locks of
+        every coin and transaction it changes.
+
+        :return: <ShardedLock> The lock object.
+        """
+
+        return History.instance.get_coin_locks()
+
     def get_copy(self):
         """
         get_copy()
@@ -215,6 +415,18 @@ class History:
 
         return deepcopy(History.instance)
 
+    def get_overlay(self):
+        """
+        get_overlay()
+
+        Creates an overlay on top of the inner History instance so that it
+        can be used for checks and temporary situations without copying it.
+
+        :return: <HistoryOverlay Object> The overlay.
+        """
+
+        return HistoryOverlay(History.instance)
+
     def replace_history(self, history):
         """
         replace_history()
@@ -238,6 +450,19 @@ class History:
 
         return History.instance.get_wallet()
 
+    def attach_store(self, store):
+        """
+        attach_store()
+
+        Keeps the coins and transactions of the history in a coin store
+        instead of in memory. Whatever the store already holds becomes the
+        history.
+
+        :param store: <CoinStore Object> The store to use.
+        """
+
+        History.instance.attach_store(store)
+
     def reset(self):
         """
         reset()
@@ -246,3 +471,292 @@ class History:
         """
 
         History.instance.reset()
+
+
+class HistoryOverlay:
+    """
+    HistoryOverlay
+    """
+
+    def __init__(self, base):
+        """
+        __init__()
+
+        The constructor for a HistoryOverlay object. An overlay records
+        the coins and transactions that are added and removed on top of a
+        base history without changing it. Lookups fall through to the base
+        for anything the overlay has not touched. The changes are applied
+        to the base with commit or thrown away by dropping the overlay.
+        The base should not change while the overlay is in use.
+
+        :param base: <History Object> The inner History instance or another
+            overlay to build on.
+        """
+
+        self.base = base
+        self.uuid = base.uuid
+
+        self.coins = {}
+        self.transactions = {}
+        self.undo_records = {}
+
+        # The changes to make to the wallet of this node as (whether the
+        # coin is added, coin) pairs. The UUID of the coin may be given
+        # instead when it is removed.
+        self.wallet_changes = []
+
+    def get_coin(self, uuid):
+        """
+        get_coin()
+
+        Retrieves the given coin.
+
+        :param uuid: <str> The UUID of the coin.
+
+        :return: <Coin Object> The coin if it exists or None.
+        """
+
+        coin = self.coins.get(uuid)
+        if coin is None:
+            return self.base.get_coin(uuid)
+
+        return None if coin is TOMBSTONE else coin
+
+    def get_transactions(self):
+        """
+        get_transactions()
+
+        Retrieves all the transactions.
+
+        :return: <dict<str, Transaction Object>> The transactions visible
+            through the overlay.
+        """
+
+        transactions = dict(self.base.get_transactions())
+        for uuid, transaction in self.transactions.items():
+            if transaction is TOMBSTONE:
+                transactions.pop(uuid, None)
+            else:
+                transactions[uuid] = transaction
+
+        return transactions
+
+    def get_transaction(self, uuid):
+        """
+        get_transaction()
+
+        Retrieves the given transaction
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :return <Transaction Object> The transaction if it exists
+            or None.
+        """
+
+        transaction = self.transactions.get(uuid)
+        if transaction is None:
+            return self.base.get_transaction(uuid)
+
+        return None if transaction is TOMBSTONE else transaction
+
+    def add_coin(self, coin):
+        """
+        add_coin()
+
+        Adds a new coin to the overlay.
+
+        :param coin: <Coin Object> The new coin to add.
+        """
+
+        self.coins[coin.get_uuid()] = coin
+
+    def add_transaction(self, transaction):
+        """
+        add_transaction()
+
+        Adds a new transaction to the overlay along with the changes it
+        makes to the wallet.
+
+        :param transaction: <Transaction Object> The new
+            transaction to add.
+        """
+
+        self.transactions[transaction.get_uuid()] = transaction
+
+        our_new_coins = transaction.get_output_coins(self.uuid)
+        if our_new_coins is not None:
+            for coin in our_new_coins:
+                self.wallet_changes.append((True, coin))
+
+        if transaction.get_sender() == self.uuid:
+            for coin in transaction.get_inputs():
+                self.wallet_changes.append((False, coin))
+
+    def remove_coin(self, uuid):
+        """
+        remove_coin()
+
+        Removes a coin from the overlay.
+
+        :param uuid: <str> The UUID of the coin.
+        """
+
+        self.coins[uuid] = TOMBSTONE
+
+    def remove_transaction(self, uuid):
+        """
+        remove_transaction()
+
+        Removes a transaction from the overlay along with the changes it
+        made to the wallet.
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :raises KeyError: if the transaction does not exist.
+        """
+
+        transaction = self.get_transaction(uuid)
+        if transaction is None:
+            raise KeyError(uuid)
+
+        if transaction.get_sender() == self.uuid:
+            for coin in transaction.get_inputs():
+                self.wallet_changes.append((True, coin))
+
+        our_bad_coins = transaction.get_output_coins(self.uuid)
+        if our_bad_coins is not None:
+            for coin in our_bad_coins:
+                self.wallet_changes.append((False, coin))
+
+        self.transactions[uuid] = TOMBSTONE
+
+    def get_undo_record(self, uuid):
+        """
+        get_undo_record()
+
+        Retrieves the undo record of a transaction.
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :return: <UndoRecord Object> The undo record if it exists or None.
+        """
+
+        record = self.undo_records.get(uuid)
+        if record is None:
+            return self.base.get_undo_record(uuid)
+
+        return None if record is TOMBSTONE else record
+
+    def apply_transaction(self, transaction):
+        """
+        apply_transaction()
+
+        Spends the input coins of a transaction, adds its output coins and
+        adds the transaction to the overlay. An undo record is kept so that
+        the transaction can be undone later.
+
+        :param transaction: <Transaction Object> The transaction to apply.
+
+        :return: <UndoRecord Object> The undo record of the transaction.
+        """
+
+        record = create_undo_record(self, transaction)
+
+        for coin in record.spent:
+            self.remove_coin(coin.get_uuid())
+
+        for coin in transaction.get_all_output_coins():
+            self.add_coin(coin)
+
+        self.add_transaction(transaction)
+        self.undo_records[record.transaction_id] = record
+
+        return record
+
+    def undo_transaction(self, transaction):
+        """
+        undo_transaction()
+
+        Undoes a transaction with its undo record, or with the transaction
+        itself if it was added without one.
+
+        :param transaction: <Transaction Object> The transaction to undo.
+        """
+
+        record = self.get_undo_record(transaction.get_uuid())
+        if record is None:
+            record = create_undo_record(self, transaction)
+            record.spent = tuple(transaction.get_inputs())
+        else:
+            self.undo_records[record.transaction_id] = TOMBSTONE
+
+        for uuid in record.created:
+            self.remove_coin(uuid)
+
+        for coin in record.spent:
+            self.add_coin(coin)
+
+        self.transactions[record.transaction_id] = TOMBSTONE
+
+        for coin in record.wallet_removed:
+            self.wallet_changes.append((True, coin))
+
+        for uuid in record.wallet_added:
+            self.wallet_changes.append((False, uuid))
+
+    def get_lock(self):
+        """
+        get_lock()
+
+        Retrieves the lock that should be used when accessing the history.
+
+        :return: <Lock> The lock object.
+        """
+
+        return self.base.get_lock()
+
+    def get_overlay(self):
+        """
+        get_overlay()
+
+        Creates an overlay on top of this overlay.
+
+        :return: <HistoryOverlay Object> The overlay.
+        """
+
+        return HistoryOverlay(self)
+
+    def apply_changes(self, coins, transactions, undo_records, wallet_changes):
+        """
+        apply_changes()
+
+        Records the changes of an overlay that is built on this one.
+
+        :param coins: <dict<str, Coin Object>> The changed coins.
+        :param transactions: <dict<str, Transaction Object>> The changed
+            transactions.
+        :param undo_records: <dict<str, UndoRecord Object>> The changed
+            undo records.
+        :param wallet_changes: <list<tuple<boolean, Coin Object>>> The
+            changes to the wallet.
+        """
+
+        self.coins.update(coins)
+        self.transactions.update(transactions)
+        self.undo_records.update(undo_records)
+        self.wallet_changes.extend(wallet_changes)
+
+    def commit(self):
+        """
+        commit()
+
+        Applies the changes of the overlay to its base and clears them.
+        The history lock should be held.
+        """
+
+        self.base.apply_changes(self.coins, self.transactions, self.undo_records, self.wallet_changes)
+
+        self.coins = {}
+        self.transactions = {}
+        self.undo_records = {}
+        self.wallet_changes = []
@@ -9,10 +9,43 @@ Santa Clara University
 """
 
 
-BUFFER_SIZE = 256
+# The largest frame payload in bytes that will be accepted from the network.
+# A block holding a full mempool is a few megabytes and nodes fetch the
+# chain a page at a time.
+MAX_FRAME_SIZE = 32 * 1024 * 1024
+
+# The size in bytes that a receive buffer starts at. It grows as the bytes
+# of a frame arrive instead of being allocated whole from its header.
+RECV_BUFFER_SIZE = 64 * 1024
+
+# The number of seconds a new connection has to send its request.
+RECEIVE_TIMEOUT = 10
+
+# The number of seconds to wait when connecting to a peer.
+CONNECT_TIMEOUT = 5
+
+# The number of seconds to wait for the response to a request sent over
+# a peer channel.
+RESPONSE_TIMEOUT = 30
+
+# The bounds in seconds of the delay before reconnecting to a peer.
+RECONNECT_BACKOFF_MIN = 0.1
+RECONNECT_BACKOFF_MAX = 10
 
 REWARD_COIN_VALUE = 5
 
+# The number of most recent blocks whose undo records are kept. Blocks
+# deeper than this are not expected to be rolled back.
+MAX_REORG_DEPTH = 100
+
+# The number of proofs the miner hashes between checks for new
+# transactions and blocks.
+MINE_BATCH_SIZE = 10000
+
+# The number of seconds the miner waits for the proof of work engine
+# before checking for new transactions and blocks.
+MINE_POLL_INTERVAL = 0.05
+
 
 INITIAL_PEERS = [
     ['localhost', 5000],
@@ -20,6 +53,22 @@ INITIAL_PEERS = [
 ]
 
 
+def OPEN_CHANNEL():
+    """
+    OPEN_CHANNEL()
+
+    This function creates a message that turns a connection into a
+    channel that many requests can be sent over.
+
+    :return: <str> The formatted message.
+    """
+
+    return {
+        'action': 'open_channel',
+        'params': []
+    }
+
+
 def RECEIVE_BLOCK(block, host, port):
     """
     RECEIVE_BLOCK()
@@ -195,3 +244,25 @@ def SEND_CHAIN_SECTION(section, status):
         'section': section,
         'status': status
     }
+
+
+def SEND_TRANSACTION_PROOF(header, transaction, path):
+    """
+    SEND_TRANSACTION_PROOF()
+
+    This function creates a message to reply to a get transaction proof
+    request.
+
+    :param header: <BlockHeader Object> The header of the block that holds
+        the transaction.
+    :param transaction: <Transaction Object> The transaction.
+    :param path: <list<list<str>>> The Merkle path of the transaction.
+
+    :return: <str> The formatted message.
+    """
+
+    return {
+        'header': header,
+        'transaction': transaction,
+        'path': path
+    }
@@ -0,0 +1,647 @@
+"""
+mempool.py
+
+This file holds the mempool, which keeps the transactions that are waiting
+to be mined into the next block.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import RLock
+from time import time
+
+# Local imports
+from blockchainConfig import BlockchainConfig
+
+
+config = BlockchainConfig()
+
+
+class Mempool:
+    """
+    Mempool
+    """
+
+    def __init__(self, transactions=(), max_count=None, max_bytes=None, min_fee=None):
+        """
+        __init__()
+
+        The constructor for a Mempool object. Transactions are indexed by
+        their UUID, by the UUIDs of the coins they spend and by the UUIDs
+        of the coins they create. They are mined in order of their fee,
+        which is the value of their SYSTEM outputs, with a transaction
+        always coming after the transactions whose coins it spends. The
+        reward transaction of the block being mined is kept apart from the
+        rest and always comes first.
+
+        :param transactions: <list<Transaction Object>> The transactions to
+            start with.
+        :param max_count: <int> The maximum number of transactions. It is
+            read from the config when not given.
+        :param max_bytes: <int> The maximum total size of the transactions
+            in their string form. It is read from the config when not given.
+        :param min_fee: <int> The lowest fee that is accepted once the
+            mempool is full. It is read from the config when not given.
+        """
+
+        self.max_count = config.get_mempool_max_transactions() if max_count is None else max_count
+        self.max_bytes = config.get_mempool_max_bytes() if max_bytes is None else max_bytes
+        self.min_fee = config.get_mempool_min_fee() if min_fee is None else min_fee
+
+        self.reward = None
+        self.transactions = OrderedDict()
+        self.spent = {}
+        self.created = {}
+
+        # The size and arrival order of every transaction and a heap of
+        # (fee, order, uuid) entries to find the cheapest one. Entries of
+        # removed transactions are skipped when they reach the top.
+        self.sizes = {}
+        self.order = {}
+        self.fees = []
+        self.counter = count()
+        self.bytes = 0
+
+        self._snapshot = None
+
+        for transaction in transactions:
+            self.append(transaction)
+
+    def get_copy(self):
+        """
+        get_copy()
+
+        Creates a copy of the mempool that can be changed without changing
+        this one. The transactions themselves are shared.
+
+        :return: <Mempool Object> The copy of the mempool.
+        """
+
+        mempool = Mempool.__new__(Mempool)
+        mempool.max_count = self.max_count
+        mempool.max_bytes = self.max_bytes
+        mempool.min_fee = self.min_fee
+        mempool.reward = self.reward
+        mempool.transactions = OrderedDict(self.transactions)
+        mempool.spent = dict(self.spent)
+        mempool.created = dict(self.created)
+        mempool.sizes = dict(self.sizes)
+        mempool.order = dict(self.order)
+        mempool.fees = list(self.fees)
+        mempool.counter = count(next(self.counter))
+        mempool.bytes = self.bytes
+        mempool._snapshot = self._snapshot
+
+        return mempool
+
+    def snapshot(self):
+        """
+        snapshot()
+
+        Returns the transactions in the order they should appear in a
+        block. The list is only rebuilt after the mempool changes, so it
+        must not be changed by the caller.
+
+        :return: <list<Transaction Object>> The transactions.
+        """
+
+        if self._snapshot is None:
+            self._snapshot = ([self.reward] if self.reward is not None else []) + self._sorted()
+
+        return self._snapshot
+
+    def _sorted(self):
+        """
+        _sorted()
+
+        Sorts the transactions by their fee while keeping every transaction
+        after the transactions whose coins it spends. Ties are broken by
+        the order the transactions arrived in.
+
+        :return: <list<Transaction Object>> The sorted transactions.
+        """
+
+        waiting = {}
+        children = {}
+        ready = []
+        for uuid, transaction in self.transactions.items():
+            parents = self.get_parents(transaction)
+            for parent in parents:
+                children.setdefault(parent, []).append(uuid)
+
+            if len(parents) == 0:
+                ready.append((-get_fee(transaction), self.order[uuid], uuid))
+            else:
+                waiting[uuid] = len(parents)
+
+        heapify(ready)
+
+        transactions = []
+        while len(ready) > 0:
+            _, _, uuid = heappop(ready)
+            transactions.append(self.transactions[uuid])
+
+            for child in children.get(uuid, ()):
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    heappush(ready, (-get_fee(self.transactions[child]), self.order[child], child))
+
+        return transactions
+
+    def get_parents(self, transaction):
+        """
+        get_parents()
+
+        Finds the waiting transactions that created the coins a transaction
+        spends.
+
+        :param transaction: <Transaction Object> The transaction.
+
+        :return: <set<str>> The UUIDs of the parent transactions.
+        """
+
+        parents = set()
+        for coin in transaction.get_inputs():
+            parent = self.created.get(coin.get_uuid())
+            if parent is not None:
+                parents.add(parent)
+
+        return parents
+
+    def get_descendants(self, uuid):
+        """
+        get_descendants()
+
+        Finds the waiting transactions that spend the coins of a transaction
+        and the ones that spend theirs in turn.
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :return: <list<str>> The UUIDs of the descendants. Every transaction
+            comes before the transaction whose coins it spends.
+        """
+
+        descendants = []
+        found = set()
+
+        # An explicit stack so that long chains of transactions do not hit
+        # the recursion limit. Each entry holds a transaction and the output
+        # coins of it that are left to visit.
+        stack = [(uuid, iter(self.transactions[uuid].get_all_output_coins()))]
+        while len(stack) > 0:
+            parent, coins = stack[-1]
+            for coin in coins:
+                child = self.spent.get(coin.get_uuid())
+                if child is not None and child not in found:
+                    found.add(child)
+                    stack.append((child, iter(self.transactions[child].get_all_output_coins())))
+                    break
+            else:
+                stack.pop()
+                if len(stack) > 0:
+                    descendants.append(parent)
+
+        return descendants
+
+    def get_pending(self):
+        """
+        get_pending()
+
+        Returns the transactions that are waiting to be mined without the
+        reward transaction.
+
+        :return: <list<Transaction Object>> The transactions.
+        """
+
+        return list(self.transactions.values())
+
+    def set_reward(self, reward_transaction):
+        """
+        set_reward()
+
+        Sets the reward transaction of the block being mined.
+
+        :param reward_transaction: <RewardTransaction Object> The reward
+            transaction.
+        """
+
+        self.reward = reward_transaction
+        self._snapshot = None
+
+    def append(self, transaction):
+        """
+        append()
+
+        Adds a transaction to the mempool without checking its limits. A
+        reward transaction replaces the current one instead.
+
+        :param transaction: <Transaction Object> The transaction to add.
+        """
+
+        if transaction.get_sender() == 'SYSTEM':
+            self.set_reward(transaction)
+            return
+
+        uuid = transaction.get_uuid()
+        if uuid in self.transactions:
+            self.discard(uuid)
+
+        self.transactions[uuid] = transaction
+        for coin in transaction.get_inputs():
+            self.spent[coin.get_uuid()] = uuid
+        for coin in transaction.get_all_output_coins():
+            self.created[coin.get_uuid()] = uuid
+
+        self.sizes[uuid] = len(transaction.to_string())
+        self.bytes += self.sizes[uuid]
+        self.order[uuid] = next(self.counter)
+        heappush(self.fees, (get_fee(transaction), self.order[uuid], uuid))
+
+        self._snapshot = None
+
+    def is_full(self):
+        """
+        is_full()
+
+        Checks whether the mempool has reached one of its limits.
+
+        :return: <boolean> Whether the mempool is full.
+        """
+
+        return len(self.transactions) >= self.max_count or self.bytes >= self.max_bytes
+
+    def accepts(self, transaction):
+        """
+        accepts()
+
+        Checks cheaply whether a transaction has any chance of getting into
+        the mempool. Once the mempool is full a transaction must pay at
+        least the minimum fee and more than the cheapest waiting one. The
+        mempool is not changed, so this can be called by many threads at
+        once, and add() makes the final decision.
+
+        :param transaction: <Transaction Object> The transaction.
+
+        :return: <boolean> Whether the transaction may be added.
+        """
+
+        if not self.is_full():
+            return True
+
+        fee = get_fee(transaction)
+        if fee < self.min_fee:
+            return False
+
+        # The top of the heap may belong to a removed transaction, whose
+        # fee is still no more than that of the cheapest waiting one.
+        fees = self.fees
+
+        return len(fees) == 0 or fee > fees[0][0]
+
+    def _cheapest(self):
+        """
+        _cheapest()
+
+        Finds the waiting transaction with the lowest fee.
+
+        :return: <tuple<int, int, str>> The fee, arrival order and UUID of
+            the transaction or None if the mempool is empty.
+        """
+
+        while len(self.fees) > 0:
+            entry = self.fees[0]
+            if self.order.get(entry[2]) == entry[1]:
+                return entry
+
+            heappop(self.fees)
+
+        return None
+
+    def add(self, transaction):
+        """
+        add()
+
+        Adds a transaction while keeping the mempool within its limits.
+        When it does not fit, the transactions with the lowest fees are
+        evicted along with the transactions that spend their coins, as long
+        as all of the evicted transactions together pay less than the new
+        transaction. Nothing is evicted when the transaction is rejected.
+
+        :param transaction: <Transaction Object> The transaction to add.
+
+        :return: <tuple<boolean, list<Transaction Object>>> Whether the
+            transaction was added and the evicted transactions, with every
+            transaction before the ones whose coins it spends.
+        """
+
+        fee = get_fee(transaction)
+        size = len(transaction.to_string())
+
+        number = len(self.transactions) + 1
+        total = self.bytes + size
+        if number <= self.max_count and total <= self.max_bytes:
+            self.append(transaction)
+            return True, []
+
+        if fee < self.min_fee:
+            return False, []
+
+        parents = self.get_parents(transaction)
+        popped = []
+        evicted = []
+        evicted_fee = 0
+        found = set()
+        accepted = True
+        while number > self.max_count or total > self.max_bytes:
+            cheapest = self._cheapest()
+            if cheapest is None or cheapest[0] >= fee:
+                accepted = False
+                break
+
+            popped.append(heappop(self.fees))
+
+            uuid = cheapest[2]
+            if uuid in found:
+                continue
+
+            for victim in self.get_descendants(uuid) + [uuid]:
+                if victim in found:
+                    continue
+
+                if victim in parents:
+                    # The transaction spends coins of one it would evict.
+                    accepted = False
+                    break
+
+                evicted.append(victim)
+                found.add(victim)
+                number -= 1
+                total -= self.sizes[victim]
+                evicted_fee += get_fee(self.transactions[victim])
+
+            # The evicted transactions together must pay less than the
+            # transaction replacing them.
+            if not accepted or evicted_fee >= fee:
+                accepted = False
+                break
+
+        if not accepted:
+            for entry in popped:
+                heappush(self.fees, entry)
+            return False, []
+
+        transactions = [self.discard(uuid) for uuid in evicted]
+        self.append(transaction)
+
+        return True, transactions
+
+    def get(self, uuid):
+        """
+        get()
+
+        Retrieves a waiting transaction by its UUID.
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :return: <Transaction Object> The transaction or None if it is not
+            in the mempool.
+        """
+
+        return self.transactions.get(uuid)
+
+    def get_spender(self, coin_uuid):
+        """
+        get_spender()
+
+        Finds the waiting transaction that spends a coin. This is used to
+        detect transactions that conflict with each other.
+
+        :param coin_uuid: <str> The UUID of the coin.
+
+        :return: <Transaction Object> The transaction or None if no waiting
+            transaction spends the coin.
+        """
+
+        uuid = self.spent.get(coin_uuid)
+
+        return self.transactions.get(uuid) if uuid is not None else None
+
+    def discard(self, uuid):
+        """
+        discard()
+
+        Removes a transaction from the mempool if it is in it.
+
+        :param uuid: <str> The UUID of the transaction.
+
+        :return: <Transaction Object> The removed transaction or None if it
+            was not in the mempool.
+        """
+
+        transaction = self.transactions.pop(uuid, None)
+        if transaction is None:
+            return None
+
+        for coin in transaction.get_inputs():
+            if self.spent.get(coin.get_uuid()) == uuid:
+                del self.spent[coin.get_uuid()]
+        for coin in transaction.get_all_output_coins():
+            if self.created.get(coin.get_uuid()) == uuid:
+                del self.created[coin.get_uuid()]
+
+        self.bytes -= self.sizes.pop(uuid)
+        del self.order[uuid]
+
+        self._snapshot = None
+
+        return transaction
+
+    def remove(self, transaction):
+        """
+        remove()
+
+        Removes a transaction from the mempool.
+
+        :param transaction: <Transaction Object> The transaction to remove.
+
+        :raises ValueError: if the transaction is not in the mempool.
+        """
+
+        if self.discard(transaction.get_uuid()) is None:
+            raise ValueError('Transaction is not in the mempool')
+
+    def __contains__(self, transaction):
+        return transaction.get_uuid() in self.transactions or transaction is self.reward
+
+    def __getitem__(self, index):
+        return self.snapshot()[index]
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        return len(self.transactions) + (1 if self.reward is not None else 0)
+
+    def __eq__(self, other):
+        if isinstance(other, Mempool):
+            other = other.snapshot()
+
+        return self.snapshot() == other
+
+
+class OrphanPool:
+    """
+    OrphanPool
+    """
+
+    def __init__(self, ttl=None, max_count=None):
+        """
+        __init__()
+
+        The constructor for an OrphanPool object. Orphans are transactions
+        that spend coins of transactions that have not arrived yet. They
+        are indexed by the UUIDs of the coins they are missing so that they
+        can be verified again once those coins exist.
+
+        :param ttl: <float> The number of seconds an orphan is kept. It is
+            read from the config when not given.
+        :param max_count: <int> The maximum number of orphans. It is read
+            from the config when not given.
+        """
+
+        self.ttl = config.get_mempool_orphan_ttl() if ttl is None else ttl
+        self.max_count = config.get_mempool_max_orphans() if max_count is None else max_count
+
+        # The orphans in the order they arrived with the time they expire
+        # and the coins they are still missing.
+        self.orphans = OrderedDict()
+        self.waiting = {}
+
+        # Transactions are verified by several threads at once.
+        self.lock = RLock()
+
+    def add(self, transaction, missing):
+        """
+        add()
+
+        Adds an orphan. The oldest orphan is dropped when there are too
+        many.
+
+        :param transaction: <Transaction Object> The orphan.
+        :param missing: <list<str>> The UUIDs of the coins it is missing.
+        """
+
+        with self.lock:
+            self.expire()
+
+            uuid = transaction.get_uuid()
+            self.discard(uuid)
+            if self.max_count < 1:
+                return
+
+            while len(self.orphans) >= self.max_count:
+                self.discard(next(iter(self.orphans)))
+
+            self.orphans[uuid] = (transaction, time() + self.ttl, set(missing))
+            for coin_uuid in missing:
+                self.waiting.setdefault(coin_uuid, set()).add(uuid)
+
+    def discard(self, uuid):
+        """
+        discard()
+
+        Removes an orphan if it is in the pool.
+
+        :param uuid: <str> The UUID of the orphan.
+
+        :return: <Transaction Object> The orphan or None if it was not in
+            the pool.
+        """
+
+        with self.lock:
+            entry = self.orphans.pop(uuid, None)
+            if entry is None:
+                return None
+
+            transaction, _, missing = entry
+            for coin_uuid in missing:
+                orphans = self.waiting.get(coin_uuid)
+                if orphans is not None:
+                    orphans.discard(uuid)
+                    if len(orphans) == 0:
+                        del self.waiting[coin_uuid]
+
+            return transaction
+
+    def expire(self):
+        """
+        expire()
+
+        Drops the orphans that have been waiting longer than the TTL.
+        """
+
+        with self.lock:
+            now = time()
+            while len(self.orphans) > 0:
+                uuid, (_, expiry, _) = next(iter(self.orphans.items()))
+                if expiry > now:
+                    break
+
+                self.discard(uuid)
+
+    def resolve(self, transaction):
+        """
+        resolve()
+
+        Marks the coins created by an accepted transaction as no longer
+        missing and takes the orphans that were waiting on them out of the
+        pool once they have all the coins they were missing.
+
+        :param transaction: <Transaction Object> The accepted transaction.
+
+        :return: <list<Transaction Object>> The orphans that can be
+            verified again, in the order they arrived.
+        """
+
+        with self.lock:
+            self.expire()
+
+            ready = []
+            for coin in transaction.get_all_output_coins():
+                for uuid in self.waiting.pop(coin.get_uuid(), ()):
+                    missing = self.orphans[uuid][2]
+                    missing.discard(coin.get_uuid())
+                    if len(missing) == 0:
+                        ready.append(uuid)
+
+            if len(ready) > 1:
+                found = set(ready)
+                ready = [uuid for uuid in self.orphans if uuid in found]
+
+            return [self.discard(uuid) for uuid in ready]
+
+    def __contains__(self, uuid):
+        return uuid in self.orphans
+
+    def __len__(self):
+        return len(self.orphans)
+
+
+def get_fee(transaction):
+    """
+    get_fee()
+
+    Retrieves the fee that a transaction pays to the miner, which is the
+    value of its SYSTEM outputs.
+
+    :param transaction: <Transaction Object> The transaction.
+
+    :return: <int> The fee.
+    """
+
+    return transaction.get_values()[2]
@@ -9,7 +9,6 @@ Santa Clara University
 
 # Standard library imports
 import logging
-from copy import deepcopy
 from random import randint
 from sys import maxsize
 from threading import Thread
@@ -17,12 +16,17 @@ from uuid import uuid4
 
 # Local imports
 from block import block_from_json
-from blockchain import Blockchain
+from blockchain import BlockTemplate
+from blockchainConfig import BlockchainConfig
+from codec import JSON_CODEC
 from coin import RewardCoin
 from connection import MultipleConnectionHandler, SingleConnectionHandler
+from engine import ProofEngine
 from history import History
-from macros import RECEIVE_BLOCK, GET_CHAIN_PAGINATED, GET_CHAIN_PAGINATED_ACK, GET_CHAIN_PAGINATED_STOP, REWARD_COIN_VALUE
+from macros import (RECEIVE_BLOCK, GET_CHAIN_PAGINATED, GET_CHAIN_PAGINATED_ACK, GET_CHAIN_PAGINATED_STOP, REWARD_COIN_VALUE,
+                    MINE_BATCH_SIZE, MINE_POLL_INTERVAL)
 from transaction import RewardTransaction, transaction_verify
+from validation import BlockValidator
 
 
 class BlockException(Exception):
@@ -55,6 +59,16 @@ class Miner(Thread):
         self.metadata = metadata
         self.queues = queues
         self.daemon = True
+
+        # Proofs are searched on this thread unless more workers are configured.
+        workers = BlockchainConfig().get_mining_workers()
+        if workers > 1 and not metadata['no_mine']:
+            self.metadata['engine'] = ProofEngine(workers)
+        else:
+            self.metadata['engine'] = None
+
+        self.metadata['validator'] = BlockValidator(BlockchainConfig().get_validation_processes())
+
         self.start()
 
     def run(self):
@@ -73,7 +87,6 @@ class Miner(Thread):
             try:
                 mine(self.metadata, self.queues)
             except BlockException:
-                self.metadata['history'].get_lock().release()
                 pass
 
 
@@ -97,38 +110,118 @@ def proof_of_work(metadata, queues, reward, last_block):
     last_proof = last_block.proof
     last_hash = last_block.hash
 
+    # The transactions are only serialized when they change.
+    template = BlockTemplate(last_proof, last_hash, current_trans.snapshot())
+
     history = History()
     history_lock = history.get_lock()
 
-    proof = randint(0, maxsize)
-    while not metadata['blockchain'].valid_proof(last_proof, proof, last_hash, current_trans):
-        history_lock.acquire()
+    if metadata['engine'] is not None:
+        proof = search_proof(metadata, queues, reward, template)
+    else:
+        proof = randint(0, maxsize)
+        while True:
+            if metadata['no_mine']:
+                # Nothing is hashed, only wait for new transactions and blocks.
+                queues['changed'].wait(MINE_POLL_INTERVAL)
+            else:
+                stop = min(proof + MINE_BATCH_SIZE, maxsize + 1)
+                found = template.search(proof, stop)
+                if found is not None:
+                    proof = found
+                    break
+
+                proof = 0 if stop > maxsize else stop
+
+            if queues['changed'].is_set() and handle_changes(metadata, queues, reward):
+                template.update(current_trans.snapshot())
 
-        if not queues['trans'].empty():
-            handle_transactions(metadata, queues, reward)
+    with history_lock:
         if not queues['blocks'].empty():
             handle_blocks(metadata, queues, reward)
-        history_lock.release()
 
-        if metadata['no_mine']:
-            proof = proof
-        else:
-            if proof == maxsize:
-                proof = 0
-            else:
-                proof += 1
+        history.apply_transaction(current_trans[0])
 
-    if not queues['blocks'].empty():
-        handle_blocks(metadata, queues)
+    logging.debug("New proof: " + str(proof))
 
-    history.add_transaction(current_trans[0])
-    history.add_coin(current_trans[0].get_all_output_coins()[0])
+    return proof
 
-    logging.debug("New proof: " + str(proof))
+
+def search_proof(metadata, queues, reward, template):
+    """
+    search_proof()
+
+    Searches for a proof with the proof of work engine. The engine is
+    restarted whenever the transactions in the template change and is
+    stopped once a proof is found or a block from the network arrives.
+
+    :param metadata: <dict> The metadata for this node.
+    :param queues: <dict> The queues for this node.
+    :param reward: <RewardTransaction Object> The reward
+        transaction used in the new block.
+    :param template: <BlockTemplate Object> The template of the new block.
+
+    :return: <int> The valid proof of work for this block.
+    """
+
+    engine = metadata['engine']
+    current_trans = metadata['blockchain'].current_transactions
+
+    engine.start(template)
+    try:
+        while True:
+            proof = engine.wait(MINE_POLL_INTERVAL)
+            if proof is not None and template.valid_proof(proof):
+                break
+
+            if queues['changed'].is_set() and handle_changes(metadata, queues, reward):
+                template.update(current_trans.snapshot())
+                engine.start(template)
+    finally:
+        engine.stop()
+
+    for worker_id, hashrate in enumerate(engine.get_hashrates()):
+        logging.debug("Worker %s hashrate: %.0f H/s", worker_id, hashrate)
 
     return proof
 
 
+def handle_changes(metadata, queues, reward):
+    """
+    handle_changes()
+
+    This function handles the transactions and blocks that have arrived
+    since the miner was last signalled. The signal is cleared before the
+    queues are drained so that anything added meanwhile signals again.
+
+    :param metadata: <dict> The metadata for this node.
+    :param queues: <dict> The queues for this node.
+    :param reward: <RewardTransaction Object> The reward
+        transaction used in the new block.
+
+    :return: <boolean> Whether the transactions being mined have changed.
+
+    :raise: <BlockException> When a block off the network is added to our
+        chain.
+    """
+
+    queues['changed'].clear()
+
+    changed = False
+    try:
+        with History().get_lock():
+            if not queues['trans'].empty():
+                handle_transactions(metadata, queues, reward)
+                changed = True
+            if not queues['blocks'].empty():
+                handle_blocks(metadata, queues, reward)
+    finally:
+        # The disk is not waited on while the history is locked.
+        metadata['blockchain'].write_store()
+
+    return changed
+
+
 def handle_transactions(metadata, queues, reward_transaction):
     """
     handle_transactions()
@@ -142,19 +235,71 @@ def handle_transactions(metadata, queues, reward_transaction):
         used to track the reward value.
     """
 
-    verified_transactions = []
-    reward_coins = []
+    mempool = metadata['blockchain'].current_transactions
+    history = History()
 
+    transactions = []
     while not queues['trans'].empty():
-        transaction = queues['trans'].get()
-        metadata['blockchain'].new_transaction(transaction)
-        reward_coins.extend(transaction.get_all_reward_coins())
+        transactions.append(queues['trans'].get())
+
+    # The transactions in this batch that spend each coin.
+    spenders = {}
+    for transaction in transactions:
+        for coin in transaction.get_inputs():
+            spenders[coin.get_uuid()] = transaction
+
+    dropped = {}
+
+    def drop(transaction):
+        # Transactions that spend the coins of a dropped one are dropped
+        # first so that the history is undone in reverse order. An explicit
+        # stack is used so that long chains do not hit the recursion limit.
+        found = {transaction.get_uuid()}
+        stack = [(transaction, iter(transaction.get_all_output_coins()))]
+        while len(stack) > 0:
+            current, coins = stack[-1]
+            for coin in coins:
+                spender = spenders.get(coin.get_uuid())
+                if spender is not None and spender.get_uuid() not in dropped and spender.get_uuid() not in found:
+                    found.add(spender.get_uuid())
+                    stack.append((spender, iter(spender.get_all_output_coins())))
+                    break
+            else:
+                stack.pop()
+                uuid = current.get_uuid()
+                if uuid not in dropped:
+                    dropped[uuid] = current
+                    mempool.discard(uuid)
+                    history.undo_transaction(current)
+
+    for transaction in transactions:
+        if transaction.get_uuid() in dropped:
+            continue
+
+        accepted, evicted = mempool.add(transaction)
+        if accepted:
+            logging.info(transaction.to_string())
+        else:
+            logging.info('Mempool is full, dropped transaction ' + transaction.get_uuid())
+            evicted = [transaction]
 
-        verified_transactions.append(transaction)
+        for evicted_transaction in evicted:
+            drop(evicted_transaction)
+
+    verified_transactions = []
+    reward_coins = []
+    for transaction in transactions:
+        if transaction.get_uuid() not in dropped:
+            verified_transactions.append(transaction)
+            reward_coins.extend(transaction.get_all_reward_coins())
 
-    reward_coin = reward_transaction.get_all_output_coins()[0]
+    # Fees of evicted transactions are no longer claimed by the reward.
+    dropped_coins = []
+    for transaction in dropped.values():
+        dropped_coins.extend(transaction.get_all_reward_coins())
+
+    reward_transaction.remove_inputs(dropped_coins)
     reward_transaction.add_new_inputs(reward_coins)
-    reward_coin.set_value(reward_transaction.get_values()[0])
 
     queues['tasks'].put(('forward_transaction', [verified_transactions], {}, None))
 
@@ -176,38 +321,49 @@ def handle_blocks(metadata, queues, reward_transaction):
     """
 
     history = History()
+    validator = metadata.get('validator') or BlockValidator()
 
     changed = False
     while not queues['blocks'].empty():
-        history_temp = history.get_copy()
-
-        host_port, block = queues['blocks'].get()
-        current_index = metadata['blockchain'].last_block_index
-
-        if block.index == current_index + 1:
-            success = verify_block(history_temp, block, metadata['blockchain'])
-            if not success:
-                queues['blocks'].task_done()
-                continue
-
-            for transaction in block.transactions[1:]:
-                try:
-                    metadata['blockchain'].current_transactions.remove(transaction)
-                except ValueError:
-                    pass
-
-            metadata['blockchain'].add_block(block)
-            history.replace_history(history_temp)
-            changed = True
-
-        elif block.index > current_index:
-            if resolve_conflicts(block, history_temp, host_port, metadata, reward_transaction):
-                changed = True
+        # Blocks competing for the next index are checked by the worker
+        # processes at the same time.
+        last_block = metadata['blockchain'].last_block
+        pending = []
+        while not queues['blocks'].empty():
+            host_port, block = queues['blocks'].get()
+            future = None
+            if validator.executor is not None and block.index == last_block.index + 1:
+                future = validator.submit(block, last_block)
+            pending.append((host_port, block, future))
+
+        for host_port, block, future in pending:
+            history_temp = history.get_overlay()
+            current_index = metadata['blockchain'].last_block_index
+
+            if block.index == current_index + 1:
+                if metadata['blockchain'].last_block is not last_block:
+                    future = None
+
+                success = verify_block(history_temp, block, metadata['blockchain'], validator, future)
+                if success:
+                    for transaction in block.transactions[1:]:
+                        metadata['blockchain'].current_transactions.discard(transaction.get_uuid())
+
+                    metadata['blockchain'].add_block(block)
+                    history_temp.commit()
+                    history.confirm_block(block)
+                    changed = True
+
+            elif block.index > current_index:
+                if resolve_conflicts(block, history_temp, host_port, metadata, reward_transaction):
+                    changed = True
+
+            queues['blocks'].task_done()
 
     if changed:
+        snapshot_history(metadata)
         queues['tasks'].put(('forward_block', [metadata['blockchain'].last_block, metadata['host'],
                                                metadata['port']], {}, None))
-        queues['blocks'].task_done()
         raise BlockException
 
 
@@ -219,7 +375,7 @@ def resolve_conflicts(block, history_copy, host_port, metadata, reward_transacti
     that is much further ahead of us in index.
 
     :param block: <Block Object> The block that has been taken from the network.
-    :param history_copy: <History Object> A copy of the history to allow us to edit it without issue.
+    :param history_copy: <HistoryOverlay Object> An overlay of the history to allow us to edit it without issue.
     :param host_port: <tuple<str, int>> The host and port of the node that sent us the block.
     :param metadata: <dict> The metadata of the node.
 
@@ -228,10 +384,11 @@ def resolve_conflicts(block, history_copy, host_port, metadata, reward_transacti
 
     logging.debug("Resolving conflicts")
 
-    blockchain_copy = deepcopy(metadata['blockchain'])
+    blockchain_copy = metadata['blockchain'].get_copy()
 
     try:
-        conn = SingleConnectionHandler(host_port[0], host_port[1], False)
+        codec = metadata['pool'].get_codec(host_port) if metadata.get('pool') is not None else JSON_CODEC
+        conn = SingleConnectionHandler(host_port[0], host_port[1], False, codec)
     except ConnectionRefusedError:
         return False
 
@@ -271,29 +428,45 @@ def resolve_conflicts(block, history_copy, host_port, metadata, reward_transacti
 
     blocks = blocks[index + 1:]
 
-    # Rollback current_transactions except the reward transaction
-    cur_transactions = []
-    if len(blockchain_copy.current_transactions) > 1:
-        for transaction in blockchain_copy.current_transactions[1:]:
-            cur_transactions.append(transaction)
-            rollback_transaction(transaction, history_copy)
+    # Rollback current_transactions except the reward transaction, newest
+    # first so that no transaction is undone before the ones spending it.
+    cur_transactions = blockchain_copy.current_transactions.get_pending()
+    for transaction in reversed(cur_transactions):
+        rollback_transaction(transaction, history_copy)
+        blockchain_copy.current_transactions.discard(transaction.get_uuid())
     # Rollback reward transactions
     reward_transaction.reset()
 
-    # Rollback to common ancestor.
-    for block in blockchain_copy.chain[-1:common_ancestor_index:-1]:
+    # Rollback to common ancestor. Nothing is rolled back when no common
+    # ancestor was found.
+    keep = common_ancestor_index + 1 if common_ancestor_index >= 0 else len(blockchain_copy.chain)
+    for block in reversed(blockchain_copy.chain[keep:]):
         rollback_block(block, history_copy)
-        blockchain_copy.chain = blockchain_copy.chain[:-1]
+    del blockchain_copy.chain[keep:]
+
+    block_objs = [block_obj for block_obj in map(block_from_json, blocks) if block_obj is not None]
+
+    # The checks that do not need the history only depend on the block
+    # before, so the workers check every new block at the same time.
+    validator = metadata.get('validator') or BlockValidator()
+    futures = [None] * len(block_objs)
+    if validator.executor is not None:
+        last_block = blockchain_copy.last_block
+        for i, block_obj in enumerate(block_objs):
+            futures[i] = validator.submit(block_obj, last_block)
+            last_block = block_obj
 
     # Add new blocks moving forward.
-    for block in blocks:
-        block_obj = block_from_json(block)
-        if block_obj is None:
-            continue
-        success = verify_block(history_copy, block_obj, blockchain_copy)
+    added = []
+    for block_obj, future in zip(block_objs, futures):
+        success = verify_block(history_copy, block_obj, blockchain_copy, validator, future)
         blockchain_copy.add_block(block_obj)
+        added.append(block_obj)
 
         if not success:
+            for pending in futures:
+                if pending is not None:
+                    pending.cancel()
             logging.debug("Could not replace chain")
             return False
 
@@ -305,17 +478,17 @@ def resolve_conflicts(block, history_copy, host_port, metadata, reward_transacti
                 blockchain_copy.new_transaction(transaction)
                 reward_coins.extend(transaction.get_all_reward_coins())
 
-        reward_coin = reward_transaction.get_all_output_coins()[0]
         reward_transaction.add_new_inputs(reward_coins)
-        reward_coin.set_value(reward_transaction.get_values()[0])
 
     blockchain_copy.increment_version_number()
 
-    metadata['blockchain'].chain = blockchain_copy.chain
+    metadata['blockchain'].replace_chain(blockchain_copy.chain)
     metadata['blockchain'].current_transactions = blockchain_copy.current_transactions
     metadata['blockchain'].increment_version_number()
 
-    metadata['history'].replace_history(history_copy)
+    history_copy.commit()
+    for block in added:
+        History().confirm_block(block)
 
     logging.info("Replaced chain with a longer one.")
 
@@ -345,22 +518,14 @@ def rollback_transaction(transaction, history_copy):
     rollback_transaction
 
     This function rolls back a transaction in preparation for resolve
-    conflicts.
+    conflicts using the undo record that was kept when it was applied.
 
     :param transaction: <Transaction Object> The transaction to rollback.
     :param history_copy: <History Object> The history object that can be
         changed
     """
 
-    output_coins = transaction.get_all_output_coins()
-    for coin in output_coins:
-        history_copy.remove_coin(coin.get_uuid())
-
-    input_coins = transaction.get_inputs()
-    for coin in input_coins:
-        history_copy.add_coin(coin)
-
-    history_copy.remove_transaction(transaction.get_uuid())
+    history_copy.undo_transaction(transaction)
 
 
 def mine(*args, **kwargs):
@@ -385,6 +550,15 @@ def mine(*args, **kwargs):
     reward_transaction = RewardTransaction([], {metadata['uuid']: [RewardCoin(reward_id, REWARD_COIN_VALUE)]}, reward_id)
     blockchain.update_reward(reward_transaction)
 
+    # Claim the fees of transactions restored from a snapshot. Fees of other
+    # waiting transactions are only claimed as they arrive.
+    reward_coins = []
+    for transaction in blockchain.current_transactions.get_pending():
+        if transaction.get_uuid() in blockchain.unclaimed:
+            reward_coins.extend(transaction.get_all_reward_coins())
+    if len(reward_coins) > 0:
+        reward_transaction.add_new_inputs(reward_coins)
+
     # Create the proof_of_work on the block.
     proof = proof_of_work(metadata, queues, reward_transaction, last_block)
 
@@ -392,38 +566,73 @@ def mine(*args, **kwargs):
     history.add_transaction(reward_transaction)
 
     # Create the new block and add it to the end of the chain.
-    block = metadata['blockchain'].new_block(proof, last_block.hash)
+    with history.get_lock():
+        block = metadata['blockchain'].new_block(proof, last_block.hash)
+        blockchain.unclaimed.clear()
+        history.confirm_block(block)
+        snapshot_history(metadata)
+    blockchain.write_store()
 
-    MultipleConnectionHandler(metadata['peers']).send_wout_response(RECEIVE_BLOCK(block.to_json(),
-                                                                    metadata['host'], metadata['port']))
+    MultipleConnectionHandler(metadata['peers'], metadata.get('pool')).send_wout_response(
+        RECEIVE_BLOCK(block.to_json(), metadata['host'], metadata['port']))
 
     logging.debug("Mined block: " + block.to_string())
 
 
-def verify_block(history_temp, block, blockchain):
+def snapshot_history(metadata):
+    """
+    snapshot_history()
+
+    This function takes a snapshot of the history in the coin store once
+    enough blocks have been added since the last one. The history should
+    be locked.
+
+    :param metadata: <dict> The metadata for this node.
+    """
+
+    coin_store = metadata.get('coin_store')
+    blockchain = metadata['blockchain']
+    if coin_store is None or not coin_store.snapshot_due(blockchain.last_block_index):
+        return
+
+    coin_store.snapshot(blockchain.last_block_index, blockchain.last_block.hash,
+                        blockchain.current_transactions.get_pending(),
+                        list(History().get_wallet().uuid_lookup.values()))
+
+
+def verify_block(history_temp, block, blockchain, validator=None, future=None):
     """
     verify_block()
 
     This function is responsible for verifying if a newly mined block
-    can be added to our chain.
+    can be added to our chain. The checks that do not need the history
+    are done by the validator, which may run them in another process, and
+    only the coins the transactions spend are checked here.
 
     :param history_temp: <History Object> A temporary history object for testing.
     :param block: <Block Object> The block object to add.
     :param blockchain: <Blockchain Object> The blockchain to add the block to. This
         is needed bacause sometimes we want to add to a copy of the blockchain.
+    :param validator: <BlockValidator Object> The validator to check the
+        block with or None to check it on this thread.
+    :param future: <Future> The checks already started for this block by
+        the validator.
 
     :return: <boolean> Whether the block was added or not.
     """
 
+    if validator is None:
+        validator = BlockValidator()
+
+    if not validator.check(block, blockchain.last_block, future):
+        return False
+
     new_transactions = []
 
     for transaction in block.transactions[1:]:
         hist_trans = history_temp.get_transaction(transaction.get_uuid())
         if hist_trans is not None:
-            new_trans = transaction.to_string()
-            hist_trans_string = hist_trans.to_string()
-
-            if new_trans != hist_trans_string:
+            if transaction != hist_trans:
                 # Transaction exists but does not match
                 logging.debug('Bad block: transaction exists but does not match.')
                 return False
@@ -440,33 +649,17 @@ def verify_block(history_temp, block, blockchain):
 
     # Verify the reward.
     reward = block.transactions[0]
-    hist_trans = history_temp.get_transaction(reward.get_uuid())
-    if hist_trans is not None:
-        new_trans = reward.to_string()
-        hist_trans = hist_trans.to_string()
-
-        # Transaction exists but does not match
+    if history_temp.get_transaction(reward.get_uuid()) is not None:
+        # The reward was already used by another block.
         logging.debug('Bad block: reward already exists')
         return False
-    else:
-        check = transaction_verify(history_temp, reward, True)
-        if not check:
-            # Verification doesn't pass.
-            logging.debug('Bad block: reward verification fails')
-            return False
-
-        new_transactions = [reward] + new_transactions
 
-    lastblock = blockchain.last_block
-
-    if lastblock.hash != block.previous_hash:
-        logging.debug('Bad block: hash does not match')
+    check = transaction_verify(history_temp, reward, True)
+    if not check:
+        # Verification doesn't pass.
+        logging.debug('Bad block: reward verification fails')
         return False
 
-    block.transactions = new_transactions
-
-    if not Blockchain.valid_proof(lastblock.proof, block.proof, lastblock.hash, block.transactions):
-        logging.debug('Bad block: invalid proof')
-        return False
+    block.transactions = [reward] + new_transactions
 
     return True
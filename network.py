@@ -9,11 +9,15 @@ Santa Clara University
 """
 
 # Standard library imports
-from socket import socket, AF_INET, SOCK_STREAM
+from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
+import asyncio
 import logging
 
 # Local Imports
-from connection import ConnectionHandler
+from blockchainConfig import BlockchainConfig
+from codec import JSON_CODEC, get_codec_by_name
+from connection import ConnectionHandler, ConnectionPool, Channel
+from macros import RECEIVE_TIMEOUT
 from tasks import register_nodes
 from thread import ThreadHandler
 
@@ -37,8 +41,18 @@ class NetworkHandler(ConnectionHandler):
 
         ConnectionHandler.__init__(self)
 
+        config = BlockchainConfig()
+        self.use_asyncio = config.get_network_asyncio()
+        self.backlog = config.get_network_backlog()
+
+        codec = get_codec_by_name(config.get_network_codec())
+        if codec is None:
+            logging.warning('Unknown codec %s, using json', config.get_network_codec())
+            codec = JSON_CODEC
+
         self.metadata = metadata
         self.metadata['peers'] = []
+        self.metadata['pool'] = ConnectionPool(codec)
 
         # Automatically register neighbors.
         register_nodes(initial_peers, self.metadata)
@@ -46,6 +60,7 @@ class NetworkHandler(ConnectionHandler):
         # Set up socket.
         logging.info("Setting up socket and binding to %s:%s", metadata['host'], metadata['port'])
         self.sock = socket(AF_INET, SOCK_STREAM)
+        self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
         self.sock.bind((self.metadata['host'], self.metadata['port']))
 
         # Start thread handler.
@@ -59,13 +74,18 @@ class NetworkHandler(ConnectionHandler):
         connections.
         """
 
+        if self.use_asyncio:
+            asyncio.run(self.event_loop_async())
+            return
+
+        self.sock.listen(self.backlog)
+
         # Block while waiting for connections.
         if self.metadata['done'] is not None:
             self.metadata['done'].release()
 
         while True:
             logging.info('Waiting for new connections')
-            self.sock.listen(5)
             conn, client = self.sock.accept()
             logging.info('Created connection to %s:%s', client[0], client[1])
 
@@ -74,4 +94,74 @@ class NetworkHandler(ConnectionHandler):
             if data is None:
                 continue
             else:
-                self.threads.add_task(data, conn)
+                self.dispatch(data, conn)
+
+    async def event_loop_async(self):
+        """
+        event_loop_async
+
+        This function will setup the socket and accept incoming
+        connections on an asyncio event loop. Each connection is read
+        concurrently so that a slow client does not hold up the others.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        self.sock.setblocking(False)
+        self.sock.listen(self.backlog)
+
+        if self.metadata['done'] is not None:
+            self.metadata['done'].release()
+
+        logging.info('Waiting for new connections')
+        while True:
+            conn, client = await loop.sock_accept(self.sock)
+            logging.info('Created connection to %s:%s', client[0], client[1])
+
+            loop.create_task(self.handle_connection(loop, conn))
+
+    async def handle_connection(self, loop, conn):
+        """
+        handle_connection
+
+        This function reads the request off of a new connection and hands
+        it to the worker threads.
+
+        :param loop: <AbstractEventLoop> The event loop to read with.
+        :param conn: <Connection Object> The new connection.
+        """
+
+        conn.setblocking(False)
+
+        try:
+            data = await asyncio.wait_for(self._recv_async(loop, conn), RECEIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning('Timed out receiving data from network')
+            data = None
+
+        if data is None:
+            conn.close()
+            return
+
+        # The worker threads use blocking sockets.
+        conn.setblocking(True)
+        self.dispatch(data, conn)
+
+    def dispatch(self, data, conn):
+        """
+        dispatch
+
+        This function hands a request to the worker threads. A request to
+        open a channel keeps the connection open so that a peer can send
+        many requests over it.
+
+        :param data: <dict> The request.
+        :param conn: <Connection Object> The connection the request came
+            in on.
+        """
+
+        if isinstance(data, dict) and data.get('action') == 'open_channel':
+            logging.info('Opening channel')
+            Channel(conn, self.threads.add_task)
+        else:
+            self.threads.add_task(data, conn)
@@ -10,12 +10,15 @@ Santa Clara University
 
 # Standard library imports
 from hashlib import sha1
+import os
 
 # Local imports
 from blockchain import Blockchain
+from blockchainConfig import BlockchainConfig
 from history import History
 from logger import initialize_log
 from network import NetworkHandler
+from store import BlockStore, CoinStore, restore_chain
 from threading import Lock
 
 
@@ -68,6 +71,23 @@ class Node:
         self.metadata['blockchain'] = Blockchain()
         self.metadata['history'] = History(self.metadata['uuid'])
 
+        # Keep the coins and transactions of the history on disk.
+        config = BlockchainConfig()
+        coin_store = None
+        if config.get_storage_coins():
+            path = os.path.join(config.get_storage_directory(), self.metadata['uuid'] + '.db')
+            coin_store = CoinStore(path, config.get_storage_coin_cache(), config.get_storage_snapshot_interval())
+            self.metadata['history'].attach_store(coin_store)
+        self.metadata['coin_store'] = coin_store
+
+        # Restore the chain from the previous run of the node.
+        if config.get_storage_enabled():
+            path = os.path.join(config.get_storage_directory(), self.metadata['uuid'] + '.log')
+            restore_chain(BlockStore(path), self.metadata['blockchain'], self.metadata['history'], coin_store)
+        elif coin_store is not None:
+            # Without the blocks the snapshot can not be trusted.
+            coin_store.clear()
+
         # Create the Network Handler object.
         self.nh = NetworkHandler(self.metadata, neighbors)
 
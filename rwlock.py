@@ -0,0 +1,197 @@
+"""
+rwlock.py
+
+This file holds the locks that let the history and wallet be read by many
+threads at once while still being changed by one at a time.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from contextlib import contextmanager
+from threading import Condition, Lock, get_ident
+
+# The number of characters of a key that decide its shard.
+SHARD_PREFIX_LENGTH = 8
+
+
+class RWLock:
+    """
+    RWLock
+    """
+
+    def __init__(self):
+        """
+        __init__()
+
+        The constructor for a RWLock object. Any number of readers can hold
+        the lock at once, but a writer holds it alone. Writers are
+        preferred, so new readers wait while a writer is waiting and a
+        steady stream of readers can not starve the writers. A thread that
+        already reads can read again without waiting. The write lock can be
+        acquired again by the thread that holds it, which can also read,
+        but a reader can not become a writer.
+
+        Using the lock in a with statement acquires the write lock.
+        """
+
+        self.condition = Condition(Lock())
+        self.readers = 0
+        self.writer = None
+        self.depth = 0
+        self.waiting = 0
+        # The number of times each reading thread holds the lock.
+        self.holders = {}
+
+    def acquire_read(self):
+        """
+        acquire_read()
+
+        Acquires the lock for reading.
+        """
+
+        with self.condition:
+            me = get_ident()
+            if self.writer == me:
+                self.depth += 1
+                return
+
+            if me not in self.holders:
+                while self.writer is not None or self.waiting > 0:
+                    self.condition.wait()
+
+            self.holders[me] = self.holders.get(me, 0) + 1
+            self.readers += 1
+
+    def release_read(self):
+        """
+        release_read()
+
+        Releases the lock after reading.
+        """
+
+        with self.condition:
+            me = get_ident()
+            if self.writer == me:
+                self.depth -= 1
+                return
+
+            self.holders[me] -= 1
+            if self.holders[me] == 0:
+                del self.holders[me]
+
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+    def acquire(self):
+        """
+        acquire()
+
+        Acquires the lock for writing.
+        """
+
+        with self.condition:
+            me = get_ident()
+            if self.writer == me:
+                self.depth += 1
+                return
+
+            self.waiting += 1
+            try:
+                while self.writer is not None or self.readers > 0:
+                    self.condition.wait()
+            finally:
+                self.waiting -= 1
+
+            self.writer = me
+            self.depth = 1
+
+    def release(self):
+        """
+        release()
+
+        Releases the lock after writing.
+        """
+
+        with self.condition:
+            self.depth -= 1
+            if self.depth == 0:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        """
+        read()
+
+        Holds the lock for reading for the duration of a with statement.
+        """
+
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class ShardedLock:
+    """
+    ShardedLock
+    """
+
+    def __init__(self, shards=64):
+        """
+        __init__()
+
+        The constructor for a ShardedLock object. Keys such as coin UUIDs
+        are spread over a number of locks by their prefix so that work on
+        different keys does not wait on a single lock.
+
+        :param shards: <int> The number of locks.
+        """
+
+        self.locks = [Lock() for _ in range(max(shards, 1))]
+
+    def get_shard(self, key):
+        """
+        get_shard()
+
+        Finds the lock that a key belongs to.
+
+        :param key: <str> The key.
+
+        :return: <int> The index of the lock.
+        """
+
+        return hash(key[:SHARD_PREFIX_LENGTH]) % len(self.locks)
+
+    @contextmanager
+    def acquire(self, keys):
+        """
+        acquire()
+
+        Holds the locks of every key for the duration of a with statement.
+        The locks are always acquired in the same order so that threads
+        holding several of them can not deadlock.
+
+        :param keys: <list<str>> The keys.
+        """
+
+        shards = sorted(set(self.get_shard(key) for key in keys))
+        for shard in shards:
+            self.locks[shard].acquire()
+
+        try:
+            yield
+        finally:
+            for shard in reversed(shards):
+                self.locks[shard].release()
@@ -0,0 +1,607 @@
+"""
+store.py
+
+This file is responsible for storing the blocks of the chain on disk so
+that a node can be restarted without syncing the whole chain again.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from threading import RLock
+import json
+import logging
+import os
+import sqlite3
+
+# Local imports
+from block import block_from_json
+from codec import JSON_CODEC, get_codec
+from coin import Coin, RewardCoin, coin_from_json
+from transaction import transaction_from_json, reward_transaction_from_json
+
+
+# The header of a record in the log, which holds the size of the block and
+# the ID of the codec it is encoded with.
+RECORD_HEADER = Struct('!IB')
+
+# The size in bytes of an offset in the index.
+OFFSET_SIZE = array('Q').itemsize
+
+
+class BlockStore:
+    """
+    BlockStore
+    """
+
+    def __init__(self, path):
+        """
+        __init__()
+
+        The constructor for a BlockStore object. Blocks are appended to a
+        log file and the offset of each one is appended to an index file
+        next to it so that any block can be found without reading the log.
+        A record at the end of the log that was only partly written, for
+        example because the node was killed, is cut off.
+
+        :param path: <str> The path of the log file.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.log = open(path, 'a+b')
+        self.index = open(path + '.idx', 'a+b')
+
+        self.offsets = array('Q')
+        self.index.seek(0)
+        data = self.index.read()
+        self.offsets.frombytes(data[:len(data) - len(data) % OFFSET_SIZE])
+
+        self._recover()
+
+    def _recover(self):
+        """
+        _recover()
+
+        Makes the index match the log. Offsets past the end of the log are
+        dropped, records that are missing from the index are added and a
+        partly written record at the end of the log is cut off.
+        """
+
+        size = os.fstat(self.log.fileno()).st_size
+
+        while len(self.offsets) > 0 and self._record_end(self.offsets[-1], size) is None:
+            self.offsets.pop()
+
+        offset = self._record_end(self.offsets[-1], size) if len(self.offsets) > 0 else 0
+        while True:
+            end = self._record_end(offset, size)
+            if end is None:
+                break
+            self.offsets.append(offset)
+            offset = end
+
+        if offset < size:
+            logging.warning('Cutting off %s bytes at the end of the block store', size - offset)
+            self.log.truncate(offset)
+
+        self._write_index()
+
+    def _record_end(self, offset, size):
+        """
+        _record_end()
+
+        Finds where a record in the log ends.
+
+        :param offset: <int> The offset of the record.
+        :param size: <int> The size of the log.
+
+        :return: <int> The offset after the record or None if there is no
+            complete record at the offset.
+        """
+
+        if offset + RECORD_HEADER.size > size:
+            return None
+
+        self.log.seek(offset)
+        length = RECORD_HEADER.unpack(self.log.read(RECORD_HEADER.size))[0]
+
+        end = offset + RECORD_HEADER.size + length
+        return end if end <= size else None
+
+    def _write_index(self):
+        """
+        _write_index()
+
+        Rewrites the index file from the offsets in memory.
+        """
+
+        self.index.truncate(0)
+        self.index.write(self.offsets.tobytes())
+        self.index.flush()
+        os.fsync(self.index.fileno())
+
+    def __len__(self):
+        """
+        __len__()
+
+        :return: <int> The number of blocks in the store.
+        """
+
+        return len(self.offsets)
+
+    def append(self, block):
+        """
+        append()
+
+        Writes a block to the end of the store. The block is on disk once
+        this returns.
+
+        :param block: <Block Object> The block to write.
+        """
+
+        self.extend([block])
+
+    def extend(self, blocks):
+        """
+        extend()
+
+        Writes blocks to the end of the store. The blocks are on disk once
+        this returns.
+
+        :param blocks: <list<Block Object>> The blocks to write.
+        """
+
+        if len(blocks) == 0:
+            return
+
+        self.log.seek(0, os.SEEK_END)
+        offset = self.log.tell()
+        offsets = array('Q')
+        for block in blocks:
+            payload = JSON_CODEC.encode(block)
+            self.log.write(RECORD_HEADER.pack(len(payload), JSON_CODEC.id) + payload)
+            offsets.append(offset)
+            offset += RECORD_HEADER.size + len(payload)
+        self.log.flush()
+
+        # The blocks reach the disk before their offsets so that the index
+        # is never ahead of the log after a crash.
+        os.fsync(self.log.fileno())
+
+        self.offsets.extend(offsets)
+        self.index.write(offsets.tobytes())
+        self.index.flush()
+        os.fsync(self.index.fileno())
+
+    def get(self, position):
+        """
+        get()
+
+        Reads a block out of the store.
+
+        :param position: <int> The position of the block in the store.
+
+        :return: <Block Object> The block or None if it can not be read.
+
+        :raises IndexError: if there is no block at the position.
+        """
+
+        self.log.seek(self.offsets[position])
+        length, codec_id = RECORD_HEADER.unpack(self.log.read(RECORD_HEADER.size))
+
+        return self._decode(codec_id, self.log.read(length))
+
+    def truncate(self, length):
+        """
+        truncate()
+
+        Removes every block after the given number of blocks.
+
+        :param length: <int> The number of blocks to keep.
+        """
+
+        if length >= len(self.offsets):
+            return
+
+        self.log.truncate(self.offsets[length])
+        self.log.flush()
+
+        del self.offsets[length:]
+        self._write_index()
+
+    def replay(self):
+        """
+        replay()
+
+        Reads every block in the store in order. The log is memory-mapped
+        so that it is not copied into memory before being decoded.
+
+        :return: <generator<Block Object>> The blocks, or None in place of
+            each block that can not be read.
+        """
+
+        if len(self.offsets) == 0:
+            return
+
+        self.log.flush()
+        with mmap(self.log.fileno(), 0, access=ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                for offset in self.offsets:
+                    length, codec_id = RECORD_HEADER.unpack_from(view, offset)
+                    start = offset + RECORD_HEADER.size
+                    yield self._decode(codec_id, view[start:start + length])
+            finally:
+                view.release()
+
+    def _decode(self, codec_id, payload):
+        """
+        _decode()
+
+        Converts a record of the log back into a block.
+
+        :param codec_id: <int> The ID of the codec the block is encoded with.
+        :param payload: <bytes> The encoded block.
+
+        :return: <Block Object> The block or None if the codec is not known
+            or the payload is not valid.
+        """
+
+        try:
+            return block_from_json(get_codec(codec_id).decode(payload))
+        except ValueError as e:
+            logging.warning('Block in the store can not be read: %s', e)
+            return None
+
+    def close(self):
+        """
+        close()
+
+        Closes the files of the store.
+        """
+
+        self.log.close()
+        self.index.close()
+
+
+class SqliteMapping(MutableMapping):
+    """
+    SqliteMapping
+    """
+
+    def __init__(self, store, table, columns, encode, decode):
+        """
+        __init__()
+
+        The constructor for a SqliteMapping object. This is a dictionary
+        that keeps its values in a table of a CoinStore and the most
+        recently used ones in memory.
+
+        :param store: <CoinStore Object> The store that holds the table.
+        :param table: <str> The name of the table.
+        :param columns: <tuple<str>> The columns of the table after the key.
+        :param encode: <Function Object> Converts a value into a tuple of
+            the columns.
+        :param decode: <Function Object> Converts a row of the columns back
+            into a value.
+        """
+
+        self.store = store
+        self.table = table
+        self.columns = columns
+        self.encode = encode
+        self.decode = decode
+
+        self.cache = OrderedDict()
+
+        store.connection.execute('CREATE TABLE IF NOT EXISTS {} (uuid TEXT PRIMARY KEY, {})'.format(
+            table, ', '.join(columns)))
+
+        self.select = 'SELECT {} FROM {} WHERE uuid = ?'.format(', '.join(columns), table)
+        self.insert = 'INSERT OR REPLACE INTO {} VALUES (?, {})'.format(table, ', '.join('?' * len(columns)))
+
+    def _remember(self, uuid, value):
+        """
+        _remember()
+
+        Keeps a value in memory and forgets the least recently used value
+        when there are too many.
+
+        :param uuid: <str> The key.
+        :param value: <Object> The value.
+        """
+
+        self.cache[uuid] = value
+        self.cache.move_to_end(uuid)
+        if len(self.cache) > self.store.cache_size:
+            self.cache.popitem(last=False)
+
+    def __getitem__(self, uuid):
+        with self.store.lock:
+            value = self.cache.get(uuid)
+            if value is not None:
+                self.cache.move_to_end(uuid)
+                return value
+
+            row = self.store.connection.execute(self.select, (uuid,)).fetchone()
+            if row is None:
+                raise KeyError(uuid)
+
+            value = self.decode(uuid, row)
+            self._remember(uuid, value)
+
+            return value
+
+    def __setitem__(self, uuid, value):
+        with self.store.lock:
+            self.store.connection.execute(self.insert, (uuid,) + self.encode(value))
+            self._remember(uuid, value)
+
+    def __delitem__(self, uuid):
+        with self.store.lock:
+            cursor = self.store.connection.execute('DELETE FROM {} WHERE uuid = ?'.format(self.table), (uuid,))
+            self.cache.pop(uuid, None)
+            if cursor.rowcount == 0:
+                raise KeyError(uuid)
+
+    def __iter__(self):
+        with self.store.lock:
+            rows = self.store.connection.execute('SELECT uuid FROM {}'.format(self.table)).fetchall()
+
+        return (row[0] for row in rows)
+
+    def __len__(self):
+        with self.store.lock:
+            return self.store.connection.execute('SELECT COUNT(*) FROM {}'.format(self.table)).fetchone()[0]
+
+    def clear(self):
+        with self.store.lock:
+            self.store.connection.execute('DELETE FROM {}'.format(self.table))
+            self.cache.clear()
+
+
+def encode_coin(coin):
+    return (coin.get_transaction_id(), coin.get_value(), isinstance(coin, RewardCoin))
+
+
+def decode_coin(uuid, row):
+    coin_class = RewardCoin if row[2] else Coin
+    return coin_class(row[0], row[1], uuid)
+
+
+def encode_transaction(transaction):
+    return (transaction.get_sender() == 'SYSTEM', transaction.to_string())
+
+
+def decode_transaction(uuid, row):
+    data = json.loads(row[1])
+    return reward_transaction_from_json(data) if row[0] else transaction_from_json(data)
+
+
+class CoinStore:
+    """
+    CoinStore
+    """
+
+    def __init__(self, path, cache_size, interval=1):
+        """
+        __init__()
+
+        The constructor for a CoinStore object. The coins and transactions
+        of the history are kept in a SQLite database with only the most
+        recently used ones in memory. Changes are only committed when a
+        snapshot is taken so that the database always holds the history
+        as it was at the block of the last snapshot.
+
+        :param path: <str> The path of the database.
+        :param cache_size: <int> The number of coins and the number of
+            transactions to keep in memory.
+        :param interval: <int> The number of blocks between snapshots.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = RLock()
+        self.cache_size = max(cache_size, 1)
+        self.interval = max(interval, 1)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS snapshot (key TEXT PRIMARY KEY, value TEXT)')
+
+        self.coins = SqliteMapping(self, 'coins', ('transaction_id', 'value', 'reward'), encode_coin, decode_coin)
+        self.transactions = SqliteMapping(self, 'transactions', ('reward', 'data'), encode_transaction,
+                                          decode_transaction)
+        self.connection.commit()
+
+        snapshot = self.get_snapshot()
+        self.height = snapshot['height'] if snapshot is not None else 0
+
+    def snapshot_due(self, height):
+        """
+        snapshot_due()
+
+        Checks whether enough blocks have been added since the last
+        snapshot to take another one.
+
+        :param height: <int> The index of the last block in the chain.
+
+        :return: <boolean> Whether a snapshot should be taken.
+        """
+
+        return abs(height - self.height) >= self.interval
+
+    def snapshot(self, height, block_hash, pending, wallet_coins):
+        """
+        snapshot()
+
+        Commits the coins and transactions as they are at a block along
+        with the transactions waiting to be mined and the coins in the
+        wallet of this node.
+
+        :param height: <int> The index of the last block in the chain.
+        :param block_hash: <str> The hash of the last block in the chain.
+        :param pending: <list<Transaction Object>> The transactions
+            waiting to be mined.
+        :param wallet_coins: <list<Coin Object>> The coins in the wallet.
+        """
+
+        snapshot = {
+            'height': height,
+            'hash': block_hash,
+            'pending': [transaction.to_json() for transaction in pending],
+            'wallet': [coin.to_json() for coin in wallet_coins]
+        }
+
+        with self.lock:
+            self.connection.executemany('INSERT OR REPLACE INTO snapshot VALUES (?, ?)',
+                                        [(key, json.dumps(value)) for key, value in snapshot.items()])
+            self.connection.commit()
+            self.height = height
+
+        logging.info('Took a snapshot of the history at block %s', height)
+
+    def get_snapshot(self):
+        """
+        get_snapshot()
+
+        Retrieves the details of the last snapshot.
+
+        :return: <dict> The height, hash, pending transactions and wallet
+            coins of the snapshot in JSON Object form, or None if no
+            snapshot has been taken.
+        """
+
+        with self.lock:
+            rows = self.connection.execute('SELECT key, value FROM snapshot').fetchall()
+
+        if len(rows) == 0:
+            return None
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def clear(self):
+        """
+        clear()
+
+        Removes every coin, transaction and snapshot from the store.
+        """
+
+        with self.lock:
+            self.coins.clear()
+            self.transactions.clear()
+            self.connection.execute('DELETE FROM snapshot')
+            self.connection.commit()
+            self.height = 0
+
+    def close(self):
+        """
+        close()
+
+        Closes the database. Anything since the last snapshot is lost.
+        """
+
+        with self.lock:
+            self.connection.rollback()
+            self.connection.close()
+
+
+def restore_chain(store, blockchain, history, coin_store=None):
+    """
+    restore_chain()
+
+    Rebuilds the chain and the history of a node from a store. Blocks are
+    checked to follow on from the one before them and the store is cut off
+    at the first block that does not. A store whose first block does not
+    follow on from the genesis block, for example because the genesis
+    block of a benchmark is different on every run, is left alone and not
+    attached. When the history has a snapshot in a
+    coin store that matches a block in the store, only the blocks after it
+    are applied to the history and the transactions that were waiting to
+    be mined are restored. The store is attached to the blockchain
+    afterwards so that new blocks are written to it.
+
+    :param store: <BlockStore Object> The store to read.
+    :param blockchain: <Blockchain Object> The blockchain that only holds
+        the genesis block.
+    :param history: <History Object> The history of the node.
+    :param coin_store: <CoinStore Object> The store that holds the coins
+        and transactions of the history.
+
+    :return: <int> The number of blocks that were restored.
+    """
+
+    genesis = blockchain.last_block
+    first = store.get(0) if len(store) > 0 else None
+    if len(store) > 0 and (first is None or first.previous_hash != genesis.hash):
+        logging.error('Block store does not follow on from the genesis block, it is not used')
+        if coin_store is not None:
+            history.reset()
+        return 0
+
+    snapshot = coin_store.get_snapshot() if coin_store is not None else None
+    height = 1
+
+    if snapshot is not None:
+        # The genesis block is not in the store.
+        position = snapshot['height'] - 2
+        if position < len(store) and (position < 0 or store.get(position).hash == snapshot['hash']):
+            height = snapshot['height']
+            for coin in snapshot['wallet']:
+                history.get_wallet().add_coin(coin_from_json(coin))
+        else:
+            logging.warning('Snapshot of the history is not in the block store')
+            snapshot = None
+
+    if snapshot is None and coin_store is not None:
+        history.reset()
+        coin_store.clear()
+
+    included = set()
+    restored = 0
+    blocks = store.replay()
+    try:
+        for block in blocks:
+            last_block = blockchain.last_block
+            if block is None or block.index != last_block.index + 1 or block.previous_hash != last_block.hash:
+                logging.warning('Block store does not follow on from block %s', last_block.index)
+                break
+
+            if block.index > height:
+                for transaction in block.transactions[1:] + block.transactions[:1]:
+                    included.add(transaction.get_uuid())
+                    # Transactions that were waiting to be mined are already
+                    # in the snapshot.
+                    if history.get_transaction(transaction.get_uuid()) is None:
+                        history.apply_transaction(transaction)
+
+            blockchain.add_block(block)
+            history.confirm_block(block)
+            restored += 1
+    finally:
+        blocks.close()
+
+    store.truncate(restored)
+    blockchain.attach_store(store)
+
+    if snapshot is not None:
+        for data in snapshot['pending']:
+            transaction = transaction_from_json(data)
+            if transaction.get_uuid() not in included:
+                blockchain.current_transactions.append(transaction)
+                blockchain.unclaimed.add(transaction.get_uuid())
+
+    logging.info('Restored %s blocks from the block store', restored)
+
+    return restored
@@ -12,6 +12,7 @@ from urllib.parse import urlparse
 from hashlib import sha1
 import logging
 import json
+from queue import Full
 from uuid import uuid4
 from time import sleep
 from datetime import datetime
@@ -19,10 +20,13 @@ from datetime import datetime
 # Local imports
 from block import block_from_json
 from coin import Coin
-from transaction import Transaction, transaction_from_json, transaction_verify
-from connection import MultipleConnectionHandler, ConnectionHandler, SingleConnectionHandler
-from macros import RECEIVE_BLOCK, RECEIVE_TRANSACTION, REGISTER_NODES, SEND_CHAIN, SEND_CHAIN_SECTION, RESOLVE_CONFLICTS
+from transaction import Transaction, transaction_verify
+from codec import CODEC_NAMES, JSON_CODEC
+from connection import MultipleConnectionHandler, ConnectionHandler, SingleConnectionHandler, FRAME_HEADER
+from macros import (RECEIVE_BLOCK, RECEIVE_TRANSACTION, REGISTER_NODES, SEND_CHAIN, SEND_CHAIN_SECTION, RESOLVE_CONFLICTS,
+                    SEND_TRANSACTION_PROOF)
 from history import History
+from validation import BlockValidator
 
 
 THREAD_FUNCTIONS = dict()
@@ -163,6 +167,39 @@ def get_block(index, *args, **kwargs):
     ConnectionHandler()._send(conn, block)
 
 
+@thread_function
+def get_transaction_proof(index, transaction_id, *args, **kwargs):
+    """
+    get_transaction_proof()
+
+    This function handles a request from the dispatcher.
+    It returns the header of a block along with the Merkle path that
+    proves a transaction is in that block.
+
+    :param index: <int> Index of the block that holds the transaction.
+    :param transaction_id: <str> The UUID of the transaction.
+    """
+
+    metadata = args[0]
+    conn = args[2]
+
+    block = metadata['blockchain'].get_block(index)
+
+    if block is None:
+        ConnectionHandler()._send(conn, "Block does not exist")
+        return
+
+    proof = block.get_transaction_proof(transaction_id)
+
+    if proof is None:
+        ConnectionHandler()._send(conn, "Transaction does not exist")
+        return
+
+    transaction, path = proof
+
+    ConnectionHandler()._send(conn, SEND_TRANSACTION_PROOF(block.header, transaction, path))
+
+
 @thread_function
 def new_transaction(trans_data, *args, **kwargs):
     """
@@ -241,7 +278,9 @@ def register_nodes(peers, *args, **kwargs):
 
     NOTE: We assume that nodes don't drop later in the blockchain's lifespan
 
-    :param new_peers: <list> The address of the peer [[host, port], ...].
+    :param new_peers: <list> The address of the peer [[host, port], ...]. A
+        peer may be followed by a list of the names of the codecs it
+        supports, [host, port, [codec, ...]].
 
     :raises: <ValueError> When an invalid address is supplied.
     """
@@ -259,6 +298,12 @@ def register_nodes(peers, *args, **kwargs):
         else:
             continue
 
+        if len(peer) == 3 and isinstance(peer[2], list):
+            codecs = peer[2]
+            peer = peer[:2]
+        else:
+            codecs = None
+
         if not len(peer) == 2:
             continue
         if not isinstance(peer[0], str):
@@ -274,6 +319,8 @@ def register_nodes(peers, *args, **kwargs):
 
             if parsed_url.netloc:
                 new_peer = (parsed_url.netloc, peer[1])
+                if codecs is not None and metadata.get('pool') is not None:
+                    metadata['pool'].advertise(new_peer, codecs)
                 if new_peer not in metadata['peers']:
                     metadata['peers'].append(new_peer)
                     logging.debug(parsed_url.netloc, peer[1])
@@ -283,6 +330,8 @@ def register_nodes(peers, *args, **kwargs):
             elif parsed_url.path:
                 # Accepts an URL without scheme like '192.168.0.5:5000'.
                 new_peer = (parsed_url.path, peer[1])
+                if codecs is not None and metadata.get('pool') is not None:
+                    metadata['pool'].advertise(new_peer, codecs)
                 if new_peer not in metadata['peers']:
                     metadata['peers'].append(new_peer)
                     logging.debug(str(parsed_url.path))
@@ -302,7 +351,7 @@ def register_nodes(peers, *args, **kwargs):
                 SingleConnectionHandler(
                     new_peer[0],
                     new_peer[1]
-                ).send_wout_response(REGISTER_NODES([[metadata['host'], metadata['port']]]))
+                ).send_wout_response(REGISTER_NODES([[metadata['host'], metadata['port'], CODEC_NAMES]]))
             except ConnectionRefusedError:
                 pass
 
@@ -332,6 +381,9 @@ def unregister_nodes(peers, *args, **kwargs):
             metadata['peers'].remove(peer)
         except ValueError:
             pass
+
+        if metadata.get('pool') is not None:
+            metadata['pool'].remove(peer)
         logging.debug(peer)
 
 
@@ -382,7 +434,8 @@ def benchmark_initialize(node_ids, value, *args, **kwargs):
     metadata['history'].add_transaction(transaction)
 
     # Add transaction to genesis block.
-    metadata['blockchain'].chain[0].transactions.append(transaction)
+    genesis = metadata['blockchain'].chain[0]
+    genesis.transactions = genesis.transactions + (transaction,)
 
     # Mark benchmark as false to prevent repeat calls and release the
     # semaphore so that mining can begin.
@@ -414,7 +467,7 @@ def resolve_conflicts(*args, **kwargs):
     port = metadata['port']
     length = metadata['blockchain'].last_block_index
 
-    responses = MultipleConnectionHandler(metadata['peers']).send_with_response(
+    responses = MultipleConnectionHandler(metadata['peers'], metadata.get('pool')).send_with_response(
                     RESOLVE_CONFLICTS(request_id, host, port, length))
 
     # Aggregate responses and wait for empty queue.
@@ -442,12 +495,30 @@ def get_balance(*args, **kwargs):
     wallet = history.get_wallet()
     wallet_lock = wallet.get_lock()
 
-    with wallet_lock:
+    with wallet_lock.read():
         balance = wallet.get_balance()
 
     ConnectionHandler()._send(conn, balance)
 
 
+@thread_function
+def get_hashrate(*args, **kwargs):
+    """
+    get_hashrate()
+
+    This endpoint is used to get the hashrate of each proof of work
+    engine worker on this node.
+    """
+
+    metadata = args[0]
+    conn = args[2]
+
+    engine = metadata['engine']
+    hashrates = [] if engine is None else engine.get_hashrates()
+
+    ConnectionHandler()._send(conn, hashrates)
+
+
 """
 Private API calls.
 """
@@ -505,27 +576,165 @@ def receive_transaction_internal(trans_data, metadata, queues):
     This function is an internal version to allow new transactions on the node to
     be added without going through the network.
 
+    The batch is verified in stages. The checks that do not need the
+    history run first without any lock, split over the validation
+    processes for large batches. The rest is then verified against the
+    history and applied in the order of the batch while it is locked. A
+    transaction that spends a coin spent by one accepted earlier in the
+    batch is rejected without looking at the history.
+
     :param trans_data: <dict> The data of the transactions off the network.
     """
 
     history = metadata['history']
     history_lock = history.get_lock()
 
-    with history_lock:
-        transactions = []
-        for transaction in trans_data:
-            new_transaction = transaction_from_json(transaction)
-            check = transaction_verify(history, new_transaction)
-            if check:
-                queues['trans'].put(new_transaction)
-                transactions.append(new_transaction.to_json())
-            else:
-                transactions.append('{"status": "Transaction verification failed", "transaction": ' +
-                                    json.dumps(transaction) + '}')
+    statuses = [None] * len(trans_data)
+    batch = check_transactions(trans_data, statuses, metadata.get('validator'))
+
+    # Transactions only lock the coins they use so that transactions that
+    # do not conflict are verified at the same time.
+    accepted = set()
+    spent = set()
+    with history_lock.read():
+        for i, new_transaction in batch:
+            inputs = [coin.get_uuid() for coin in new_transaction.get_inputs()]
+            if new_transaction.get_uuid() in accepted or not spent.isdisjoint(inputs):
+                statuses[i] = 'Transaction conflicts with another in the batch'
+                continue
+
+            statuses[i] = accept_transaction(new_transaction, metadata, queues)
+            if statuses[i] is None:
+                accepted.add(new_transaction.get_uuid())
+                spent.update(inputs)
+
+    checked = dict(batch)
+    transactions = []
+    for i, transaction in enumerate(trans_data):
+        if statuses[i] is None:
+            transactions.append(checked[i].to_json())
+        else:
+            transactions.append('{"status": "' + statuses[i] + '", "transaction": ' + json.dumps(transaction) + '}')
 
     return transactions
 
 
+def check_transactions(trans_data, statuses, validator=None):
+    """
+    check_transactions()
+
+    This function runs the checks of a batch of transactions that do not
+    need the history.
+
+    :param trans_data: <list<dict>> The data of the transactions off the
+        network.
+    :param statuses: <list<str>> The reason each transaction was rejected,
+        filled in for the ones that fail.
+    :param validator: <BlockValidator Object> The validator to check the
+        transactions with or None to check them on this thread.
+
+    :return: <list<tuple<int>, <Transaction Object>>> The position and
+        transaction of every one that passed.
+    """
+
+    if validator is None:
+        validator = BlockValidator()
+
+    batch = []
+    for i, (status, new_transaction) in enumerate(validator.check_transactions(trans_data)):
+        if status is None:
+            batch.append((i, new_transaction))
+        else:
+            statuses[i] = status
+
+    return batch
+
+
+def accept_transaction(transaction, metadata, queues):
+    """
+    accept_transaction()
+
+    This function verifies a transaction and passes it on to the miner. A
+    transaction that spends coins of a transaction that has not arrived yet
+    is kept as an orphan until it does. Once a transaction is accepted the
+    orphans that were waiting on it are verified again. The history must
+    be locked at least for reading.
+
+    :param transaction: <Transaction Object> The transaction.
+    :param metadata: <dict> The metadata of the node.
+    :param queues: <dict> The queues of the node.
+
+    :return: <str> The reason the transaction was not accepted or None if
+        it was.
+    """
+
+    history = metadata['history']
+    mempool = metadata['blockchain'].current_transactions
+    orphans = metadata['blockchain'].orphans
+
+    status = None
+    waiting = [transaction]
+    while len(waiting) > 0:
+        current = waiting.pop(0)
+        result = verify_transaction(current, history, mempool, orphans, queues)
+        if result is None:
+            waiting.extend(orphans.resolve(current))
+        elif current is transaction:
+            status = result
+        else:
+            logging.info('Orphan transaction ' + current.get_uuid() + ' dropped: ' + result)
+
+    return status
+
+
+def verify_transaction(transaction, history, mempool, orphans, queues):
+    """
+    verify_transaction()
+
+    This function verifies a single transaction and puts it on the queue
+    for the miner.
+
+    :param transaction: <Transaction Object> The transaction.
+    :param history: <History Object> The history of the node.
+    :param mempool: <Mempool Object> The transactions waiting to be mined.
+    :param orphans: <OrphanPool Object> The transactions waiting for the
+        coins they spend.
+    :param queues: <dict> The queues of the node.
+
+    :return: <str> The reason the transaction was not accepted or None if
+        it was.
+    """
+
+    if not mempool.accepts(transaction):
+        return 'Transaction fee too low'
+
+    uuids = [transaction.get_uuid()]
+    uuids.extend(coin.get_uuid() for coin in transaction.get_inputs())
+    uuids.extend(coin.get_uuid() for coin in transaction.get_all_output_coins())
+
+    with history.get_coin_locks().acquire(uuids):
+        if history.get_transaction(transaction.get_uuid()) is None:
+            # Coins of transactions that are not known yet are missing
+            # rather than spent.
+            missing = [coin.get_uuid() for coin in transaction.get_inputs()
+                       if history.get_coin(coin.get_uuid()) is None and
+                       history.get_transaction(coin.get_transaction_id()) is None]
+            if len(missing) > 0:
+                orphans.add(transaction, missing)
+                return 'Transaction waiting for its inputs'
+
+        if not transaction_verify(history, transaction):
+            return 'Transaction verification failed'
+
+        try:
+            queues['trans'].put_nowait(transaction)
+        except Full:
+            history.undo_transaction(transaction)
+            return 'Transaction queue full'
+
+    return None
+
+
 @thread_function
 def forward_transaction(transaction_list, *args, **kwargs):
     """
@@ -539,7 +748,7 @@ def forward_transaction(transaction_list, *args, **kwargs):
 
     metadata = args[0]
 
-    connection = MultipleConnectionHandler(metadata['peers'])
+    connection = MultipleConnectionHandler(metadata['peers'], metadata.get('pool'))
 
     message = RECEIVE_TRANSACTION(transaction_list)
 
@@ -560,7 +769,7 @@ def forward_block(block, host, port, *args, **kwargs):
 
     metadata = args[0]
 
-    connection = MultipleConnectionHandler(metadata['peers'])
+    connection = MultipleConnectionHandler(metadata['peers'], metadata.get('pool'))
 
     message = RECEIVE_BLOCK(block, host, port)
 
@@ -584,17 +793,14 @@ def resolve_conflicts_internal(request_id, host, port, current_index, *args, **k
     metadata = args[0]
     conn = args[2]
 
-    metadata['resolve_lock'].acquire()
-
-    if request_id in metadata['resolve_requests']:
-        ConnectionHandler()._send(conn, 0)
-        return
-
-    metadata['resolve_requests'].add(request_id)
+    with metadata['resolve_lock']:
+        if request_id in metadata['resolve_requests']:
+            ConnectionHandler()._send(conn, 0)
+            return
 
-    metadata['resolve_lock'].release()
+        metadata['resolve_requests'].add(request_id)
 
-    responses = MultipleConnectionHandler(metadata['peers']).send_with_response(
+    responses = MultipleConnectionHandler(metadata['peers'], metadata.get('pool')).send_with_response(
                     RESOLVE_CONFLICTS(request_id, host, port, current_index))
 
     blocks_sent = 0
@@ -641,5 +847,5 @@ def response_test(*args, **kwargs):
 
     conn = args[2]
 
-    message = '20~{"message": "hello"}'
-    conn.send(message.encode())
+    message = b'{"message": "hello"}'
+    conn.sendall(FRAME_HEADER.pack(len(message), JSON_CODEC.id) + message)
@@ -13,13 +13,16 @@ from json import loads
 from queue import Empty
 
 # Local imports
-from block import block_from_string
-from blockchain import Blockchain
+from block import block_from_string, merkle_leaf, merkle_parent, merkle_path, merkle_root, verify_merkle_path
+from blockchain import Blockchain, BlockTemplate
 from tests.constants import create_metadata, queues, FakeConnection, BLANK_BLOCK
-from tasks import receive_block
-from mine import handle_blocks, BlockException
-from transaction import Transaction
-from coin import Coin
+from tasks import get_transaction_proof, receive_block
+from history import History
+import mine
+from mine import handle_blocks, resolve_conflicts, BlockException
+from transaction import RewardTransaction, Transaction
+from coin import Coin, RewardCoin
+from validation import BlockValidator, check_block
 
 # Third party imports
 import pytest
@@ -64,8 +67,8 @@ def test_block_with_good_transaction(blockchain):
     block = block_from_string(BLANK_BLOCK(4, [Transaction("B", [Coin("ABC", 100, "TEST")],
                                                           {"C": [Coin("DCE", 100, "OUTCOIN")]},
                                                           "DCE", datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ'))],
-                                          25399,
-                                          "7b351d6c1a892f09469c7a44932de17b94e9fe44f94acc68f87077c2780c1f87"))
+                                          120718,
+                                          "edaf9ddaa11566d3359040c9e2c2479597d7476fbc5829d8a88bb0a5645d9309"))
 
     queues['blocks'].put((('127.0.0.1', 5000), block))
 
@@ -101,3 +104,156 @@ def test_block_with_greater_index(blockchain):
     assert queues['blocks'].get(block=False) is not None
     with pytest.raises(Empty):
         queues['blocks'].get(block=False)
+
+
+def test_block_template_matches_valid_proof(blockchain):
+    last_block = blockchain.get_block(3)
+    transactions = list(block_from_string(BLANK_BLOCK(4, [], "0", last_block.hash)).transactions)
+
+    template = BlockTemplate(last_block.proof, last_block.hash, transactions)
+
+    for proof in range(100):
+        assert template.valid_proof(proof) == Blockchain.valid_proof(last_block.proof, proof, last_block.hash,
+                                                                     transactions)
+
+    digest = template.hash_proof(1)
+    transactions.append(Transaction("B", [], {}, "NEW", datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ')))
+    template.update(transactions)
+
+    assert template.hash_proof(1) != digest
+
+
+def test_block_hash_is_cached_until_changed():
+    block = block_from_string(BLANK_BLOCK(2, [], "1", "1"))
+
+    header = block.header
+    assert block.header is header
+    assert block.hash == header.hash
+
+    block.proof = "2"
+
+    assert block.header is not header
+    assert block.hash != header.hash
+
+
+def test_block_transactions_are_immutable():
+    block = block_from_string(BLANK_BLOCK(2, [], "1", "1"))
+
+    with pytest.raises(AttributeError):
+        block.transactions.append(None)
+
+
+def test_transaction_proof():
+    transactions = [Transaction("B", [], {}, "T" + str(i), "now") for i in range(5)]
+    block = block_from_string(BLANK_BLOCK(2, transactions, "1", "1"))
+
+    blockchain = Blockchain()
+    blockchain.add_block(block)
+    metadata = create_metadata(blockchain=blockchain)
+
+    assert block.header.merkle_root == merkle_root([transaction.hash for transaction in block.transactions])
+
+    for transaction in transactions:
+        fake_socket = FakeConnection()
+        get_transaction_proof(2, transaction.get_uuid(), metadata, queues, fake_socket)
+        data = fake_socket.read_data()
+
+        assert data['transaction'] == transaction.to_json()
+        assert data['header'] == block.header.to_json()
+        assert verify_merkle_path(transaction.hash, data['path'], data['header']['merkle_root'])
+        assert not verify_merkle_path(transactions[0].hash if transaction != transactions[0] else transactions[1].hash,
+                                      data['path'], data['header']['merkle_root'])
+
+
+def test_merkle_internal_node_is_not_a_leaf():
+    hashes = [str(i) * 64 for i in range(4)]
+    root = merkle_root(hashes)
+
+    # The parent of the first two leaves can not be proven as a leaf.
+    parent = merkle_parent(merkle_leaf(hashes[0]), merkle_leaf(hashes[1]))
+    sibling = merkle_parent(merkle_leaf(hashes[2]), merkle_leaf(hashes[3]))
+    assert not verify_merkle_path(parent, [[sibling, 'right']], root)
+    assert verify_merkle_path(hashes[0], merkle_path(hashes, 0), root)
+
+
+def test_block_with_repeated_transaction():
+    timestamp = datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ')
+    blockchain = Blockchain()
+    blockchain.new_block("1", "1", timestamp)
+    blockchain.new_block("2", "2", timestamp)
+    last_block = blockchain.last_block
+
+    first = Transaction("B", [Coin("ABC", 100, "TEST")], {"C": [Coin("DCE", 100, "OUTCOIN")]}, "DCE", timestamp)
+    last = Transaction("B", [Coin("GHI", 50, "TEST2")], {"D": [Coin("JKL", 50, "OUTCOIN2")]}, "JKL", timestamp)
+
+    block = block_from_string(BLANK_BLOCK(4, [first, last], 282310, last_block.hash))
+    repeated = block_from_string(BLANK_BLOCK(4, [first, last, last], 282310, last_block.hash))
+
+    # Repeating the last transaction does not change the root, so the proof
+    # of the valid block also holds for the repeated one.
+    hashes = [t.hash for t in repeated.transactions]
+    assert merkle_root(hashes) == merkle_root(hashes[:-1])
+    assert merkle_root(hashes[:-1]) == merkle_root([t.hash for t in block.transactions])
+
+    assert check_block(block, last_block.proof, last_block.hash) is not None
+    assert check_block(repeated, last_block.proof, last_block.hash) is None
+
+
+def test_transaction_proof_missing_transaction():
+    blockchain = Blockchain()
+    blockchain.add_block(block_from_string(BLANK_BLOCK(2, [], "1", "1")))
+    metadata = create_metadata(blockchain=blockchain)
+
+    fake_socket = FakeConnection()
+    get_transaction_proof(2, "MISSING", metadata, queues, fake_socket)
+
+    assert fake_socket.read_data() == "Transaction does not exist"
+
+
+def create_peer_chain(length):
+    timestamp = datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ')
+    peer = Blockchain()
+    for i in range(length):
+        reward_id = 'CONFLICT' + str(i)
+        reward = RewardTransaction([], {'A': [RewardCoin(reward_id, 5, reward_id + 'C')]}, reward_id, timestamp)
+        last_block = peer.last_block
+        proof = BlockTemplate(last_block.proof, last_block.hash, [reward]).search(0, 10 ** 9)
+        peer.update_reward(reward)
+        peer.new_block(proof, last_block.hash, timestamp)
+
+    return peer
+
+
+@pytest.mark.parametrize('valid', [True, False])
+def test_resolve_conflicts(monkeypatch, valid):
+    peer = create_peer_chain(3)
+    chain = peer.get_chain()
+    if not valid:
+        chain[2]['proof'] += 1
+
+    class PeerConnection():
+        def __init__(self, *args):
+            pass
+
+        def send_with_response(self, data):
+            return {'section': chain, 'status': 'FINISHED'}
+
+    monkeypatch.setattr(mine, 'SingleConnectionHandler', PeerConnection)
+
+    metadata = create_metadata(blockchain=Blockchain())
+    metadata['validator'] = BlockValidator(2)
+    history = History()
+    reward = RewardTransaction([], {'A': [RewardCoin('MINE', 5, 'MINEC')]}, 'MINE')
+
+    try:
+        result = resolve_conflicts(peer.last_block, history.get_overlay(), ('localhost', 5001), metadata, reward)
+    finally:
+        metadata['validator'].shutdown()
+
+    # A bad block after a good one leaves the chain as it was.
+    assert result is valid
+    if valid:
+        assert metadata['blockchain'].chain == peer.chain
+        assert history.get_transaction('CONFLICT2') is not None
+    else:
+        assert len(metadata['blockchain'].chain) == 1
@@ -0,0 +1,48 @@
+"""
+Codec_test.py
+
+This file tests the codecs that messages are sent over the network with.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from uuid import uuid4
+
+# Local imports
+from block import Block
+from codec import JSON_CODEC, get_codec, get_codec_by_name
+from coin import Coin, RewardCoin
+from transaction import Transaction, RewardTransaction
+
+# Third party imports
+import pytest
+
+
+def create_block():
+    reward_id = uuid4().hex
+    reward_coin = RewardCoin(reward_id, 5)
+    reward = RewardTransaction([], {'A': [reward_coin]}, reward_id, 'now')
+
+    transaction_id = uuid4().hex
+    transaction = Transaction('A', [Coin(reward_id, 5, reward_coin.get_uuid())],
+                              {'B': [Coin(transaction_id, 2.5)], 'A': [Coin(transaction_id, 2.5)]},
+                              transaction_id, 'now')
+
+    return Block(1, [reward, transaction], 12345, 'a' * 64)
+
+
+def test_json_round_trip():
+    block = create_block()
+
+    assert JSON_CODEC.decode(JSON_CODEC.encode(block)) == block.to_json()
+
+
+def test_get_codec():
+    assert get_codec(0) is JSON_CODEC
+    assert get_codec_by_name('json') is JSON_CODEC
+    assert get_codec_by_name('unknown') is None
+
+    with pytest.raises(ValueError):
+        get_codec(1)
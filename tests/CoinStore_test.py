@@ -0,0 +1,151 @@
+"""
+CoinStore_test.py
+
+This file tests the coin store.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Local imports
+from blockchain import Blockchain
+from coin import Coin, RewardCoin
+from history import History
+from store import BlockStore, CoinStore, restore_chain
+from transaction import RewardTransaction, Transaction
+from tests.constants import create_metadata
+
+# Third party imports
+import pytest
+
+
+@pytest.fixture()
+def directory(tmp_path):
+    return tmp_path / 'store'
+
+
+@pytest.fixture()
+def history():
+    create_metadata()
+    history = History()
+
+    yield history
+
+    # Put the history back in memory for the other tests.
+    History.instance.coins = {}
+    History.instance.transactions = {}
+    history.reset()
+
+
+def add_blocks(blockchain, history, count):
+    for i in range(count):
+        reward_id = 'REWARD' + str(len(blockchain.chain)) + str(i)
+        reward = RewardTransaction([], {'A': [RewardCoin(reward_id, 5, reward_id + 'C')]}, reward_id, 'now')
+        history.apply_transaction(reward)
+        blockchain.update_reward(reward)
+        blockchain.new_block(i, blockchain.last_block.hash)
+    blockchain.write_store()
+
+
+def test_coin_store_mapping(directory):
+    store = CoinStore(str(directory / 'node.db'), 2)
+
+    for i in range(3):
+        store.coins['COIN' + str(i)] = Coin('TRANS', i, 'COIN' + str(i))
+    store.transactions['TRANS'] = Transaction('A', [], {'B': [Coin('TRANS', 1, 'COIN1')]}, 'TRANS', 'now')
+
+    # Only the most recently used coins are kept in memory.
+    assert list(store.coins.cache) == ['COIN1', 'COIN2']
+    assert store.coins['COIN0'] == Coin('TRANS', 0, 'COIN0')
+    assert list(store.coins.cache) == ['COIN2', 'COIN0']
+
+    assert len(store.coins) == 3
+    assert sorted(store.coins) == ['COIN0', 'COIN1', 'COIN2']
+    assert store.transactions['TRANS'].get_output_coins('B') == (Coin('TRANS', 1, 'COIN1'),)
+
+    del store.coins['COIN1']
+    assert store.coins.get('COIN1') is None
+    with pytest.raises(KeyError):
+        del store.coins['COIN1']
+
+    store.coins.clear()
+    assert len(store.coins) == 0
+
+
+def test_coin_store_snapshot(directory):
+    path = str(directory / 'node.db')
+    store = CoinStore(path, 10)
+    assert store.get_snapshot() is None
+
+    store.coins['COIN0'] = RewardCoin('REWARD', 5, 'COIN0')
+    store.snapshot(2, 'HASH', [], [Coin('TRANS', 1, 'COIN1')])
+    store.coins['COIN1'] = Coin('TRANS', 1, 'COIN1')
+    store.close()
+
+    # Changes since the snapshot are lost.
+    store = CoinStore(path, 10, 3)
+    assert list(store.coins) == ['COIN0']
+    assert isinstance(store.coins['COIN0'], RewardCoin)
+
+    snapshot = store.get_snapshot()
+    assert snapshot['height'] == 2
+    assert snapshot['hash'] == 'HASH'
+    assert snapshot['wallet'] == [Coin('TRANS', 1, 'COIN1').to_json()]
+
+    assert not store.snapshot_due(4)
+    assert store.snapshot_due(5)
+
+
+def test_restore_chain_from_snapshot(directory, history):
+    coin_store = CoinStore(str(directory / 'node.db'), 10)
+    history.attach_store(coin_store)
+    history.reset()
+
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(str(directory / 'node.log'))
+    add_blocks(blockchain, history, 2)
+
+    pending = Transaction('A', [], {'B': [Coin('PENDING', 0, 'PENDINGC')]}, 'PENDING', 'now')
+    history.apply_transaction(pending)
+    coin_store.snapshot(blockchain.last_block_index, blockchain.last_block.hash, [pending], [])
+
+    add_blocks(blockchain, history, 2)
+    blockchain.store.close()
+    coin_store.close()
+
+    # Only the blocks after the snapshot are applied to the history.
+    coin_store = CoinStore(str(directory / 'node.db'), 10)
+    history.attach_store(coin_store)
+    assert history.get_coin('REWARD41C') is None
+
+    restored = Blockchain()
+    assert restore_chain(BlockStore(str(directory / 'node.log')), restored, history, coin_store) == 4
+
+    assert restored.chain == blockchain.chain
+    assert restored.current_transactions == [pending]
+    assert restored.unclaimed == {'PENDING'}
+    for reward_id in ('REWARD10', 'REWARD21', 'REWARD30', 'REWARD41'):
+        assert history.get_transaction(reward_id) is not None
+        assert history.get_coin(reward_id + 'C') is not None
+
+
+def test_restore_chain_bad_snapshot(directory, history):
+    coin_store = CoinStore(str(directory / 'node.db'), 10)
+    history.attach_store(coin_store)
+    history.reset()
+
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(str(directory / 'node.log'))
+    add_blocks(blockchain, history, 2)
+
+    history.add_coin(Coin('STALE', 1, 'STALEC'))
+    coin_store.snapshot(blockchain.last_block_index, 'NOT A HASH', [], [])
+    blockchain.store.close()
+
+    # A snapshot that does not match the blocks is thrown away.
+    restored = Blockchain()
+    assert restore_chain(BlockStore(str(directory / 'node.log')), restored, history, coin_store) == 2
+
+    assert coin_store.get_snapshot() is None
+    assert history.get_coin('STALEC') is None
+    assert history.get_coin('REWARD21C') is not None
@@ -0,0 +1,60 @@
+"""
+Engine_test.py
+
+This file tests the multi-process proof of work engine.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Local imports
+from blockchain import BlockTemplate
+from engine import ProofEngine
+
+# Third party imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = ProofEngine(2)
+    yield engine
+    engine.shutdown()
+
+
+@pytest.fixture()
+def template():
+    template = BlockTemplate(100, "HASH", [])
+
+    # Lower the difficulty so that a proof is found quickly.
+    template.difficulty = 2
+    template.target = '00'
+
+    return template
+
+
+def test_engine_finds_valid_proof(engine, template):
+    engine.start(template)
+    proof = engine.wait(30)
+    engine.stop()
+
+    assert proof is not None
+    assert template.valid_proof(proof)
+
+
+def test_engine_reports_hashrates(engine, template):
+    engine.start(template)
+    engine.wait(30)
+    engine.stop()
+
+    hashrates = engine.get_hashrates()
+
+    assert len(hashrates) == 2
+    assert sum(hashrates) > 0
+
+
+def test_engine_discards_aborted_proofs(engine, template):
+    engine.start(template)
+    engine.stop()
+
+    assert engine.wait(0.5) is None
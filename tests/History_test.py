@@ -0,0 +1,175 @@
+"""
+History_test.py
+
+This file tests the copy-on-write overlay of the history.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Local imports
+from block import Block
+from blockchain import Blockchain
+from coin import Coin
+from history import History
+from macros import MAX_REORG_DEPTH
+from transaction import Transaction
+from tests.constants import create_metadata
+
+# Third party imports
+import pytest
+
+
+@pytest.fixture()
+def history():
+    metadata = create_metadata()
+    history = metadata['history']
+    history.reset()
+
+    return history
+
+
+def create_transaction(sender, recipient, transaction_id):
+    output = Coin(transaction_id, 10, transaction_id + 'C')
+    return Transaction(sender, [Coin('OLD', 10, 'OLD' + transaction_id)], {recipient: [output]}, transaction_id)
+
+
+def test_overlay_does_not_change_base(history):
+    coin = Coin('A', 1, 'COIN')
+    history.add_coin(coin)
+
+    overlay = history.get_overlay()
+    overlay.remove_coin('COIN')
+    overlay.add_coin(Coin('A', 2, 'NEW'))
+
+    assert overlay.get_coin('COIN') is None
+    assert overlay.get_coin('NEW') is not None
+    assert history.get_coin('COIN') is coin
+    assert history.get_coin('NEW') is None
+
+
+def test_overlay_commit(history):
+    history.add_coin(Coin('A', 1, 'COIN'))
+    uuid = History.instance.uuid
+    transaction = create_transaction('OTHER', uuid, 'T1')
+
+    overlay = history.get_overlay()
+    overlay.remove_coin('COIN')
+    overlay.add_transaction(transaction)
+
+    assert history.get_wallet().get_balance() == 0
+
+    overlay.commit()
+
+    assert history.get_coin('COIN') is None
+    assert history.get_transaction('T1') is transaction
+    assert history.get_wallet().get_balance() == 10
+    assert overlay.coins == {} and overlay.transactions == {}
+
+
+def test_overlay_remove_transaction(history):
+    uuid = History.instance.uuid
+    transaction = create_transaction('OTHER', uuid, 'T1')
+    history.add_transaction(transaction)
+
+    overlay = history.get_overlay()
+    overlay.remove_transaction('T1')
+
+    assert overlay.get_transaction('T1') is None
+    assert 'T1' not in overlay.get_transactions()
+    assert history.get_transaction('T1') is transaction
+
+    with pytest.raises(KeyError):
+        overlay.remove_transaction('T1')
+
+    overlay.commit()
+
+    assert history.get_transaction('T1') is None
+
+
+def test_nested_overlay(history):
+    history.add_coin(Coin('A', 1, 'COIN'))
+
+    overlay = history.get_overlay()
+    nested = overlay.get_overlay()
+    nested.remove_coin('COIN')
+    nested.commit()
+
+    assert overlay.get_coin('COIN') is None
+    assert history.get_coin('COIN') is not None
+
+    overlay.commit()
+
+    assert history.get_coin('COIN') is None
+
+
+def test_blockchain_copy():
+    blockchain = Blockchain()
+    blockchain_copy = blockchain.get_copy()
+
+    blockchain_copy.chain = blockchain_copy.chain[:-1]
+    blockchain_copy.current_transactions.append(Transaction('A', [], {}, 'TRANS', 'now'))
+
+    assert len(blockchain.chain) == 1
+    assert blockchain.current_transactions == []
+    assert blockchain_copy.chain == []
+
+
+def test_apply_and_undo_transaction(history):
+    uuid = History.instance.uuid
+    spent = Coin('OLD', 10, 'OLDT1')
+    history.add_coin(spent)
+
+    transaction = create_transaction(uuid, 'OTHER', 'T1')
+    history.get_wallet().add_coin(spent)
+
+    record = history.apply_transaction(transaction)
+    assert record.spent == (spent,)
+    assert record.created == ('T1C',)
+    assert history.get_coin('OLDT1') is None
+    assert history.get_coin('T1C') is not None
+    assert 'OLDT1' not in history.get_wallet().uuid_lookup
+
+    history.undo_transaction(transaction)
+    assert history.get_coin('OLDT1') is spent
+    assert history.get_coin('T1C') is None
+    assert history.get_transaction('T1') is None
+    assert 'OLDT1' in history.get_wallet().uuid_lookup
+
+
+def test_overlay_undo_transaction(history):
+    history.add_coin(Coin('OLD', 10, 'OLDT1'))
+    transaction = create_transaction('OTHER', History.instance.uuid, 'T1')
+    history.apply_transaction(transaction)
+
+    overlay = history.get_overlay()
+    overlay.undo_transaction(transaction)
+
+    assert overlay.get_coin('OLDT1') is not None
+    assert overlay.get_coin('T1C') is None
+    assert overlay.get_undo_record('T1') is None
+    assert History.instance.get_undo_record('T1') is not None
+
+    overlay.commit()
+
+    assert history.get_coin('OLDT1') is not None
+    assert history.get_transaction('T1') is None
+    assert 'T1C' not in history.get_wallet().uuid_lookup
+
+
+def test_undo_records_are_bounded(history):
+    for index in range(1, MAX_REORG_DEPTH + 11):
+        transaction = create_transaction('A', 'B', 'BOUND' + str(index))
+        history.apply_transaction(transaction)
+        history.confirm_block(Block(index, [transaction], 0, 'HASH'))
+
+    records = History.instance.undo_records
+    assert len(records) == MAX_REORG_DEPTH
+    assert len(History.instance.undo_blocks) == MAX_REORG_DEPTH
+    assert 'BOUND10' not in records
+    assert 'BOUND11' in records
+
+    # Transactions without an undo record can still be undone.
+    history.undo_transaction(history.get_transaction('BOUND1'))
+    assert history.get_transaction('BOUND1') is None
+    assert history.get_coin('OLDBOUND1') is not None
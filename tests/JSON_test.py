@@ -11,7 +11,7 @@ Santa Clara University
 import json
 
 # Local imports
-from coin import Coin
+from coin import Coin, compact_id, expand_id
 from encoder import ComplexEncoder
 from transaction import Transaction
 
@@ -44,3 +44,26 @@ def test_complex_encoder_transaction():
                         '"inputs": [{"uuid": "test", "transaction_id": "test", "value": 1}], '
                         '"outputs": {"1": [{"uuid": "test2", "transaction_id": "test", "value": 1}]}, '
                         '"input_value": 1, "output_value": 1, "reward_value": 0}')
+
+
+def test_compact_id():
+    uuid = '0123456789abcdef0123456789abcdef'
+
+    assert compact_id(uuid) == bytes.fromhex(uuid)
+    assert expand_id(compact_id(uuid)) == uuid
+
+    # Other IDs are kept as they are.
+    for other in ('test', uuid.upper(), uuid + '0'):
+        assert compact_id(other) == other
+        assert expand_id(other) == other
+
+
+def test_complex_encoder_compact_coin():
+    coin = Coin('0123456789abcdef0123456789abcdef', 1, 'fedcba9876543210fedcba9876543210')
+
+    assert json.loads(json.dumps(coin, cls=ComplexEncoder)) == {
+        'uuid': 'fedcba9876543210fedcba9876543210',
+        'transaction_id': '0123456789abcdef0123456789abcdef',
+        'value': 1
+    }
+    assert coin.get_uuid() == 'fedcba9876543210fedcba9876543210'
@@ -0,0 +1,172 @@
+"""
+Mempool_test.py
+
+This file tests the mempool.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Local imports
+from coin import Coin, RewardCoin
+from mempool import Mempool, OrphanPool
+from transaction import RewardTransaction, Transaction
+
+# Third party imports
+import pytest
+
+
+def create_transaction(uuid, spent, fee=0):
+    outputs = {'B': [Coin(uuid, 1, uuid + 'C')], 'SYSTEM': [Coin(uuid, fee, uuid + 'F')]}
+    return Transaction('A', [Coin('OLD', 1 + fee, spent)], outputs, uuid, 'now')
+
+
+def test_mempool_order():
+    first = create_transaction('FIRST', 'COIN1')
+    second = create_transaction('SECOND', 'COIN2')
+    reward = RewardTransaction([], {'A': [RewardCoin('REWARD', 5, 'REWARDC')]}, 'REWARD', 'now')
+
+    mempool = Mempool([first, second], 10, 10000, 0)
+    assert mempool == [first, second]
+
+    # The reward transaction always comes first.
+    mempool.append(reward)
+    assert mempool == [reward, first, second]
+    assert mempool[0] is reward
+    assert mempool.get_pending() == [first, second]
+    assert len(mempool) == 3
+
+
+def test_mempool_index():
+    first = create_transaction('FIRST', 'COIN1')
+    second = create_transaction('SECOND', 'COIN2')
+
+    mempool = Mempool([first, second], 10, 10000, 0)
+    assert mempool.get('SECOND') is second
+    assert mempool.get_spender('COIN1') is first
+    assert second in mempool
+
+    mempool.remove(first)
+    assert mempool == [second]
+    assert mempool.get_spender('COIN1') is None
+    assert mempool.discard('FIRST') is None
+
+    with pytest.raises(ValueError):
+        mempool.remove(first)
+
+
+def test_mempool_snapshot():
+    first = create_transaction('FIRST', 'COIN1')
+    second = create_transaction('SECOND', 'COIN2')
+
+    mempool = Mempool([first], 10, 10000, 0)
+    snapshot = mempool.snapshot()
+
+    # The snapshot is reused until the mempool changes.
+    assert mempool.snapshot() is snapshot
+
+    copy = mempool.get_copy()
+    copy.append(second)
+
+    assert mempool.snapshot() is snapshot
+    assert snapshot == [first]
+    assert copy == [first, second]
+
+
+def test_mempool_fee_order():
+    cheap = create_transaction('CHEAP', 'COIN1', 1)
+    child = create_transaction('CHILD', 'CHEAPC', 5)
+    rich = create_transaction('RICH', 'COIN2', 3)
+
+    mempool = Mempool([cheap, child, rich], 10, 10000, 0)
+
+    # A transaction never comes before the one whose coins it spends.
+    assert mempool == [rich, cheap, child]
+    assert mempool.get_pending() == [cheap, child, rich]
+
+
+def test_mempool_eviction():
+    cheap = create_transaction('CHEAP', 'COIN1', 1)
+    child = create_transaction('CHILD', 'CHEAPC', 1)
+    rich = create_transaction('RICH', 'COIN2', 3)
+
+    mempool = Mempool([cheap, child], 2, 10000, 2)
+
+    assert mempool.is_full()
+    assert not mempool.accepts(create_transaction('POOR', 'COIN3', 1))
+    assert mempool.add(create_transaction('POOR', 'COIN3', 1)) == (False, [])
+
+    # The cheapest transaction is evicted along with the one spending it.
+    assert mempool.accepts(rich)
+    assert mempool.add(rich) == (True, [child, cheap])
+    assert mempool == [rich]
+    assert mempool.get_spender('COIN1') is None
+
+
+def test_mempool_eviction_outbid():
+    cheap = create_transaction('CHEAP', 'COIN1', 1)
+    child = create_transaction('CHILD', 'CHEAPC', 5)
+
+    mempool = Mempool([cheap, child], 2, 10000, 0)
+
+    # The child of the cheapest transaction pays more than the newcomer.
+    assert mempool.add(create_transaction('RICH', 'COIN2', 3)) == (False, [])
+    assert mempool == [cheap, child]
+    assert mempool.add(create_transaction('RICHER', 'COIN2', 7)) == (True, [child, cheap])
+
+
+def test_mempool_eviction_rejected():
+    cheap = create_transaction('CHEAP', 'COIN1', 1)
+    other = create_transaction('OTHER', 'COIN2', 4)
+
+    mempool = Mempool([cheap, other], 2, 10000, 0)
+
+    # Evicting the parent of the transaction would leave it invalid.
+    assert mempool.add(create_transaction('CHILD', 'CHEAPC', 5)) == (False, [])
+    assert mempool.add(create_transaction('SAME', 'COIN3', 1)) == (False, [])
+    assert mempool == [other, cheap]
+
+    # Rejected additions do not lose the cheapest transaction.
+    assert mempool.add(create_transaction('RICH', 'COIN3', 2)) == (True, [cheap])
+
+
+def test_mempool_long_chain():
+    chain = [create_transaction('T0', 'COIN', 1)]
+    for i in range(1, 3000):
+        chain.append(create_transaction('T' + str(i), chain[-1].get_uuid() + 'C', 1))
+
+    mempool = Mempool(chain, 10000, 10 ** 9, 0)
+
+    # Every transaction comes before the one whose coins it spends.
+    assert mempool.get_descendants('T0') == [t.get_uuid() for t in reversed(chain[1:])]
+    assert mempool.get_descendants('T2999') == []
+
+
+def test_orphan_pool():
+    orphans = OrphanPool(60, 2)
+
+    first = create_transaction('FIRST', 'PARENTC')
+    second = create_transaction('SECOND', 'OTHERC')
+    third = create_transaction('THIRD', 'PARENTC')
+
+    orphans.add(first, ['PARENTC'])
+    orphans.add(second, ['OTHERC'])
+
+    # The oldest orphan is dropped when there are too many.
+    orphans.add(third, ['PARENTC'])
+    assert 'FIRST' not in orphans
+    assert len(orphans) == 2
+
+    parent = Transaction('A', [], {'A': [Coin('PARENT', 1, 'PARENTC')]}, 'PARENT', 'now')
+    assert orphans.resolve(parent) == [third]
+    assert orphans.resolve(parent) == []
+    assert 'SECOND' in orphans
+
+
+def test_orphan_pool_ttl():
+    orphans = OrphanPool(0, 10)
+    orphans.add(create_transaction('FIRST', 'PARENTC'), ['PARENTC'])
+
+    parent = Transaction('A', [], {'A': [Coin('PARENT', 1, 'PARENTC')]}, 'PARENT', 'now')
+    assert orphans.resolve(parent) == []
+    assert len(orphans) == 0
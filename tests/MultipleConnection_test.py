@@ -0,0 +1,77 @@
+"""
+MultipleConnection_test.py
+
+This file tests the concurrent fan-out to multiple peers.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from socket import create_server
+from threading import Thread
+from time import sleep, time
+import json
+
+# Local imports
+import connection
+from connection import MultipleConnectionHandler, FrameReader, FRAME_HEADER
+
+
+def fake_peer(delay, response=True):
+    """
+    Starts a peer that answers a single request with its port after the
+    given delay.
+    """
+
+    server = create_server(('localhost', 0))
+    port = server.getsockname()[1]
+    received = []
+
+    def serve():
+        conn, _ = server.accept()
+        received.append(FrameReader(conn).read())
+        sleep(delay)
+        if response:
+            message = json.dumps(port).encode()
+            conn.sendall(FRAME_HEADER.pack(len(message), 0) + message)
+        sleep(1)
+        conn.close()
+        server.close()
+
+    Thread(target=serve, daemon=True).start()
+
+    return ('localhost', port), received
+
+
+def test_send_with_response_is_concurrent():
+    peers = [fake_peer(0.5) for i in range(4)]
+
+    start = time()
+    responses = MultipleConnectionHandler([peer for peer, _ in peers]).send_with_response({"action": "test"})
+
+    assert responses == [peer[1] for peer, _ in peers]
+    assert time() - start < 1.5
+
+
+def test_send_with_response_partial_results(monkeypatch):
+    monkeypatch.setattr(connection, 'RESPONSE_TIMEOUT', 0.5)
+
+    fast, _ = fake_peer(0)
+    silent, _ = fake_peer(0, False)
+
+    responses = MultipleConnectionHandler([silent, fast]).send_with_response({"action": "test"})
+    assert responses == [fast[1]]
+
+
+def test_unreachable_peer_is_dropped():
+    peer, received = fake_peer(0)
+
+    handler = MultipleConnectionHandler([('localhost', 5009), peer])
+    assert len(handler.peer_connections) == 1
+
+    handler.send_wout_response({"action": "test"})
+    deadline = time() + 5
+    while not received and time() < deadline:
+        sleep(0.01)
+    assert received == [{"action": "test"}]
@@ -0,0 +1,61 @@
+"""
+Network_test.py
+
+This file tests the asyncio network front end.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from socket import create_connection
+from threading import Semaphore, Thread
+
+# Local imports
+from connection import SingleConnectionHandler
+from network import NetworkHandler
+from tests.constants import create_metadata
+
+# Third party imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def async_node():
+    metadata = create_metadata(port=5002)
+    metadata['done'] = Semaphore(0)
+    metadata['benchmark'] = False
+
+    handler = NetworkHandler(metadata, [])
+    handler.use_asyncio = True
+
+    thread = Thread(target=handler.event_loop, daemon=True)
+    thread.start()
+
+    metadata['done'].acquire()
+
+    return metadata
+
+
+def test_async_request(async_node):
+    conn = SingleConnectionHandler('localhost', 5002)
+    data = conn.send_with_response({"action": "get_id", "params": []})
+    assert data == async_node['uuid']
+
+
+def test_async_slow_client_does_not_block(async_node):
+    # A client that never finishes its request.
+    slow_client = create_connection(('localhost', 5002))
+    slow_client.send(b'\x00\x00\x00\x64\x00{"action": ')
+
+    conn = SingleConnectionHandler('localhost', 5002)
+    data = conn.send_with_response({"action": "response_test", "params": []})
+    assert data == {"message": "hello"}
+
+    slow_client.close()
+
+
+def test_async_bad_request(async_node):
+    conn = SingleConnectionHandler('localhost', 5002)
+    data = conn.send_with_response({"action": "get_id", "args": []})
+    assert data == "Error: Bad request"
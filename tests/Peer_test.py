@@ -56,6 +56,14 @@ def test_adding_valid_netloc_peer(initial_metadata):
     assert initial_metadata['peers'] == response
 
 
+def test_adding_peer_with_codecs(initial_metadata):
+    peer = [['127.0.0.1', 5001, ['json']]]
+
+    register_nodes(peer, initial_metadata)
+
+    assert initial_metadata['peers'] == [('127.0.0.1', 5001)]
+
+
 def test_adding_invalid_peers(initial_metadata):
     invalid_peers = [['invalid', 'invalid'], [None, None], [5000, 5000], 'Non tuple address']
 
@@ -0,0 +1,156 @@
+"""
+Pool_test.py
+
+This file tests the persistent peer connections.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from socket import socketpair, SHUT_RDWR
+from threading import Semaphore, Thread
+
+# Local imports
+from codec import JSON_CODEC
+from connection import ConnectionHandler, ConnectionPool, FrameReader, MultipleConnectionHandler, PeerConnection
+from network import NetworkHandler
+from tests.constants import create_metadata
+
+# Third party imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def node():
+    metadata = create_metadata(port=5003)
+    metadata['done'] = Semaphore(0)
+    metadata['benchmark'] = False
+
+    handler = NetworkHandler(metadata, [])
+
+    thread = Thread(target=handler.event_loop, daemon=True)
+    thread.start()
+
+    metadata['done'].acquire()
+
+    return metadata
+
+
+class ChunkedConnection():
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def recv_into(self, buffer):
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        size = min(len(buffer), len(chunk))
+        buffer[:size] = chunk[:size]
+        if size < len(chunk):
+            self.chunks.insert(0, chunk[size:])
+        return size
+
+
+def test_frame_reader():
+    stream = b'\x00\x00\x00\x07\x00"first"\x00\x00\x00\x08\x00"sec'
+    reader = FrameReader(ChunkedConnection([stream, b'ond"']))
+    assert reader.read() == "first"
+    assert reader.read() == "second"
+    with pytest.raises(ConnectionError):
+        reader.read()
+
+
+def test_frame_reader_too_large():
+    reader = FrameReader(ChunkedConnection([b'\xff\xff\xff\xff\x00']))
+    with pytest.raises(ValueError):
+        reader.read()
+
+
+def test_large_frame():
+    sender, receiver = socketpair()
+    data = {"chain": ["caf\u00e9 " * 100] * 2000}
+
+    thread = Thread(target=ConnectionHandler()._send, args=(sender, data))
+    thread.start()
+    assert ConnectionHandler()._recv(receiver) == data
+    thread.join()
+
+    sender.close()
+    receiver.close()
+
+
+def test_pool_reuses_connection(node):
+    pool = ConnectionPool()
+    peer = pool.get(('localhost', 5003))
+    assert pool.get(['localhost', 5003]) is peer
+
+    assert peer.send_with_response({"action": "get_id", "params": []}) == node['uuid']
+    conn = peer.conn
+    assert peer.send_with_response({"action": "get_id", "params": []}) == node['uuid']
+    assert peer.conn is conn
+
+    pool.remove(('localhost', 5003))
+    assert peer.conn is None
+
+
+def test_pool_multiplexes_requests(node):
+    peer = PeerConnection('localhost', 5003)
+
+    requests = [peer.submit({"action": "get_id", "params": []}) for i in range(5)]
+    assert len(set(request[0] for request in requests)) == 5
+    for request in requests:
+        assert peer.wait(request) == node['uuid']
+
+    peer.close()
+
+
+def test_pool_bad_request(node):
+    peer = PeerConnection('localhost', 5003)
+    assert peer.send_with_response({"action": "get_id", "args": []}) == "Error: Bad request"
+    peer.close()
+
+
+def test_pool_reconnects(node):
+    peer = PeerConnection('localhost', 5003)
+    assert peer.send_with_response({"action": "get_id", "params": []}) == node['uuid']
+
+    peer.conn.shutdown(SHUT_RDWR)
+    while peer.conn is not None:
+        pass
+
+    assert peer.send_with_response({"action": "get_id", "params": []}) == node['uuid']
+    peer.close()
+
+
+def test_pool_unreachable_peer():
+    peer = PeerConnection('localhost', 5009)
+    assert peer.send_with_response({"action": "get_id", "params": []}) is None
+    assert peer.backoff > 0
+
+    # Requests are not retried until the backoff has passed.
+    assert peer.submit({"action": "get_id", "params": []}) is None
+
+
+def test_pool_multiple_connection_handler(node):
+    pool = ConnectionPool()
+    peers = [('localhost', 5003), ('localhost', 5009)]
+
+    responses = MultipleConnectionHandler(peers, pool).send_with_response({"action": "get_id", "params": []})
+    assert responses == [node['uuid']]
+
+    pool.remove(('localhost', 5003))
+
+
+def test_pool_advertise(node):
+    pool = ConnectionPool()
+
+    # Peers that do not support the codec of the pool are sent JSON.
+    pool.advertise(('localhost', 5003), ['unknown'])
+    peer = pool.get(('localhost', 5003))
+    assert peer.codec is JSON_CODEC
+
+    request = peer.submit({"action": "get_id", "params": []})
+    assert peer.wait(request) == node['uuid']
+
+    pool.remove(('localhost', 5003))
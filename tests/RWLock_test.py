@@ -0,0 +1,120 @@
+"""
+RWLock_test.py
+
+This file tests the reader/writer and sharded locks.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from threading import Event, Thread
+
+# Local imports
+from rwlock import RWLock, ShardedLock
+
+
+def run_in_thread(target):
+    done = Event()
+
+    def run():
+        target()
+        done.set()
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread, done
+
+
+def test_readers_share_lock():
+    lock = RWLock()
+
+    with lock.read():
+        _, done = run_in_thread(lock.acquire_read)
+        assert done.wait(1)
+        assert lock.readers == 2
+
+    assert lock.readers == 1
+
+
+def test_writer_excludes_readers():
+    lock = RWLock()
+
+    def read():
+        with lock.read():
+            pass
+
+    with lock:
+        thread, done = run_in_thread(read)
+        assert not done.wait(0.1)
+
+    assert done.wait(1)
+    thread.join()
+
+    with lock.read():
+        thread, done = run_in_thread(lambda: lock.__enter__() and lock.__exit__())
+        assert not done.wait(0.1)
+
+    assert done.wait(1)
+    thread.join()
+    assert lock.writer is None
+
+
+def test_waiting_writer_is_preferred():
+    lock = RWLock()
+    order = []
+
+    def write():
+        with lock:
+            order.append('writer')
+
+    def read():
+        with lock.read():
+            order.append('reader')
+
+    with lock.read():
+        writer, written = run_in_thread(write)
+        for _ in range(100):
+            if lock.waiting > 0:
+                break
+            written.wait(0.01)
+        assert lock.waiting == 1
+
+        # New readers queue behind the writer, but a thread that already
+        # reads does not.
+        reader, read_done = run_in_thread(read)
+        assert not read_done.wait(0.1)
+        with lock.read():
+            assert lock.readers == 2
+
+    assert written.wait(1) and read_done.wait(1)
+    writer.join()
+    reader.join()
+    assert order == ['writer', 'reader']
+    assert lock.holders == {}
+
+
+def test_writer_is_reentrant():
+    lock = RWLock()
+
+    with lock:
+        with lock:
+            with lock.read():
+                assert lock.depth == 3
+
+        assert lock.writer is not None
+
+    assert lock.writer is None
+    assert lock.readers == 0
+
+
+def test_sharded_lock():
+    lock = ShardedLock(4)
+
+    assert lock.get_shard('AAAAAAAA1') == lock.get_shard('AAAAAAAA2')
+
+    # Keys that share a lock are acquired only once.
+    with lock.acquire(['AAAAAAAA1', 'AAAAAAAA2', 'BBBBBBBB']):
+        assert lock.locks[lock.get_shard('AAAAAAAA1')].locked()
+
+    assert not any(shard.locked() for shard in lock.locks)
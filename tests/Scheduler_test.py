@@ -0,0 +1,72 @@
+"""
+Scheduler_test.py
+
+This file tests the priority task scheduler.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from queue import Empty
+
+# Local imports
+from tasks import get_chain, receive_block
+from tests.constants import FakeConnection
+from thread import CLIENT, CONSENSUS, GOSSIP, TaskScheduler, get_priority
+
+# Third party imports
+import pytest
+
+
+def test_get_priority():
+    assert get_priority(receive_block) == CONSENSUS
+    assert get_priority('forward_transaction') == GOSSIP
+    assert get_priority(get_chain) == CLIENT
+
+
+def test_scheduler_order():
+    scheduler = TaskScheduler([0, 0, 0])
+
+    client = (get_chain, [], {}, None)
+    gossip = ('forward_transaction', [[]], {}, None)
+    consensus = (receive_block, [{}, 'localhost', 5000], {}, None)
+
+    for task in [client, gossip, client, consensus]:
+        assert scheduler.put(task)
+
+    assert scheduler.qsize() == 4
+    assert scheduler.get() is consensus
+    assert scheduler.get() is gossip
+    assert scheduler.get() is client
+    assert scheduler.get() is client
+    assert scheduler.empty()
+
+
+def test_scheduler_reserved_workers():
+    scheduler = TaskScheduler([0, 0, 0])
+    scheduler.put((get_chain, [], {}, None))
+
+    # A worker reserved for consensus tasks does not take client requests.
+    with pytest.raises(Empty):
+        scheduler.get(CONSENSUS, 0.01)
+
+    assert scheduler.get(CLIENT, 0.01) is not None
+
+
+def test_scheduler_depth():
+    scheduler = TaskScheduler([0, 1, 1])
+
+    assert scheduler.put((get_chain, [], {}, FakeConnection()))
+    assert not scheduler.put((get_chain, [], {}, FakeConnection()))
+    assert scheduler.qsize(CLIENT) == 1
+
+    # Other classes are not affected by a full class.
+    assert scheduler.put(('receive_transactions', [[]], {}, FakeConnection()))
+    for _ in range(3):
+        assert scheduler.put((receive_block, [{}, 'localhost', 5000], {}, FakeConnection()))
+
+    # Tasks of the node itself are never shed.
+    assert not scheduler.put(('receive_transactions', [[]], {}, FakeConnection()))
+    assert scheduler.put(('forward_transaction', [[]], {}, None))
+    assert scheduler.qsize(GOSSIP) == 2
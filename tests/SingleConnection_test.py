@@ -7,8 +7,13 @@ This file tests the SingleConnectionHandler
 Santa Clara University
 """
 
+# Standard library imports
+from socket import socketpair
+from threading import Thread
+
 # Local imports
-from connection import SingleConnectionHandler
+from connection import SingleConnectionHandler, grow_buffer, recv_exactly
+from macros import MAX_FRAME_SIZE, RECV_BUFFER_SIZE
 
 # Third party imports
 import pytest
@@ -84,3 +89,31 @@ def test_send_with_response_good(node_a):
     conn = SingleConnectionHandler('localhost', 5000)
     data = conn.send_with_response({"action": "response_test", "params": []})
     assert data == {"message": "hello"}
+
+
+def test_grow_buffer():
+    buffer = bytearray()
+    assert len(grow_buffer(buffer, 0, 10 * RECV_BUFFER_SIZE)) == RECV_BUFFER_SIZE
+
+    # A full buffer doubles but never past the size of the payload.
+    assert len(grow_buffer(buffer, RECV_BUFFER_SIZE, 10 * RECV_BUFFER_SIZE)) == RECV_BUFFER_SIZE
+    assert len(buffer) == 2 * RECV_BUFFER_SIZE
+    assert len(grow_buffer(bytearray(), 0, 5)) == 5
+
+
+def test_recv_exactly():
+    ours, theirs = socketpair()
+    payload = bytes(range(256)) * 1024
+
+    sender = Thread(target=theirs.sendall, args=(payload,), daemon=True)
+    sender.start()
+    assert recv_exactly(ours, len(payload)) == payload
+    sender.join()
+
+    # A peer that claims a large frame and then hangs up only costs what
+    # it has sent.
+    theirs.sendall(b'partial')
+    theirs.close()
+    with pytest.raises(ConnectionError):
+        recv_exactly(ours, MAX_FRAME_SIZE)
+    ours.close()
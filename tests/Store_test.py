@@ -0,0 +1,182 @@
+"""
+Store_test.py
+
+This file tests the block store.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+import os
+
+# Local imports
+from blockchain import Blockchain
+from coin import RewardCoin
+from history import History
+from store import BlockStore, restore_chain
+from transaction import RewardTransaction
+from tests.constants import create_metadata
+
+# Third party imports
+import pytest
+
+
+def add_blocks(blockchain, count):
+    for i in range(count):
+        reward_id = 'REWARD' + str(len(blockchain.chain)) + str(i)
+        reward = RewardTransaction([], {'A': [RewardCoin(reward_id, 5, reward_id + 'C')]}, reward_id, 'now')
+        blockchain.update_reward(reward)
+        blockchain.new_block(i, blockchain.last_block.hash)
+    blockchain.write_store()
+
+
+@pytest.fixture()
+def path(tmp_path):
+    return str(tmp_path / 'store' / 'node.log')
+
+
+def test_store_append_and_get(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 3)
+
+    assert len(blockchain.store) == 3
+    assert blockchain.store.get(1) == blockchain.chain[2]
+    assert list(blockchain.store.replay()) == blockchain.chain[1:]
+
+
+def test_write_store(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 1)
+
+    # New blocks only reach the store when it is written.
+    blockchain.update_reward(RewardTransaction([], {'A': [RewardCoin('LATE', 5, 'LATEC')]}, 'LATE', 'now'))
+    blockchain.new_block(1, blockchain.last_block.hash)
+    assert len(blockchain.store) == 1
+
+    blockchain.write_store()
+    assert list(blockchain.store.replay()) == blockchain.chain[1:]
+
+
+def test_store_reopen(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 3)
+    blockchain.store.close()
+
+    store = BlockStore(path)
+    assert len(store) == 3
+    assert store.get(2) == blockchain.chain[3]
+
+
+def test_store_partial_write(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 2)
+    blockchain.store.close()
+
+    with open(path, 'ab') as log:
+        log.write(b'\x00\x00\x10\x00\x01partial')
+
+    store = BlockStore(path)
+    assert len(store) == 2
+    assert list(store.replay()) == blockchain.chain[1:]
+
+    size = os.path.getsize(path)
+    store.close()
+
+    # A missing index is rebuilt from the log.
+    os.remove(path + '.idx')
+    store = BlockStore(path)
+    assert len(store) == 2
+    assert os.path.getsize(path) == size
+
+
+def test_store_truncate(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 3)
+
+    blockchain.store.truncate(1)
+    assert len(blockchain.store) == 1
+    assert list(blockchain.store.replay()) == blockchain.chain[1:2]
+
+
+def test_replace_chain(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 3)
+
+    blockchain_copy = blockchain.get_copy()
+    del blockchain_copy.chain[2:]
+    add_blocks(blockchain_copy, 3)
+
+    blockchain.replace_chain(blockchain_copy.chain)
+    blockchain.write_store()
+
+    assert blockchain.chain == blockchain_copy.chain
+    assert list(blockchain.store.replay()) == blockchain_copy.chain[1:]
+
+
+def test_restore_chain(path):
+    create_metadata()
+    history = History()
+    history.reset()
+
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 3)
+    blockchain.store.close()
+
+    history.reset()
+    restored = Blockchain()
+    assert restore_chain(BlockStore(path), restored, history) == 3
+
+    assert restored.chain == blockchain.chain
+    assert history.get_coin('REWARD32C') is not None
+    assert history.get_transaction('REWARD32') is not None
+
+    add_blocks(restored, 1)
+    assert len(restored.store) == 4
+
+
+def test_restore_chain_other_genesis(path):
+    create_metadata()
+    history = History()
+    history.reset()
+
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 2)
+    blockchain.store.close()
+
+    # A different genesis block leaves the store untouched.
+    restored = Blockchain()
+    restored.chain[0].proof = 101
+    assert restore_chain(BlockStore(path), restored, history) == 0
+    assert restored.store is None
+    assert len(restored.chain) == 1
+    assert len(BlockStore(path)) == 2
+
+
+def test_store_unknown_codec(path):
+    blockchain = Blockchain()
+    blockchain.store = BlockStore(path)
+    add_blocks(blockchain, 1)
+    blockchain.store.close()
+
+    # Change the codec ID of the only record.
+    with open(path, 'r+b') as log:
+        log.seek(4)
+        log.write(b'\x09')
+
+    store = BlockStore(path)
+    assert store.get(0) is None
+    assert list(store.replay()) == [None]
+
+    # A store that can not be read is not truncated.
+    restored = Blockchain()
+    assert restore_chain(store, restored, History()) == 0
+    assert len(BlockStore(path)) == 1
@@ -300,3 +300,108 @@ def test_verify_multiple_transactions(initial_history, initial_metadata):
         assert queues['tasks'].get(block=False) is not None
         with pytest.raises(Empty):
             queues['tasks'].get(block=False)
+
+
+def test_reward_remove_inputs():
+    fees = [Coin('FEE', 2, 'FEE1'), Coin('FEE', 3, 'FEE2')]
+    reward_transaction = RewardTransaction([], {'A': [RewardCoin('REWARD_ID', REWARD_COIN_VALUE)]}, 'REWARD_ID')
+
+    reward_transaction.add_new_inputs(fees)
+    reward_transaction.remove_inputs([Coin('FEE', 2, 'FEE1')])
+
+    assert reward_transaction.get_inputs() == (fees[1],)
+    assert reward_transaction.get_values()[0] == 3
+    assert reward_transaction.get_output_coins('A')[0].get_value() == 3 + REWARD_COIN_VALUE
+
+
+def test_orphan_transaction(initial_history, initial_metadata):
+    uuid = initial_metadata['uuid']
+    parent = Transaction(uuid, [Coin("0", 1, str(pytest.valid_id - 1))],
+                         {uuid: [Coin("PARENT", 1, "PARENTC")]}, "PARENT", "now")
+    child = Transaction(uuid, [Coin("PARENT", 1, "PARENTC")], {"B": [Coin("CHILD", 1, "CHILDC")]}, "CHILD", "now")
+
+    # The child arrives first and waits for its parent.
+    response = receive_transaction_internal([child.to_json()], initial_metadata, queues)
+    assert 'waiting for its inputs' in response[0]
+    assert "CHILD" in initial_metadata['blockchain'].orphans
+    with pytest.raises(Empty):
+        queues['trans'].get(block=False)
+
+    response = receive_transaction_internal([parent.to_json()], initial_metadata, queues)
+    assert response == [parent.to_json()]
+    assert queues['trans'].get(block=False) == parent
+    assert queues['trans'].get(block=False) == child
+    assert "CHILD" not in initial_metadata['blockchain'].orphans
+
+
+def test_batch_conflicts(initial_history, initial_metadata):
+    uuid = initial_metadata['uuid']
+    first = Transaction(uuid, [Coin("0", 1, "0")], {"B": [Coin("FIRST", 1, "FIRSTC")]}, "FIRST", "now")
+    double = Transaction(uuid, [Coin("0", 1, "0")], {"B": [Coin("DOUBLE", 1, "DOUBLEC")]}, "DOUBLE", "now")
+    wrong = Transaction(uuid, [Coin("0", 1, "1")], {"B": [Coin("OTHER", 1, "WRONGC")]}, "WRONG", "now")
+
+    response = receive_transaction_internal([first.to_json(), double.to_json(), wrong.to_json(), {}],
+                                            initial_metadata, queues)
+
+    assert response[0] == first.to_json()
+    assert 'conflicts with another' in response[1]
+    assert 'verification failed' in response[2]
+    assert 'malformed' in response[3]
+    assert queues['trans'].get(block=False) == first
+    with pytest.raises(Empty):
+        queues['trans'].get(block=False)
+
+
+def test_batch_conflict_with_rejected(initial_history, initial_metadata):
+    uuid = initial_metadata['uuid']
+    wrong = Transaction(uuid, [Coin("0", 2, "0")], {"B": [Coin("WRONG", 2, "WRONGC")]}, "WRONG", "now")
+    second = Transaction(uuid, [Coin("0", 1, "0")], {"B": [Coin("SECOND", 1, "SECONDC")]}, "SECOND", "now")
+
+    # A coin is only taken by a transaction that is accepted.
+    response = receive_transaction_internal([wrong.to_json(), second.to_json()], initial_metadata, queues)
+
+    assert 'verification failed' in response[0]
+    assert response[1] == second.to_json()
+    assert queues['trans'].get(block=False) == second
+    with pytest.raises(Empty):
+        queues['trans'].get(block=False)
+
+
+def test_verify_stateless():
+    coin = Coin('A', 1, 'AC')
+
+    assert Transaction('A', [coin], {'B': [Coin('T', 1, 'TC')]}, 'T', 'now').verify_stateless()
+    assert not Transaction('A', [coin], {'B': [Coin('X', 1, 'TC')]}, 'T', 'now').verify_stateless()
+    assert not Transaction('A', [coin, coin], {'B': [Coin('T', 2, 'TC')]}, 'T', 'now').verify_stateless()
+
+
+def test_check_coin():
+    coin = Coin('CHECK', 1, 'CHECKC')
+    transaction = Transaction('A', [], {'B': [coin]}, 'CHECK', 'now')
+
+    assert transaction.check_coin('B', Coin('CHECK', 1, 'CHECKC'))
+    assert not transaction.check_coin('A', coin)
+    assert not transaction.check_coin('B', Coin('CHECK', 2, 'CHECKC'))
+    assert transaction.get_output_coins('B') == (coin,)
+    assert transaction.get_all_reward_coins() == ()
+
+
+def test_transaction_hash_equality():
+    first = Transaction('A', [], {'B': [Coin('SAME', 1, 'SAMEC')]}, 'SAME', 'now')
+    second = Transaction('A', [], {'B': [Coin('SAME', 1, 'SAMEC')]}, 'SAME', 'now')
+    other = Transaction('A', [], {'B': [Coin('SAME', 2, 'SAMEC')]}, 'SAME', 'now')
+
+    assert first == second
+    assert first != other
+    assert len({first, second, other}) == 2
+
+
+def test_reward_transaction_hash_changes():
+    reward_transaction = RewardTransaction([], {'A': [RewardCoin('REWARD_ID', REWARD_COIN_VALUE)]}, 'REWARD_ID')
+    digest = reward_transaction.hash
+
+    reward_transaction.add_new_inputs([Coin('FEE', 2, 'FEE1')])
+    assert reward_transaction.hash != digest
+
+    reward_transaction.reset()
+    assert reward_transaction.hash == digest
@@ -0,0 +1,100 @@
+"""
+Validation_test.py
+
+This file tests the checks of blocks that do not need the history.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from datetime import datetime
+
+# Local imports
+from block import block_from_string
+from blockchain import Blockchain
+from coin import Coin
+from tests.constants import BLANK_BLOCK
+from transaction import Transaction
+from validation import MIN_PARALLEL_TRANSACTIONS, BlockValidator, check_block
+
+# Third party imports
+import pytest
+
+TIMESTAMP = datetime.min.strftime('%Y-%m-%dT%H:%M:%SZ')
+LAST_HASH = "edaf9ddaa11566d3359040c9e2c2479597d7476fbc5829d8a88bb0a5645d9309"
+
+
+@pytest.fixture(scope="module")
+def last_block():
+    blockchain = Blockchain()
+
+    blockchain.new_block("1", "1", TIMESTAMP)
+    blockchain.new_block("2", "2", TIMESTAMP)
+
+    return blockchain.last_block
+
+
+def create_block(proof=120718, previous_hash=LAST_HASH, inputs=None):
+    inputs = [Coin("ABC", 100, "TEST")] if inputs is None else inputs
+    value = sum(coin.get_value() for coin in inputs)
+    transaction = Transaction("B", inputs, {"C": [Coin("DCE", value, "OUTCOIN")]}, "DCE", TIMESTAMP)
+
+    return block_from_string(BLANK_BLOCK(4, [transaction], proof, previous_hash))
+
+
+def test_check_block(last_block):
+    block = create_block()
+
+    assert check_block(block, last_block.proof, last_block.hash) == [t.hash for t in block.transactions]
+
+    assert check_block(create_block(proof=120719), last_block.proof, last_block.hash) is None
+    assert check_block(create_block(previous_hash="3"), last_block.proof, last_block.hash) is None
+
+
+def test_check_block_double_spend(last_block):
+    coin = Coin("ABC", 100, "TEST")
+    block = create_block(inputs=[coin, coin])
+
+    assert check_block(block, last_block.proof, last_block.hash) is None
+
+
+def test_validator_processes(last_block):
+    validator = BlockValidator(2)
+
+    try:
+        good = create_block()
+        bad = create_block(proof=120719)
+        futures = [validator.submit(good, last_block), validator.submit(bad, last_block)]
+
+        assert validator.check(good, last_block, futures[0])
+        assert not validator.check(bad, last_block, futures[1])
+
+        # The hashes computed by the workers are kept.
+        assert good.transactions[1]._digest is not None
+    finally:
+        validator.shutdown()
+
+
+def test_validator_transactions():
+    transactions = []
+    for i in range(MIN_PARALLEL_TRANSACTIONS):
+        transaction_id = 'T' + str(i)
+        value = 1 if i % 3 else 2
+        transaction = Transaction("B", [Coin("ABC", 1, "IN" + str(i))],
+                                  {"C": [Coin(transaction_id, value, transaction_id + "C")]}, transaction_id, TIMESTAMP)
+        transactions.append(transaction.to_json())
+    transactions.append({})
+
+    expected = BlockValidator().check_transactions(transactions)
+    assert [status for status, _ in expected].count('Transaction verification failed') == 22
+    assert expected[-1] == ('Transaction malformed', None)
+
+    validator = BlockValidator(2)
+    try:
+        results = validator.check_transactions(transactions)
+
+        assert results == expected
+        assert results[1][1]._digest == expected[1][1].hash
+    finally:
+        validator.shutdown()
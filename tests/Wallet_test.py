@@ -0,0 +1,72 @@
+"""
+Wallet_test.py
+
+This file tests the wallet and its coin selection.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Local imports
+from coin import Coin
+from wallet import Wallet, select_exact_match, select_fewest_inputs, select_largest_first
+
+
+def create_wallet(values, selection='largest_first'):
+    wallet = Wallet(selection)
+    for i, value in enumerate(values):
+        wallet.add_coin(Coin('T', value, 'C' + str(i)))
+
+    return wallet
+
+
+def test_wallet_add_and_remove():
+    wallet = create_wallet([5, 1, 3])
+
+    assert wallet.get_balance() == 9
+    assert wallet.personal_coins == [(1, 'C1'), (3, 'C2'), (5, 'C0')]
+
+    wallet.remove_coin('C2')
+    wallet.remove_coin('C2')
+
+    assert wallet.get_balance() == 6
+    assert wallet.personal_coins == [(1, 'C1'), (5, 'C0')]
+    assert 'C2' not in wallet.uuid_lookup
+
+
+def test_wallet_get_coins():
+    wallet = create_wallet([5, 1, 3])
+
+    (coins, change), check = wallet.get_coins(8)
+    assert check
+    assert [coin.get_uuid() for coin in coins] == ['C0', 'C2']
+    assert change == 0
+    assert wallet.get_balance() == 1
+
+    assert wallet.get_coins(2) == ((), False)
+    assert wallet.get_balance() == 1
+
+
+def test_selection_strategies():
+    coins = [(1, 'A'), (2, 'B'), (2, 'C'), (4, 'D'), (10, 'E')]
+
+    assert select_largest_first(coins, 11) == ['E', 'D']
+    assert select_largest_first(coins, 20) is None
+
+    assert select_fewest_inputs(coins, 3) == ['D']
+    assert select_fewest_inputs(coins, 12) == ['E', 'D']
+
+    assert select_exact_match(coins, 7) == ['D', 'C', 'A']
+    assert select_exact_match(coins, 5) == ['D', 'A']
+
+    # There is no exact match so the fewest coins are used.
+    assert select_exact_match([(3, 'A'), (3, 'B')], 4) == ['B', 'A']
+
+
+def test_wallet_exact_match():
+    wallet = create_wallet([6, 4, 3, 3], 'exact_match')
+
+    (coins, change), check = wallet.get_coins(7)
+    assert check
+    assert sorted(coin.get_value() for coin in coins) == [3, 4]
+    assert change == 0
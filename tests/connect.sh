@@ -4,5 +4,5 @@ for ID in {1..200}
 do
     message="{\"action\": \"test\", \"params\": [$2, \"$1-$ID\"]}";
     length=${#message}
-    { echo "$length~$message"; } | telnet localhost 5000;
+    { printf "$(printf '\\x%02x\\x%02x\\x%02x\\x%02x' $((length >> 24 & 255)) $((length >> 16 & 255)) $((length >> 8 & 255)) $((length & 255)))\\x00"; printf '%s' "$message"; } | telnet localhost 5000;
 done
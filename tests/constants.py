@@ -17,6 +17,7 @@ from datetime import datetime
 # Local imports
 from blockchain import Blockchain
 from block import Block
+from connection import FRAME_HEADER
 from coin import Coin, RewardCoin
 from encoder import ComplexEncoder
 from history import History
@@ -75,24 +76,28 @@ def BLANK_BLOCK(index, transactions, proof, previous_hash):
 class FakeConnection():
     def __init__(self):
         self.data = None
+        self.incoming = b''
         self.changed = False
         self.sent = False
 
     def getpeername(self):
         return ('127.0.0.1', 5000)
 
-    def send(self, data):
+    def sendall(self, data):
         while self.sent:
             pass
-        split_data = data.decode().split('~')
-        self.data = json.loads(split_data[1])
+        self.data = json.loads(data[FRAME_HEADER.size:].decode())
         self.sent = True
 
-    def recv(self, size):
+    def recv_into(self, buffer):
         while not self.changed:
             pass
-        self.changed = False
-        return self.data
+        size = min(len(buffer), len(self.incoming))
+        buffer[:size] = self.incoming[:size]
+        self.incoming = self.incoming[size:]
+        if not self.incoming:
+            self.changed = False
+        return size
 
     def read_data(self):
         while not self.sent:
@@ -104,10 +109,8 @@ class FakeConnection():
         while self.changed:
             pass
 
-        json_message = json.dumps(data)
-        full_data = str(len(json_message)) + '~' + json_message
-        print(full_data)
-        self.data = full_data.encode()
+        payload = json.dumps(data).encode()
+        self.incoming = FRAME_HEADER.pack(len(payload), 0) + payload
         self.changed = True
 
 
@@ -11,21 +11,58 @@ Santa Clara University
 # Standard library imports
 import traceback
 import logging
-from queue import Queue
-from threading import Thread
+from collections import deque
+from queue import Empty, Queue
+from threading import Condition, Event, Thread
+from time import time
 
 # Local imports
+from blockchainConfig import BlockchainConfig
 from connection import ConnectionHandler
 from mine import Miner
 from tasks import THREAD_FUNCTIONS
 
+# The priority classes of tasks, most urgent first.
+CONSENSUS = 0
+GOSSIP = 1
+CLIENT = 2
+PRIORITIES = (CONSENSUS, GOSSIP, CLIENT)
+
+# The class of every task that is not a client request.
+TASK_PRIORITIES = {
+    'receive_block': CONSENSUS,
+    'forward_block': CONSENSUS,
+    'resolve_conflicts_internal': CONSENSUS,
+    'get_chain_paginated': CONSENSUS,
+    'register_nodes': CONSENSUS,
+    'unregister_nodes': CONSENSUS,
+    'receive_transactions': GOSSIP,
+    'forward_transaction': GOSSIP,
+}
+
+
+def get_priority(func):
+    """
+    get_priority()
+
+    Finds the priority class of a task.
+
+    :param func: <str> or <Function Object> The task or its name.
+
+    :return: <int> The priority class.
+    """
+
+    name = func if isinstance(func, str) else func.__name__
+
+    return TASK_PRIORITIES.get(name, CLIENT)
+
 
 class Worker(Thread):
     """
     Worker
     """
 
-    def __init__(self, metadata, queues):
+    def __init__(self, metadata, queues, lowest=CLIENT):
         """
         __init__()
 
@@ -33,11 +70,14 @@ class Worker(Thread):
 
         :param metadata: <dict> The metadata of the node.
         :param queues: <dict> The queues of the node.
+        :param lowest: <int> The lowest priority class of the tasks this
+            worker takes.
         """
 
         Thread.__init__(self)
         self.metadata = metadata
         self.queues = queues
+        self.lowest = lowest
         self.daemon = True
         self.start()
 
@@ -49,7 +89,7 @@ class Worker(Thread):
         """
 
         while True:
-            func, args, kwargs, conn = self.queues['tasks'].get()
+            func, args, kwargs, conn = self.queues['tasks'].get(self.lowest)
 
             try:
                 if isinstance(func, str):
@@ -64,13 +104,151 @@ class Worker(Thread):
                 except AttributeError:
                     pass
             finally:
-                self.queues['tasks'].task_done()
                 try:
                     conn.close()
                 except AttributeError:
                     pass
 
 
+class NotifyingQueue(Queue):
+    """
+    NotifyingQueue
+    """
+
+    def __init__(self, event, maxsize=0):
+        """
+        __init__()
+
+        The constructor for the NotifyingQueue object. This is a queue that
+        sets an event whenever an item is put into it.
+
+        :param event: <Event> The event to set.
+        :param maxsize: <int> The maximum size of the queue.
+        """
+
+        Queue.__init__(self, maxsize)
+        self.event = event
+
+    def _put(self, item):
+        """
+        _put()
+
+        Puts an item into the queue and sets the event.
+
+        :param item: The item to put into the queue.
+        """
+
+        Queue._put(self, item)
+        self.event.set()
+
+
+class TaskScheduler:
+    """
+    TaskScheduler
+    """
+
+    def __init__(self, depths):
+        """
+        __init__()
+
+        The constructor for the TaskScheduler object. This is a queue of
+        tasks that hands out the most urgent task first, oldest first
+        within a priority class. Each class holds a limited number of
+        tasks so that a flood of one kind of request is shed instead of
+        delaying the rest.
+
+        :param depths: <list<int>> The maximum number of waiting tasks of
+            each priority class, 0 for no limit.
+        """
+
+        self.condition = Condition()
+        self.tasks = [deque() for _ in PRIORITIES]
+        self.depths = depths
+
+    def put(self, task):
+        """
+        put()
+
+        Adds a task unless its priority class is full. Tasks of the node
+        itself, such as forwarding the blocks and transactions it handled,
+        have no connection and are never shed.
+
+        :param task: <tuple> The function, arguments, keyword arguments and
+            connection of the task.
+
+        :return: <boolean> Whether the task was added.
+        """
+
+        priority = get_priority(task[0])
+
+        with self.condition:
+            tasks = self.tasks[priority]
+            if task[3] is not None and 0 < self.depths[priority] <= len(tasks):
+                return False
+
+            tasks.append(task)
+            self.condition.notify_all()
+
+        return True
+
+    def get(self, lowest=CLIENT, timeout=None):
+        """
+        get()
+
+        Takes the most urgent task, waiting until there is one.
+
+        :param lowest: <int> The lowest priority class to take a task of.
+        :param timeout: <float> The number of seconds to wait or None to
+            wait forever.
+
+        :return: <tuple> The task.
+
+        :raise: <Empty> When no task arrived in time.
+        """
+
+        deadline = None if timeout is None else time() + timeout
+
+        with self.condition:
+            while True:
+                for tasks in self.tasks[:lowest + 1]:
+                    if len(tasks) > 0:
+                        return tasks.popleft()
+
+                remaining = None if deadline is None else deadline - time()
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+
+                self.condition.wait(remaining)
+
+    def qsize(self, priority=None):
+        """
+        qsize()
+
+        Counts the waiting tasks.
+
+        :param priority: <int> The priority class to count or None to count
+            every class.
+
+        :return: <int> The number of waiting tasks.
+        """
+
+        with self.condition:
+            if priority is None:
+                return sum(len(tasks) for tasks in self.tasks)
+            return len(self.tasks[priority])
+
+    def empty(self):
+        """
+        empty()
+
+        Checks whether there are no waiting tasks.
+
+        :return: <boolean> Whether there are no waiting tasks.
+        """
+
+        return self.qsize() == 0
+
+
 class ThreadHandler():
     """
     ThreadHandler
@@ -86,12 +264,31 @@ class ThreadHandler():
         :param num_threads: <int> The number of threads to create.
         """
 
+        config = BlockchainConfig()
+
         self.queues = {}
-        self.queues['tasks'] = Queue()
-        self.queues['trans'] = Queue()
-        self.queues['blocks'] = Queue()
-        for _ in range(num_threads):
-            Worker(metadata, self.queues)
+        self.queues['tasks'] = TaskScheduler([config.get_scheduler_consensus_depth(),
+                                              config.get_scheduler_gossip_depth(),
+                                              config.get_scheduler_client_depth()])
+
+        # The miner is signalled through this event when new transactions
+        # or blocks arrive instead of polling their queues.
+        self.queues['changed'] = Event()
+        self.queues['trans'] = NotifyingQueue(self.queues['changed'], config.get_mempool_max_transactions())
+        self.queues['blocks'] = NotifyingQueue(self.queues['changed'])
+
+        # Some workers only take consensus or gossip tasks so that blocks
+        # are handled at once however many client requests are waiting. At
+        # least one worker takes client requests.
+        consensus = max(min(config.get_scheduler_consensus_workers(), num_threads - 1), 0)
+        gossip = max(min(config.get_scheduler_gossip_workers(), num_threads - 1 - consensus), 0)
+        for i in range(num_threads):
+            if i < consensus:
+                Worker(metadata, self.queues, CONSENSUS)
+            elif i < consensus + gossip:
+                Worker(metadata, self.queues, GOSSIP)
+            else:
+                Worker(metadata, self.queues)
 
         Miner(metadata, self.queues)
 
@@ -100,7 +297,8 @@ class ThreadHandler():
         add_task()
 
         This function adds a task to the task queue to be consumed
-        by the worker threads.
+        by the worker threads. When too many tasks of its priority class
+        are waiting the request is answered with a busy error instead.
 
         :param task: <dict> The task that has come off the network.
         :param conn: <Connection Object> The socket that the request came
@@ -111,7 +309,11 @@ class ThreadHandler():
             action = THREAD_FUNCTIONS[task['action']]
             params = task['params']
 
-            self.queues['tasks'].put((action, params, {}, conn))
+            if not self.queues['tasks'].put((action, params, {}, conn)):
+                # The node is too busy for this kind of request.
+                logging.info('Dropped ' + task['action'] + ' request: node busy')
+                ConnectionHandler()._send(conn, 'Error: Busy')
+                conn.close()
         except Exception as e:
             ConnectionHandler()._send(conn, 'Error: Bad request')
             logging.warning(e)
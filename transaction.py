@@ -8,14 +8,15 @@ Santa Clara University
 """
 
 # Standard library imports
+import hashlib
 import json
 import logging
 from datetime import datetime
+from types import MappingProxyType
 from uuid import uuid4
 
 # Local imports
-from coin import coin_from_json, reward_coin_from_json
-from copy import deepcopy
+from coin import coin_from_json, compact_id, expand_id, reward_coin_from_json
 from history import History
 from macros import REWARD_COIN_VALUE
 
@@ -25,6 +26,9 @@ class Transaction:
     Transaction
     """
 
+    __slots__ = ('_uuid', '_timestamp', '_sender', '_inputs', '_input_value', '_outputs', '_output_value',
+                 '_reward_value', '_output_index', '_output_coins', '_digest')
+
     def __init__(self, sender, inputs, outputs, uuid=None, timestamp=None):
         """
         __init__()
@@ -39,19 +43,25 @@ class Transaction:
         :param timestamp: <str> The time that this transaction was made.
         """
 
-        self._uuid = str(uuid4()).replace('-', '') if uuid is None else uuid
+        self._uuid = uuid4().bytes if uuid is None else compact_id(uuid)
         self._timestamp = str(datetime.now()) if timestamp is None else timestamp
 
         self._sender = sender
 
-        self._inputs = inputs
+        # The coins are kept in tuples so that they can be handed out
+        # without being copied.
+        self._inputs = tuple(inputs)
         self._input_value = 0
         for coin in self._inputs:
             self._input_value += coin.get_value()
 
-        self._outputs = outputs
+        self._outputs = {recipient: tuple(outputs[recipient]) for recipient in outputs}
         self._output_value = 0
         self._reward_value = 0
+
+        # Every output coin by its compact UUID along with its recipient.
+        self._output_index = {}
+        self._output_coins = ()
         for recipient in self._outputs:
             for coin in self._outputs[recipient]:
                 if recipient == 'SYSTEM':
@@ -59,6 +69,12 @@ class Transaction:
                 else:
                     self._output_value += coin.get_value()
 
+                self._output_index[coin._uuid] = (recipient, coin)
+            self._output_coins += self._outputs[recipient]
+
+        # The hash of the string form, computed when it is first needed.
+        self._digest = None
+
     def verify(self, history=None):
         """
         verify()
@@ -79,22 +95,50 @@ class Transaction:
         if history is None:
             history = History()
 
+        if not self.verify_stateless():
+            return False
+
+        for coin in self._inputs:
+            transaction = history.get_transaction(coin.get_transaction_id())
+            if transaction is None or not transaction.check_coin(self._sender, coin):
+                return False
+
+        return True
+
+    def verify_stateless(self):
+        """
+        verify_stateless()
+
+        This function runs the checks that do not need the history. The
+        values must add up, the output coins must belong to this
+        transaction and no coin may be spent twice.
+
+        :return: <boolean> Whether the transaction passes the checks.
+        """
+
         if self._input_value < 0 or self._output_value < 0 or self._reward_value < 0:
             return False
 
         if self._input_value != (self._output_value + self._reward_value):
             return False
 
-        for coin in self._inputs:
-            transaction = history.get_transaction(coin.get_transaction_id())
-            if not transaction.check_coin(self._sender, coin):
-                return False
+        return self._verify_coins()
 
-        for coin in self.get_all_output_coins():
-            if coin.get_transaction_id() != self._uuid:
+    def _verify_coins(self):
+        """
+        _verify_coins()
+
+        This function checks that the output coins were made by this
+        transaction and that the inputs hold no coin twice.
+
+        :return: <boolean> Whether the coins are proper.
+        """
+
+        for coin in self._output_coins:
+            if coin._transaction_id != self._uuid:
                 return False
 
-        return True
+        return len(set(coin._uuid for coin in self._inputs)) == len(self._inputs)
 
     def to_json(self):
         """
@@ -106,7 +150,7 @@ class Transaction:
         """
 
         return {
-            'uuid': self._uuid,
+            'uuid': expand_id(self._uuid),
             'timestamp': self._timestamp,
             'sender': self._sender,
             'inputs': [coin.to_json() for coin in self._inputs],
@@ -126,6 +170,23 @@ class Transaction:
         """
         return json.dumps(self.to_json(), default=str)
 
+    @property
+    def hash(self):
+        """
+        hash
+
+        Creates a SHA-256 hash of the Transaction from its string form.
+        This is the leaf that is used for the transaction in the Merkle
+        tree of a block. The hash is only computed once.
+
+        :return: <str> The hash of the transaction.
+        """
+
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.to_string().encode()).hexdigest()
+
+        return self._digest
+
     def get_output_coins(self, recipient):
         """
         get_output_coins()
@@ -134,10 +195,10 @@ class Transaction:
 
         :param recipient: <str> The recipient whose coins are needed.
 
-        :return: <list<Coin Object>> The coins.
+        :return: <tuple<Coin Object>> The coins.
         """
 
-        return deepcopy(self._outputs.get(recipient, []))
+        return self._outputs.get(recipient, ())
 
     def get_all_output_coins(self):
         """
@@ -145,14 +206,10 @@ class Transaction:
 
         This function retrieves all the output coins in the transaction.
 
-        :return: <list<Coin Object>> All the output coins.
+        :return: <tuple<Coin Object>> All the output coins.
         """
 
-        coins = []
-        for recipient in self._outputs:
-            coins.extend(self.get_output_coins(recipient))
-
-        return coins
+        return self._output_coins
 
     def get_all_output_recipient_coins(self):
         """
@@ -160,7 +217,7 @@ class Transaction:
 
         This function retrieves all the output coins with recipients.
 
-        :return: <dict<<str>, <list<CoinObject>>> The output coins.
+        :return: <dict<<str>, <tuple<CoinObject>>> The output coins.
         """
 
         return self._outputs
@@ -172,10 +229,10 @@ class Transaction:
         This function retrieves all the coins that are rewards. I.e. due
         to SYSTEM.
 
-        :return: <list<Coin Object>> The reward coins.
+        :return: <tuple<Coin Object>> The reward coins.
         """
 
-        return self._outputs.get('SYSTEM')
+        return self._outputs.get('SYSTEM', ())
 
     def check_coin(self, recipient, coin):
         """
@@ -190,7 +247,9 @@ class Transaction:
         :return: <boolean> Whether or not the coin exists and matches.
         """
 
-        return coin in self.get_output_coins(recipient)
+        entry = self._output_index.get(coin._uuid)
+
+        return entry is not None and entry[0] == recipient and entry[1] == coin
 
     def get_values(self):
         """
@@ -213,7 +272,7 @@ class Transaction:
         :return: <str> The UUID.
         """
 
-        return self._uuid
+        return expand_id(self._uuid)
 
     def get_sender(self):
         """
@@ -230,23 +289,24 @@ class Transaction:
         """
         get_inputs()
 
-        This function retrives the input coins of the transaction as a copy.
+        This function retrives the input coins of the transaction.
 
-        :return: <list<Coin Object>> A list of the input coins.
+        :return: <tuple<Coin Object>> The input coins.
         """
 
-        return deepcopy(self._inputs)
+        return self._inputs
 
     def get_outputs(self):
         """
         get_outputs()
 
-        This function retrieves the output coins of the transaction as a copy.
+        This function retrieves a read only view of the output coins of the
+        transaction.
 
-        :return <dict<<str>, <list<Coin Object>>> The output coins.
+        :return <dict<<str>, <tuple<Coin Object>>> The output coins.
         """
 
-        return deepcopy(self._outputs)
+        return MappingProxyType(self._outputs)
 
     def get_timestamp(self):
         """
@@ -276,7 +336,19 @@ class Transaction:
         if not isinstance(other, Transaction):
             return False
 
-        return other.to_string() == self.to_string()
+        return other.hash == self.hash
+
+    def __hash__(self):
+        """
+        __hash__()
+
+        This function hashes the transaction so that it can be kept in
+        sets and used as a dictionary key.
+
+        :return: <int> The hash.
+        """
+
+        return hash(self.hash)
 
 
 class RewardTransaction(Transaction):
@@ -284,6 +356,8 @@ class RewardTransaction(Transaction):
     RewardTransaction
     """
 
+    __slots__ = ()
+
     def __init__(self, inputs, outputs, uuid=None, timestamp=None):
         """
         __init__()
@@ -306,8 +380,8 @@ class RewardTransaction(Transaction):
 
         :param coins: <list<Coin Object>> A list of the new input coins.
         """
+        self._inputs += tuple(coins)
         for coin in coins:
-            self._inputs.append(coin)
             self._input_value += coin.get_value()
 
         self._output_value = self._input_value + REWARD_COIN_VALUE
@@ -315,6 +389,32 @@ class RewardTransaction(Transaction):
         for i in self._outputs:
             self._outputs[i][0].set_value(self._output_value)
 
+        self._digest = None
+
+    def remove_inputs(self, coins):
+        """
+        remove_inputs()
+
+        This function removes input coins from the transaction when the
+        transactions that paid them are no longer going to be mined.
+
+        :param coins: <list<Coin Object>> A list of the input coins to remove.
+        """
+
+        uuids = set(coin.get_uuid() for coin in coins)
+        removed = [coin for coin in self._inputs if coin.get_uuid() in uuids]
+
+        self._inputs = tuple(coin for coin in self._inputs if coin.get_uuid() not in uuids)
+        for coin in removed:
+            self._input_value -= coin.get_value()
+
+        self._output_value = self._input_value + REWARD_COIN_VALUE
+
+        for i in self._outputs:
+            self._outputs[i][0].set_value(self._output_value)
+
+        self._digest = None
+
     def verify(self, history=None):
         """
         verify()
@@ -336,10 +436,7 @@ class RewardTransaction(Transaction):
         if history is None:
             history = History()
 
-        if self._input_value < 0 or self._output_value < 0 or self._reward_value < 0:
-            return False
-
-        if (self._input_value + REWARD_COIN_VALUE) != (self._output_value + self._reward_value):
+        if not self.verify_stateless():
             return False
 
         for coin in self._inputs:
@@ -347,18 +444,36 @@ class RewardTransaction(Transaction):
             if transaction is None or not transaction.check_coin(self._sender, coin):
                 return False
 
-        for coin in self.get_all_output_coins():
-            if coin.get_transaction_id() != self._uuid:
-                return False
-
         return True
 
+    def verify_stateless(self):
+        """
+        verify_stateless()
+
+        This function runs the checks that do not need the history. The
+        values must add up with the block reward and the output coins must
+        belong to this transaction.
+
+        :return: <boolean> Whether the transaction passes the checks.
+        """
+
+        if self._input_value < 0 or self._output_value < 0 or self._reward_value < 0:
+            return False
+
+        if (self._input_value + REWARD_COIN_VALUE) != (self._output_value + self._reward_value):
+            return False
+
+        return self._verify_coins()
+
     def reset(self):
-        self._output_value = REWARD_COIN_VALUE
-        self.inputs = []
-        self.outputs = []
-        self._input_value = 0
-        self._reward_value = 0
+        """
+        reset()
+
+        This function removes all of the input coins so that the reward is
+        back to only the reward for mining the block.
+        """
+
+        self.remove_inputs(self._inputs)
 
 
 def inputs_from_json(inputs):
@@ -498,29 +613,18 @@ def transaction_verify(history, transaction, reward=False):
         return False
 
     # Check output coins
-    for recipient in transaction.get_all_output_recipient_coins():
-        if bad_transaction:
+    for coin in transaction.get_all_output_coins():
+        if history.get_coin(coin.get_uuid()):
+            logging.error('Fatal Error: This transaction contains an output coin that already exists: ' + str(transaction))
+            bad_transaction = True
             break
 
-        for coin in transaction.get_all_output_recipient_coins()[recipient]:
-            if history.get_coin(coin.get_uuid()):
-                logging.error('Fatal Error: This transaction contains an output coin that already exists: ' + str(transaction))
-                bad_transaction = True
-                break
-
     if bad_transaction:
         return False
 
     if transaction.verify(history):
         # The transaction looks proper. Remove inputs and add outputs to history.
-        for coin in transaction.get_inputs():
-            history.remove_coin(coin.get_uuid())
-
-        for coin in transaction.get_all_output_coins():
-            history.add_coin(coin)
-
-        # Add transaction to queue and history.
-        history.add_transaction(transaction)
+        history.apply_transaction(transaction)
         return True
 
     logging.info("Bad transaction: built in verification failed")
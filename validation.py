@@ -0,0 +1,242 @@
+"""
+validation.py
+
+This file holds the checks of blocks and transactions that do not need the
+history. They only depend on the block and the block before it or on the
+transaction itself, so they can be run by a pool of worker processes while
+the node keeps the GIL for everything else.
+
+2020 Stephen Pacwa and Daniel Okazaki
+Santa Clara University
+"""
+
+# Standard library imports
+from concurrent.futures import Future, ProcessPoolExecutor
+import logging
+from multiprocessing import get_context
+
+# Local imports
+from blockchain import Blockchain
+from transaction import RewardTransaction, transaction_from_json
+
+# The smallest batch of transactions that is split over the worker
+# processes. Smaller batches are not worth sending to another process.
+MIN_PARALLEL_TRANSACTIONS = 64
+
+
+def check_block(block, last_proof, last_hash):
+    """
+    check_block()
+
+    Runs the checks of a block that do not need the history. The block
+    must follow the given block, hold a valid proof, start with its reward
+    and only hold transactions that pass their stateless checks and spend
+    no coin twice. This is a plain function of its arguments so that it can
+    be run in another process.
+
+    :param block: <Block Object> The block to check.
+    :param last_proof: <int> The proof of the block before it.
+    :param last_hash: <str> The hash of the block before it.
+
+    :return: <list<str>> The hashes of the transactions of the block or None
+        if it is not valid.
+    """
+
+    if block.previous_hash != last_hash:
+        logging.debug('Bad block: hash does not match')
+        return None
+
+    transactions = block.transactions
+    if len(transactions) == 0 or not isinstance(transactions[0], RewardTransaction):
+        logging.debug('Bad block: reward missing')
+        return None
+
+    uuids = set()
+    spent = set()
+    for transaction in transactions:
+        if not transaction.verify_stateless():
+            logging.debug('Bad block: transaction verification fails')
+            return None
+
+        inputs = [coin.get_uuid() for coin in transaction.get_inputs()]
+        if transaction.get_uuid() in uuids or not spent.isdisjoint(inputs):
+            logging.debug('Bad block: transaction conflicts with another in the block')
+            return None
+
+        uuids.add(transaction.get_uuid())
+        spent.update(inputs)
+
+    # Repeating the last transaction would not change the Merkle root.
+    hashes = [transaction.hash for transaction in transactions]
+    if len(set(hashes)) != len(hashes):
+        logging.debug('Bad block: transaction repeated')
+        return None
+
+    if not Blockchain.valid_proof(last_proof, block.proof, last_hash, transactions):
+        logging.debug('Bad block: invalid proof')
+        return None
+
+    return hashes
+
+
+def check_transaction_data(trans_data):
+    """
+    check_transaction_data()
+
+    Creates transactions from their data off the network and runs the
+    checks that do not need the history.
+
+    :param trans_data: <list<dict>> The data of the transactions.
+
+    :return: <list<tuple<str, Transaction Object>>> For each transaction
+        the reason it was rejected and None, or None and the transaction.
+    """
+
+    results = []
+    for data in trans_data:
+        try:
+            transaction = transaction_from_json(data)
+        except (KeyError, TypeError, ValueError):
+            results.append(('Transaction malformed', None))
+            continue
+
+        if not transaction.verify_stateless():
+            results.append(('Transaction verification failed', None))
+            continue
+
+        results.append((None, transaction))
+
+    return results
+
+
+def hash_transaction_data(trans_data):
+    """
+    hash_transaction_data()
+
+    Runs check_transaction_data() and hashes the transactions that pass.
+    Only the hashes are returned as sending the transactions back to
+    another process costs more than creating them again.
+
+    :param trans_data: <list<dict>> The data of the transactions.
+
+    :return: <list<tuple<str, str>>> For each transaction the reason it
+        was rejected and None, or None and its hash.
+    """
+
+    return [(status, None if transaction is None else transaction.hash)
+            for status, transaction in check_transaction_data(trans_data)]
+
+
+class BlockValidator:
+    """
+    BlockValidator
+    """
+
+    def __init__(self, processes=0):
+        """
+        __init__()
+
+        The constructor for a BlockValidator object. Blocks and batches of
+        transactions are checked on the calling thread unless a number of
+        worker processes is given.
+
+        :param processes: <int> The number of worker processes to use.
+        """
+
+        self.processes = processes
+        self.executor = None
+        if processes > 0:
+            self.executor = ProcessPoolExecutor(processes, get_context('spawn'))
+            logging.info('Started block validation with %s processes', processes)
+
+    def submit(self, block, last_block):
+        """
+        submit()
+
+        Starts checking a block that is to follow the given block.
+
+        :param block: <Block Object> The block to check.
+        :param last_block: <Block Object> The block before it.
+
+        :return: <Future> The future of the result of check_block().
+        """
+
+        if self.executor is not None:
+            return self.executor.submit(check_block, block, last_block.proof, last_block.hash)
+
+        future = Future()
+        future.set_result(check_block(block, last_block.proof, last_block.hash))
+        return future
+
+    def check(self, block, last_block, future=None):
+        """
+        check()
+
+        Waits for the checks of a block. The hashes computed by the worker
+        are stored on the transactions so that they are not computed again.
+
+        :param block: <Block Object> The block to check.
+        :param last_block: <Block Object> The block before it.
+        :param future: <Future> The future returned by submit() for this
+            block or None to start the checks now.
+
+        :return: <boolean> Whether the block passes the checks.
+        """
+
+        if future is None:
+            future = self.submit(block, last_block)
+
+        hashes = future.result()
+        if hashes is None:
+            return False
+
+        if self.executor is not None:
+            for transaction, digest in zip(block.transactions, hashes):
+                transaction._digest = digest
+
+        return True
+
+    def check_transactions(self, trans_data):
+        """
+        check_transactions()
+
+        Runs check_transaction_data() on a batch of transactions. Large
+        batches are checked and hashed by the worker processes, and only
+        the transactions that pass are created again on this thread with
+        the hashes computed by the workers.
+
+        :param trans_data: <list<dict>> The data of the transactions.
+
+        :return: <list<tuple<str, Transaction Object>>> The result of
+            check_transaction_data() for the whole batch.
+        """
+
+        if self.executor is None or len(trans_data) < MIN_PARALLEL_TRANSACTIONS:
+            return check_transaction_data(trans_data)
+
+        size = -(-len(trans_data) // self.processes)
+        futures = [self.executor.submit(hash_transaction_data, trans_data[i:i + size])
+                   for i in range(0, len(trans_data), size)]
+
+        results = []
+        for start, future in zip(range(0, len(trans_data), size), futures):
+            for data, (status, digest) in zip(trans_data[start:start + size], future.result()):
+                if status is not None:
+                    results.append((status, None))
+                    continue
+
+                transaction = transaction_from_json(data)
+                transaction._digest = digest
+                results.append((None, transaction))
+
+        return results
+
+    def shutdown(self):
+        """
+        shutdown()
+
+        Stops all of the worker processes.
+        """
+
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
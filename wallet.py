@@ -9,8 +9,121 @@ Santa Clara University
 """
 
 # Standard library imports
+from bisect import bisect_left, insort
 import logging
-from threading import Lock
+
+# Local imports
+from blockchainConfig import BlockchainConfig
+from rwlock import RWLock
+
+
+config = BlockchainConfig()
+
+# The most branches the exact match selection visits before giving up.
+EXACT_MATCH_MAX_TRIES = 10000
+
+
+def select_largest_first(coins, value):
+    """
+    select_largest_first()
+
+    Selects coins starting from the largest until they cover the value.
+
+    :param coins: <list<tuple<double, str>>> The values and UUIDs of the
+        coins sorted from smallest to largest.
+    :param value: <double> The value to cover.
+
+    :return: <list<str>> The UUIDs of the selected coins or None if the
+        coins do not cover the value.
+    """
+
+    selected = []
+    for coin_value, uuid in reversed(coins):
+        selected.append(uuid)
+        value -= coin_value
+        if value <= 0:
+            return selected
+
+    return None
+
+
+def select_fewest_inputs(coins, value):
+    """
+    select_fewest_inputs()
+
+    Selects as few coins as possible. The smallest coin that covers the
+    value on its own is used when there is one, otherwise coins are
+    selected starting from the largest.
+
+    :param coins: <list<tuple<double, str>>> The values and UUIDs of the
+        coins sorted from smallest to largest.
+    :param value: <double> The value to cover.
+
+    :return: <list<str>> The UUIDs of the selected coins or None if the
+        coins do not cover the value.
+    """
+
+    index = bisect_left(coins, (value,))
+    if index < len(coins):
+        return [coins[index][1]]
+
+    return select_largest_first(coins, value)
+
+
+def select_exact_match(coins, value):
+    """
+    select_exact_match()
+
+    Searches for coins that add up to exactly the value so that no change
+    is needed. The search is a depth first branch and bound over the coins
+    from largest to smallest that gives up after a number of branches and
+    then falls back to selecting the fewest coins.
+
+    :param coins: <list<tuple<double, str>>> The values and UUIDs of the
+        coins sorted from smallest to largest.
+    :param value: <double> The value to cover.
+
+    :return: <list<str>> The UUIDs of the selected coins or None if the
+        coins do not cover the value.
+    """
+
+    values = [coin_value for coin_value, _ in reversed(coins)]
+
+    # The total of every coin from each position onwards.
+    remaining = [0] * (len(values) + 1)
+    for i in range(len(values) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + values[i]
+
+    selected = []
+    total = 0
+    i = 0
+    for _ in range(EXACT_MATCH_MAX_TRIES):
+        if total == value:
+            return [coins[len(coins) - 1 - j][1] for j in selected]
+
+        if total > value or total + remaining[i] < value:
+            if len(selected) == 0:
+                break
+
+            # Leave out the last coin and every other coin of its value.
+            j = selected.pop()
+            total -= values[j]
+            i = j + 1
+            while i < len(values) and values[i] == values[j]:
+                i += 1
+        else:
+            selected.append(i)
+            total += values[i]
+            i += 1
+
+    return select_fewest_inputs(coins, value)
+
+
+SELECTION_STRATEGIES = {
+    'largest_first': select_largest_first,
+    'exact_match': select_exact_match,
+    'fewest_inputs': select_fewest_inputs
+}
 
 
 class Wallet:
@@ -18,19 +131,29 @@ class Wallet:
     Wallet
     """
 
-    # Static lock for the wallet
-    wallet_lock = Lock()
+    # Static lock for the wallet. Coins are added and removed under the
+    # write lock so that the wallet can be changed by threads that only
+    # read the history.
+    wallet_lock = RWLock()
 
-    def __init__(self):
+    def __init__(self, selection=None):
         """
         __init__()
 
-        The constructor for a Wallet object.
+        The constructor for a Wallet object. The coins are kept sorted by
+        their value so that coins can be added, removed and selected
+        without going through all of them.
+
+        :param selection: <str> The name of the strategy used to select
+            coins. It is read from the config when not given.
         """
         self.personal_coins = []
         self.uuid_lookup = {}
         self.balance = 0
 
+        selection = config.get_wallet_selection() if selection is None else selection
+        self.select = SELECTION_STRATEGIES.get(selection, select_largest_first)
+
     def add_coin(self, coin):
         """
         add_coin()
@@ -40,11 +163,12 @@ class Wallet:
         :param coin: <Coin Object> Coin to add to the wallet
         """
 
-        if coin.get_uuid() not in self.uuid_lookup:
-            self.personal_coins.append(coin)
-            self.personal_coins.sort()
-            self.uuid_lookup[coin.get_uuid()] = coin
-            self.balance += coin.get_value()
+        uuid = coin.get_uuid()
+        with Wallet.wallet_lock:
+            if uuid not in self.uuid_lookup:
+                insort(self.personal_coins, (coin.get_value(), uuid))
+                self.uuid_lookup[uuid] = coin
+                self.balance += coin.get_value()
 
     def remove_coin(self, uuid):
         """
@@ -54,15 +178,16 @@ class Wallet:
 
         :param uuid: <str> UUID of the coin to remove from the wallet
         """
-        try:
-            coin = self.personal_coins.remove(self.uuid_lookup[uuid])
-            del self.uuid_lookup[uuid]
-            if coin is not None:
-                self.balance -= coin.get_value()
 
-        except (ValueError, KeyError) as e:
-            logging.debug("Error in wallet: " + str(e))
-            pass
+        with Wallet.wallet_lock:
+            coin = self.uuid_lookup.pop(uuid, None)
+            if coin is None:
+                logging.debug("Error in wallet: coin " + str(uuid) + " is not in the wallet")
+                return
+
+            index = bisect_left(self.personal_coins, (coin.get_value(), uuid))
+            del self.personal_coins[index]
+            self.balance -= coin.get_value()
 
     def get_balance(self):
         """
@@ -85,22 +210,22 @@ class Wallet:
         :return: <tuple<list<Coin Object>, <double>> A tuple with the list of input coins and the value for the change
                  <boolean> Whetehr or not there was emnough coins in the wallet to complete the transaction
         """
-        num_coins = 0
-        coins = []
-
-        for i in self.personal_coins[::-1]:
-            value -= i.get_value()
-            coins.append(i)
-            num_coins += 1
-            if value < 0:
-                break
-        else:
-            return (), False
 
-        for coin in coins:
-            self.remove_coin(coin.get_uuid())
+        with Wallet.wallet_lock:
+            if value > self.balance:
+                return (), False
+
+            selected = self.select(self.personal_coins, value)
+            if selected is None:
+                return (), False
+
+            coins = [self.uuid_lookup[uuid] for uuid in selected]
+            for coin in coins:
+                self.remove_coin(coin.get_uuid())
+
+        change = sum(coin.get_value() for coin in coins) - value
 
-        return (coins, abs(value)), True
+        return (coins, change), True
 
     def get_lock(self):
         """
@@ -108,6 +233,6 @@ class Wallet:
 
         This function returns the wallet lock
 
-        :return: <Lock> Wallet Lock
+        :return: <RWLock> Wallet Lock
         """
         return Wallet.wallet_lock